@@ -1,34 +1,102 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, abort, current_app, g, make_response, request, jsonify, stream_with_context
 from flask_bcrypt import Bcrypt
-from flask_httpauth import HTTPBasicAuth
+from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth, MultiAuth
 from flask_cors import CORS
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
-from sqlalchemy.exc import OperationalError
+from sqlalchemy import and_, bindparam, delete, event, func, insert, or_, select, tuple_, update, UniqueConstraint
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.orm import ONETOMANY, aliased
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from collections import OrderedDict, namedtuple
+import base64
+import datetime
+import functools
+import hashlib
+import hmac
+import json
+import threading
 import time
 
 try:
     from .models import (
         db, Role, User, Vendor, Product, Project, ProductProject, Inventory,
         Client, Employee, LeadStage, Lead, ContractStatus, Contract, Task,
-        Room, Item, Proposal, Invoice, Note
+        Room, Item, Proposal, Invoice, Note, Activity, TableVersion, Versioned
     )
+    from . import compression, filters, google_sync, instrumentation, metrics, search
+    from .projection import VIEWS
+    from .cache import cache_from_env
+    from .migrations import run_migrations
+    from .serializers import FastJSONProvider, column_converter, compile_row_serializer, dumps
 except ImportError:  # allows running as 'python app.py'
     from models import (
         db, Role, User, Vendor, Product, Project, ProductProject, Inventory,
         Client, Employee, LeadStage, Lead, ContractStatus, Contract, Task,
-        Room, Item, Proposal, Invoice, Note
+        Room, Item, Proposal, Invoice, Note, Activity, TableVersion, Versioned
     )
+    import compression
+    import filters
+    import google_sync
+    import instrumentation
+    import metrics
+    import search
+    from cache import cache_from_env
+    from migrations import run_migrations
+    from projection import VIEWS
+    from serializers import FastJSONProvider, column_converter, compile_row_serializer, dumps
 import os
 
-app = Flask(__name__)
-CORS(app)
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'postgresql://postgres:postgres@db:5432/interiordesign')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db.init_app(app)
-bcrypt = Bcrypt(app)
-auth = HTTPBasicAuth()
+def config_from_env():
+    """Application settings read from the environment."""
+    return {
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL', 'postgresql://postgres:postgres@db:5432/interiordesign'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SECRET_KEY': os.getenv('SECRET_KEY'),
+        'TOKEN_TTL': int(os.getenv('TOKEN_TTL', '3600')),
+        'CREDENTIAL_CACHE_SIZE': int(os.getenv('CREDENTIAL_CACHE_SIZE', '1024')),
+        'CREDENTIAL_CACHE_TTL': int(os.getenv('CREDENTIAL_CACHE_TTL', '300')),
+        'DB_POOL_SIZE': int(os.getenv('DB_POOL_SIZE', '5')),
+        'DB_MAX_OVERFLOW': int(os.getenv('DB_MAX_OVERFLOW', '5')),
+        'DB_POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        'DB_POOL_RECYCLE': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'DB_STATEMENT_TIMEOUT_MS': int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '15000')),
+        'SERVER_TIMING': os.getenv('SERVER_TIMING', '1') != '0',
+        'SLOW_QUERY_MS': float(os.getenv('SLOW_QUERY_MS', '200')),
+        'SLOW_REQUEST_MS': float(os.getenv('SLOW_REQUEST_MS', '1000')),
+        'COMPRESS': os.getenv('COMPRESS', '1') != '0',
+        'COMPRESS_MIN_SIZE': int(os.getenv('COMPRESS_MIN_SIZE', '1024')),
+        'COMPRESS_BUDGET_MS': float(os.getenv('COMPRESS_BUDGET_MS', '25')),
+    }
+
+
+def engine_options(config):
+    """Connection pool settings for ``SQLALCHEMY_ENGINE_OPTIONS``.
+
+    SQLite keeps Flask-SQLAlchemy's defaults; server databases get a bounded
+    pool per process, pre-ping, recycling and a statement timeout.
+    """
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+    timeout = config['DB_STATEMENT_TIMEOUT_MS']
+    if timeout and config['SQLALCHEMY_DATABASE_URI'].startswith('postgres'):
+        options['connect_args'] = {'options': f'-c statement_timeout={timeout}'}
+    return options
+
+
+api = Blueprint('api', __name__)
+bcrypt = Bcrypt()
+basic_auth = HTTPBasicAuth()
+token_auth = HTTPTokenAuth(scheme='Bearer')
+auth = MultiAuth(basic_auth, token_auth)
+cache = cache_from_env()
 
 # Map URL path segments to SQLAlchemy models for import/export
 MODEL_MAP = {
@@ -51,51 +119,302 @@ MODEL_MAP = {
     'notes': Note,
 }
 
-def serialize_record(obj):
-    """Convert a SQLAlchemy model instance to a JSON-serialisable dict."""
-    result = {}
-    for col in obj.__table__.columns:
-        val = getattr(obj, col.name)
-        if hasattr(val, 'isoformat'):
-            val = val.isoformat()
-        elif type(val).__name__ == 'Decimal':
-            val = str(val)
-        result[col.name] = val
-    return result
-
-
-def get_tasks_service():
-    creds_file = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE')
-    if not creds_file or not os.path.exists(creds_file):
-        return None
-    creds = Credentials.from_service_account_file(
-        creds_file, scopes=['https://www.googleapis.com/auth/tasks']
-    )
-    return build('tasks', 'v1', credentials=creds)
+# Reverse lookup used when logging activity for ORM objects
+RESOURCE_NAMES = {model: name for name, model in MODEL_MAP.items()}
 
 
-def sync_task_to_google(task):
-    service = get_tasks_service()
-    if not service:
-        return
-    body = {'title': task.name}
-    if task.due_date:
-        body['due'] = f"{task.due_date.isoformat()}T00:00:00Z"
+# Serializers compiled once per model; see serializers.py
+ROW_SERIALIZERS = {model: compile_row_serializer(model.__table__) for model in MODEL_MAP.values()}
+
+
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(last_id, key=None):
+    """Return an opaque cursor pointing just past ``last_id``.
+
+    ``key`` holds the sort values of that row when the list is ordered by
+    something other than the id.
+    """
+    payload = {'after': last_id}
+    if key is not None:
+        payload['key'] = key
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def cursor_payload(cursor):
+    """Decode a cursor produced by :func:`encode_cursor`; ``None`` if invalid."""
     try:
-        res = service.tasks().insert(tasklist='@default', body=body).execute()
-        task.google_task_id = res.get('id')
-        db.session.commit()
-    except Exception as exc:
-        print('Google Tasks sync failed:', exc)
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get('after'), int):
+        return None
+    return payload
+
+
+def decode_cursor(cursor):
+    """Return the id a cursor points past; ``None`` if invalid."""
+    payload = cursor_payload(cursor)
+    return None if payload is None else payload['after']
 
-@auth.verify_password
+
+def requested_fields(view, default):
+    """Field names asked for with ``?fields=``, or ``default`` when absent."""
+    return view.parse(request.args.get('fields'), default)
+
+
+def list_response(view):
+    """Serialize ``view``'s records as a list, keyset-paginated when ``?limit=`` is given.
+
+    ``?fields=a,b`` narrows the SELECT to the columns behind those fields;
+    other fields are neither queried nor returned. Any other parameter is a
+    filter and ``?order=`` sorts the list (see filters.py); both are limited
+    to the view's whitelisted columns. Without ``limit`` the full list is
+    returned as a bare JSON array. With it, rows are fetched in sort order
+    starting after the ``after`` cursor and wrapped as
+    ``{'items': [...], 'next_cursor': ...}``.
+    """
+    try:
+        names = requested_fields(view, view.list_fields)
+        clauses = filters.filter_clauses(view, request.args)
+        keys = filters.parse_order(view, request.args.get('order'))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    model = view.model
+    query = view.select(names).where(*clauses)
+    order = filters.order_clauses(keys, model.id)
+    if 'limit' not in request.args:
+        rows = db.session.execute(query.order_by(*order)).all()
+        return jsonify(view.serialize(db.session, rows, names))
+    limit = request.args.get('limit', type=int)
+    if not limit or limit < 1:
+        return jsonify({'error': 'Invalid limit'}), 400
+    limit = min(limit, MAX_PAGE_SIZE)
+    cursor = request.args.get('after')
+    if cursor:
+        payload = cursor_payload(cursor)
+        try:
+            if payload is None:
+                raise ValueError
+            values = filters.decode_key(keys, payload.get('key', []))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.where(filters.seek_clause(keys, values, model.id, payload['after']))
+    # Sort values ride at the end of each row so the next cursor can carry them
+    query = query.add_columns(*(column for column, _ in keys))
+    rows = db.session.execute(query.order_by(*order).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        key = [filters.encode_key(value) for value in last[len(last) - len(keys):]] if keys else None
+        next_cursor = encode_cursor(last[0], key)
+    return jsonify({
+        'items': view.serialize(db.session, rows[:limit], names),
+        'next_cursor': next_cursor,
+    })
+
+
+def fields_key(key, names, default):
+    return key if names == default else f"{key}?fields={','.join(names)}"
+
+
+def versioned_key(key, tables):
+    """Suffix a cache ``key`` with the current versions of ``tables``.
+
+    Invalidation only reaches the cache of the process that committed, so
+    other workers, and readers racing the commit, may still hold an old
+    entry. Keying on the versions means such an entry is never read again
+    once any of its tables has changed.
+    """
+    versions = table_versions(tables)
+    digest = hashlib.sha1(repr(sorted(versions.items())).encode()).hexdigest()[:16]
+    return f'{key}@{digest}'
+
+
+def cached_list(view):
+    """Like :func:`list_response`, serving unpaginated, unfiltered lists from the cache."""
+    if set(request.args) - {'fields'}:
+        return list_response(view)
+    try:
+        names = requested_fields(view, view.list_fields)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    tables = view.tables(names)
+    key = versioned_key(fields_key(f'list:{view.model.__tablename__}', names, view.list_fields), tables)
+    items = cache.get(key)
+    if items is None:
+        rows = db.session.execute(view.select(names).order_by(view.model.id)).all()
+        items = view.serialize(db.session, rows, names)
+        cache.set(key, items, tuple(tables))
+    return jsonify(items)
+
+
+def detail_response(view, ident):
+    """Return the record ``ident`` of ``view``, read through the cache.
+
+    ``?fields=`` narrows the record as it does for lists. Entries are keyed
+    on the versions of every table the fields were read from (see
+    :func:`versioned_key`), and dropped when a commit touches any of them.
+    Missing records abort with 404.
+    """
+    try:
+        names = requested_fields(view, view.detail_fields)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    tables = view.tables(names)
+    key = versioned_key(fields_key(f'{view.model.__tablename__}:{ident}', names, view.detail_fields), tables)
+    value = cache.get(key)
+    if value is None:
+        row = db.session.execute(view.select(names).where(view.model.id == ident)).first()
+        if row is None:
+            abort(404)
+        value = view.serialize(db.session, [row], names)[0]
+        cache.set(key, value, tuple(tables))
+    response = jsonify(value)
+    if 'version' in value:
+        # Completed into "<version>.<digest>" by conditional
+        response.set_etag(str(value['version']))
+    return response
+
+
+# Identity attached to authenticated requests; built without touching the DB
+AuthUser = namedtuple('AuthUser', ['id', 'username', 'role'])
+
+
+class CredentialCache:
+    """Bounded LRU of recently verified credentials with a fixed TTL.
+
+    Entries are keyed on an HMAC of the username and password, under a
+    random per-process key, so plaintext passwords are never kept in memory.
+    The key also covers the versions of the ``users`` and ``roles`` tables,
+    so a password or role change made by any process retires every entry;
+    commits in this process clear the cache outright (see
+    :func:`invalidate_cache`).
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._secret = os.urandom(32)
+
+    def key(self, username, password, versions=()):
+        message = f'{username}\0{password}\0{versions}'.encode()
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+credential_cache = CredentialCache(1024, 300)
+
+# Tables whose changes invalidate cached credentials
+CREDENTIAL_TABLES = (Role.__tablename__, User.__tablename__)
+
+
+# Only ever used in debug and testing; see signing_key
+DEV_SECRET_KEY = 'dev-secret-key'
+
+
+def signing_key():
+    """``SECRET_KEY``, the development key in debug or testing, else ``None``.
+
+    Tokens are trusted on their signature alone, so a guessable key would
+    let anyone mint one for any user. Without a configured key, token
+    authentication is disabled instead.
+    """
+    key = current_app.config.get('SECRET_KEY')
+    if not key and (current_app.debug or current_app.testing):
+        key = DEV_SECRET_KEY
+    return key or None
+
+
+def token_serializer():
+    key = signing_key()
+    return None if key is None else URLSafeTimedSerializer(key, salt='auth-token')
+
+
+def generate_token(user):
+    return token_serializer().dumps({'id': user.id, 'username': user.username, 'role': user.role})
+
+
+@basic_auth.verify_password
 def verify_password(username, password):
+    if not username or not password:
+        return None
+    versions = tuple(db.session.execute(
+        select(TableVersion.table_name, TableVersion.version)
+        .where(TableVersion.table_name.in_(CREDENTIAL_TABLES))
+        .order_by(TableVersion.table_name)
+    ))
+    key = credential_cache.key(username, password, versions)
+    cached = credential_cache.get(key)
+    if cached:
+        return cached
     user = User.query.filter_by(username=username).first()
     if user and bcrypt.check_password_hash(user.password_hash, password):
-        return user
+        identity = AuthUser(user.id, user.username, user.role.name if user.role else None)
+        credential_cache.set(key, identity)
+        return identity
     return None
 
-@app.route('/register', methods=['POST'])
+
+@token_auth.verify_token
+def verify_token(token):
+    """Accept a token from /login; checked by signature alone, no DB access."""
+    serializer = token_serializer()
+    if not token or serializer is None:
+        return None
+    try:
+        data = serializer.loads(token, max_age=current_app.config['TOKEN_TTL'])
+    except BadSignature:
+        return None
+    return AuthUser(data['id'], data['username'], data.get('role'))
+
+
+@api.route('/login', methods=['POST'])
+@basic_auth.login_required
+def login():
+    """Exchange HTTP Basic credentials for a signed, expiring bearer token."""
+    if token_serializer() is None:
+        return jsonify({'error': 'Token login is disabled until SECRET_KEY is set'}), 503
+    token = generate_token(basic_auth.current_user())
+    return jsonify({'token': token, 'expires_in': current_app.config['TOKEN_TTL']})
+
+
+@api.route('/me', methods=['GET'])
+@auth.login_required
+def current_identity():
+    user = auth.current_user()
+    return jsonify({'id': user.id, 'username': user.username, 'role': user.role})
+
+@api.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
     if not data:
@@ -107,69 +426,925 @@ def register():
     if User.query.filter_by(username=username).first():
         return jsonify({'error': 'User already exists'}), 400
 
-    role = Role.query.filter_by(name=role_name).first()
-    if not role:
-        role = Role(name=role_name)
-        db.session.add(role)
-        db.session.commit()
+    role_key = f'role:{role_name}'
+    role_id = cache.get(role_key)
+    if role_id is None:
+        role = Role.query.filter_by(name=role_name).first()
+        if not role:
+            role = Role(name=role_name)
+            db.session.add(role)
+            db.session.commit()
+        role_id = role.id
+        cache.set(role_key, role_id, ('roles',))
 
     pw_hash = bcrypt.generate_password_hash(password).decode('utf-8')
-    user = User(username=username, password_hash=pw_hash, role_id=role.id)
+    user = User(username=username, password_hash=pw_hash, role_id=role_id)
     db.session.add(user)
     db.session.commit()
     return jsonify({'message': f'User {username} created'}), 201
 
 
-@app.route('/export/<model_name>', methods=['GET'])
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+
+
+def wants_ndjson():
+    if request.args.get('format') == 'ndjson':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+
+def stream_ndjson(model, batch_size):
+    """Yield newline-delimited JSON for every row of ``model``.
+
+    Plain column rows are read through a server-side cursor ``batch_size``
+    at a time, serialized with the model's compiled row serializer and
+    emitted as one chunk per batch. compression.py encodes each chunk as it
+    is yielded when the client accepts it.
+    """
+    serialize = ROW_SERIALIZERS[model]
+    table = model.__table__
+    stmt = select(*table.columns).order_by(table.c.id).execution_options(yield_per=batch_size)
+    for partition in db.session.execute(stmt).partitions():
+        yield b''.join(dumps(serialize(row)) + b'\n' for row in partition)
+
+
+@api.route('/export/<model_name>', methods=['GET'])
 def export_data(model_name):
-    """Export all records of the given model as JSON."""
+    """Export all records of the given model as JSON.
+
+    Requesting ``?format=ndjson`` (or ``Accept: application/x-ndjson``)
+    streams one record per line instead of building the whole array.
+    """
     model = MODEL_MAP.get(model_name)
     if not model:
         return jsonify({'error': 'Unknown model'}), 404
-    records = model.query.all()
-    return jsonify([serialize_record(r) for r in records])
+    if not wants_ndjson():
+        serialize = ROW_SERIALIZERS[model]
+        rows = db.session.execute(select(*model.__table__.columns).order_by(model.id))
+        return jsonify([serialize(row) for row in rows])
+    batch_size = request.args.get('batch_size', EXPORT_BATCH_SIZE, type=int)
+    if batch_size < 1:
+        return jsonify({'error': 'Invalid batch size'}), 400
+    return Response(
+        stream_with_context(stream_ndjson(model, batch_size)),
+        mimetype='application/x-ndjson',
+    )
+
+
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+
+# Natural keys used to match incoming rows in ``?mode=upsert`` imports
+NATURAL_KEYS = {
+    Vendor: ('name',),
+    Product: ('sku',),
+    Employee: ('name',),
+    LeadStage: ('name',),
+    ContractStatus: ('name',),
+}
+
+
+def validate_import_rows(model, data, required=None, exclude=()):
+    """Validate ``data`` against ``model``'s columns.
+
+    The column set and per-column converters are resolved once, then each
+    row is filtered to known columns and coerced. ``required`` defaults to
+    the non-nullable columns without defaults; columns in ``exclude`` are
+    dropped. Returns ``(rows, errors)`` where ``rows`` holds
+    ``(index, values)`` pairs and ``errors`` describes rejected rows by their
+    position in the payload.
+    """
+    columns = {col.name: col for col in model.__table__.columns if col.name not in exclude}
+    converters = {name: column_converter(col) for name, col in columns.items()}
+    if required is None:
+        required = {
+            name for name, col in columns.items()
+            if not col.nullable and not col.primary_key
+            and col.default is None and col.server_default is None
+        }
+    rows, errors = [], []
+    for index, item in enumerate(data):
+        if not isinstance(item, dict):
+            errors.append({'row': index, 'error': 'Row must be an object'})
+            continue
+        values = {}
+        try:
+            for name, value in item.items():
+                if name not in columns:
+                    continue
+                convert = converters[name]
+                values[name] = convert(value) if convert and value is not None else value
+        except (ValueError, TypeError, ArithmeticError) as exc:
+            errors.append({'row': index, 'error': f'Invalid value for {name}: {exc}'})
+            continue
+        missing = sorted(name for name in required if values.get(name) is None)
+        if missing:
+            errors.append({'row': index, 'error': f"Missing required field(s): {', '.join(missing)}"})
+            continue
+        rows.append((index, values))
+    return rows, errors
+
+
+def insert_rows(table, rows):
+    """Insert ``rows`` with one executemany per distinct column set."""
+    groups = {}
+    for values in rows:
+        groups.setdefault(tuple(sorted(values)), []).append(values)
+    for group in groups.values():
+        db.session.execute(insert(table), group)
+
+
+def has_unique_constraint(table, key):
+    if len(key) == 1 and table.c[key[0]].unique:
+        return True
+    return any(
+        isinstance(cons, UniqueConstraint) and {c.name for c in cons.columns} == set(key)
+        for cons in table.constraints
+    )
+
+
+def upsert_rows(table, key, rows):
+    """Insert ``rows`` or update the existing rows sharing their ``key``.
+
+    When the key is backed by a unique constraint this is a set-based
+    ``INSERT ... ON CONFLICT DO UPDATE``. Otherwise the existing keys are
+    fetched with a single ``IN`` query and the batch is split into an
+    executemany ``UPDATE`` and an executemany ``INSERT``. Updated rows get
+    their ``version`` bumped like any other update.
+    """
+    # Later rows win when the same key appears twice in one batch
+    rows = list({tuple(values[k] for k in key): values for values in rows}.values())
+    dialect = db.session.get_bind().dialect.name
+    groups = {}
+    for values in rows:
+        groups.setdefault(tuple(sorted(values)), []).append(values)
+
+    if dialect in ('postgresql', 'sqlite') and has_unique_constraint(table, key):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        for names, group in groups.items():
+            stmt = dialect_insert(table)
+            changes = {name: stmt.excluded[name] for name in names if name not in key}
+            if changes:
+                if 'version' in table.c:
+                    changes['version'] = table.c.version + 1
+                stmt = stmt.on_conflict_do_update(index_elements=list(key), set_=changes)
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=list(key))
+            db.session.execute(stmt, group)
+        return
+
+    key_cols = [table.c[k] for k in key]
+    wanted = [tuple(values[k] for k in key) for values in rows]
+    if len(key_cols) == 1:
+        lookup = select(key_cols[0]).where(key_cols[0].in_([k[0] for k in wanted]))
+    else:
+        lookup = select(*key_cols).where(tuple_(*key_cols).in_(wanted))
+    existing = {tuple(row) for row in db.session.execute(lookup)}
+
+    new_rows = []
+    for names, group in groups.items():
+        updates = [
+            {**{f'key_{k}': values[k] for k in key}, **values}
+            for values in group if tuple(values[k] for k in key) in existing
+        ]
+        new_rows.extend(values for values in group if tuple(values[k] for k in key) not in existing)
+        changed = [name for name in names if name not in key]
+        if updates and changed:
+            values = {name: bindparam(name) for name in changed}
+            if 'version' in table.c:
+                values['version'] = table.c.version + 1
+            stmt = (
+                update(table)
+                .where(and_(*(table.c[k] == bindparam(f'key_{k}') for k in key)))
+                .values(values)
+            )
+            db.session.execute(stmt, updates)
+    insert_rows(table, new_rows)
+
 
+def bulk_import(model, data, batch_size, key=None):
+    """Insert ``data`` into ``model``'s table in batches of ``batch_size``.
 
-@app.route('/import/<model_name>', methods=['POST'])
+    Each batch is written with Core executemany statements and committed on
+    its own, so no ORM objects are created. When ``key`` names natural-key
+    columns, rows matching an existing record update it instead of being
+    inserted. If a batch fails it is rolled back and replayed row by row to
+    pinpoint the offending rows.
+    """
+    table = model.__table__
+    if key:
+        rows, errors = validate_import_rows(model, data, required=set(key), exclude=('id', 'version'))
+
+        def write(batch):
+            upsert_rows(table, key, batch)
+    else:
+        rows, errors = validate_import_rows(model, data)
+
+        def write(batch):
+            insert_rows(table, batch)
+    resource = RESOURCE_NAMES.get(model)
+
+    def log_batch(count):
+        if not count:
+            return
+        tables = [table.name]
+        if resource:
+            log_activity(db.session.connection(), [
+                {'action': 'import', 'resource': resource, 'label': f'{count} rows'}
+            ])
+            tables.append(Activity.__tablename__)
+        record_bulk_changes(tables)
+
+    batches = []
+    imported = 0
+    for number, start in enumerate(range(0, len(rows), batch_size), 1):
+        batch = rows[start:start + batch_size]
+        try:
+            write([values for _, values in batch])
+            log_batch(len(batch))
+            db.session.commit()
+            done = len(batch)
+        except SQLAlchemyError:
+            db.session.rollback()
+            done = 0
+            for index, values in batch:
+                try:
+                    write([values])
+                    record_bulk_changes([table.name])
+                    db.session.commit()
+                    done += 1
+                except SQLAlchemyError as exc:
+                    db.session.rollback()
+                    errors.append({'row': index, 'error': str(exc.orig if hasattr(exc, 'orig') else exc)})
+            log_batch(done)
+            db.session.commit()
+        imported += done
+        batches.append({'batch': number, 'rows': len(batch), 'imported': done})
+        current_app.logger.info('Import %s: batch %d wrote %d/%d rows', table.name, number, done, len(batch))
+    errors.sort(key=lambda e: e['row'])
+    return {'imported': imported, 'batches': batches, 'errors': errors}
+
+
+@api.route('/import/<model_name>', methods=['POST'])
 def import_data(model_name):
-    """Import records for the given model from a JSON payload."""
+    """Import records for the given model from a JSON payload.
+
+    Rows are validated up front and inserted in batches of ``?batch_size=``
+    (default ``IMPORT_BATCH_SIZE``). With ``?mode=upsert`` rows are matched
+    on the model's natural key (``NATURAL_KEYS``, or ``?key=col1,col2``) and
+    existing records are updated in place. The response reports the number
+    of rows imported, per-batch progress and any row-level errors.
+    """
     model = MODEL_MAP.get(model_name)
     if not model:
         return jsonify({'error': 'Unknown model'}), 404
     data = request.get_json() or []
     if not isinstance(data, list):
         return jsonify({'error': 'Invalid payload'}), 400
-    count = 0
-    for item in data:
-        obj = model()
-        for col in model.__table__.columns:
-            if col.name in item:
-                setattr(obj, col.name, item[col.name])
-        db.session.add(obj)
-        count += 1
+    batch_size = request.args.get('batch_size', IMPORT_BATCH_SIZE, type=int)
+    if batch_size < 1:
+        return jsonify({'error': 'Invalid batch size'}), 400
+    mode = request.args.get('mode', 'insert')
+    key = None
+    if mode == 'upsert':
+        key = tuple(request.args['key'].split(',')) if request.args.get('key') else NATURAL_KEYS.get(model)
+        if not key:
+            return jsonify({'error': f'No natural key defined for {model_name}'}), 400
+        if any(k not in model.__table__.c or k == 'id' for k in key):
+            return jsonify({'error': 'Invalid key'}), 400
+    elif mode != 'insert':
+        return jsonify({'error': 'Invalid mode'}), 400
+    result = bulk_import(model, data, batch_size, key)
+    status = 400 if data and not result['imported'] else 201
+    return jsonify(result), status
+
+
+BATCH_MAX_OPERATIONS = int(os.getenv('BATCH_MAX_OPERATIONS', '1000'))
+BATCH_ACTIONS = ('create', 'update', 'delete', 'get')
+
+
+class BatchError(Exception):
+    """A ``/batch`` operation that cannot be applied; rolls back the whole batch."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def resolve_ref(value, refs):
+    """Replace a ``{"$ref": name}`` placeholder with the id created as ``name``.
+
+    Placeholders inside a list, such as a project's ``product_ids``, are
+    replaced too.
+    """
+    if isinstance(value, list):
+        return [resolve_ref(item, refs) for item in value]
+    if isinstance(value, dict) and set(value) == {'$ref'}:
+        if value['$ref'] not in refs:
+            raise BatchError(f"Unknown reference {value['$ref']}")
+        return refs[value['$ref']]
+    return value
+
+
+def batch_values(model, data, required=None):
+    """Validate one operation's ``data`` the way imports validate a row."""
+    if not isinstance(data, dict):
+        raise BatchError('Operation data must be an object')
+    rows, errors = validate_import_rows(model, [data], required=required, exclude=('id', 'version'))
+    if errors:
+        raise BatchError(errors[0]['error'])
+    return rows[0][1]
+
+
+def run_batch_operation(operation, refs):
+    """Apply one ``/batch`` operation in the current transaction and describe the result.
+
+    Writes are flushed straight away so generated ids can be referenced by
+    later operations, constraint errors point at the operation that caused
+    them and reads see everything written before them.
+    """
+    if not isinstance(operation, dict):
+        raise BatchError('Operation must be an object')
+    action = operation.get('op')
+    if action not in BATCH_ACTIONS:
+        raise BatchError(f'Unknown op {action}')
+    resource = operation.get('resource')
+    model = MODEL_MAP.get(resource)
+    if model is None:
+        raise BatchError(f'Unknown resource {resource}', 404)
+
+    if action == 'create':
+        ref = operation.get('ref')
+        if ref is not None and ref in refs:
+            raise BatchError(f'Duplicate reference {ref}')
+        data = operation.get('data') or {}
+        if isinstance(data, dict):
+            data = {name: resolve_ref(value, refs) for name, value in data.items()}
+        build = CREATORS.get(resource)
+        if build is None:
+            record = model(**batch_values(model, data))
+            db.session.add(record)
+        else:
+            # Same side effects as the POST endpoint, with values coerced as imports do
+            try:
+                record = build({**data, **batch_values(model, data, required=())})
+            except ValueError as exc:
+                raise BatchError(str(exc)) from None
+        db.session.flush()
+        if ref is not None:
+            refs[ref] = record.id
+        return {'status': 201, 'id': record.id}
+
+    ident = resolve_ref(operation.get('id'), refs)
+    if not isinstance(ident, int) or isinstance(ident, bool):
+        raise BatchError('Missing or invalid id')
+    if action == 'get':
+        # Read from the session, not the cache, so earlier writes are visible
+        view = VIEWS[resource]
+        try:
+            names = view.parse(operation.get('fields'), view.detail_fields)
+        except ValueError as exc:
+            raise BatchError(str(exc)) from None
+        row = db.session.execute(view.select(names).where(model.id == ident)).first()
+        if row is None:
+            raise BatchError('Not found', 404)
+        return {'status': 200, 'body': view.serialize(db.session, [row], names)[0]}
+
+    expected = operation.get('version')
+    record = db.session.get(model, ident, with_for_update=expected is not None)
+    if record is None:
+        raise BatchError('Not found', 404)
+    if expected is not None and record.version != expected:
+        raise BatchError('Precondition failed', 412)
+    if action == 'update':
+        data = operation.get('data') or {}
+        if isinstance(data, dict):
+            data = {name: resolve_ref(value, refs) for name, value in data.items()}
+        for name, value in batch_values(model, data, required=()).items():
+            setattr(record, name, value)
+        db.session.flush()
+        return {'status': 200, 'id': ident, 'version': record.version}
+    db.session.delete(record)
+    db.session.flush()
+    return {'status': 204}
+
+
+@api.route('/batch', methods=['POST'])
+def run_batch():
+    """Run an ordered list of operations in a single transaction.
+
+    The payload is ``{"operations": [...]}`` (or the bare list). Each
+    operation names an ``op`` (``create``, ``update``, ``delete`` or
+    ``get``) and a ``resource`` from ``MODEL_MAP``; all but ``create`` take
+    an ``id``. ``create`` and ``update`` take column values in ``data``, and
+    ``get`` accepts ``fields`` like the detail endpoints. ``update`` and
+    ``delete`` may give the record's expected ``version``, the batch
+    counterpart of ``If-Match``. A create with a
+    ``ref`` name can be referred to by later operations as
+    ``{"$ref": name}`` in place of its id or of any ``data`` value.
+
+    Creates go through the same helpers as the POST endpoints (``CREATORS``),
+    so e.g. tasks are queued for Google sync and projects link
+    ``product_ids``. Results come back in the same order. If any operation
+    fails, nothing is committed and the response gives the error and the
+    operation's index, which is ``null`` when the commit itself fails.
+    """
+    payload = request.get_json() or []
+    operations = payload.get('operations') if isinstance(payload, dict) else payload
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'Invalid payload'}), 400
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return jsonify({'error': f'At most {BATCH_MAX_OPERATIONS} operations per batch'}), 400
+    refs, results = {}, []
+    for index, operation in enumerate(operations):
+        try:
+            results.append(run_batch_operation(operation, refs))
+        except BatchError as exc:
+            db.session.rollback()
+            return jsonify({'error': str(exc), 'operation': index}), exc.status
+        except SQLAlchemyError as exc:
+            return batch_failed(exc, index)
+    try:
+        db.session.commit()
+    except SQLAlchemyError as exc:
+        # Deferred constraints are only checked now and belong to no one operation
+        return batch_failed(exc, None)
+    return jsonify({'results': results})
+
+
+def batch_failed(exc, index):
+    """Roll the batch back after a database error raised by operation ``index``."""
+    db.session.rollback()
+    error = str(exc.orig if hasattr(exc, 'orig') else exc)
+    return jsonify({'error': error, 'operation': index}), 400
+
+
+def activity_label(obj):
+    for attr in ('name', 'sku', 'description', 'text'):
+        value = getattr(obj, attr, None)
+        if value:
+            return str(value)[:256]
+    return None
+
+
+def log_activity(connection, entries):
+    """Append ``entries`` (dicts of Activity columns) to the activity log."""
+    if entries:
+        now = datetime.datetime.utcnow()
+        for entry in entries:
+            entry.setdefault('timestamp', now)
+        connection.execute(insert(Activity.__table__), entries)
+
+
+def bump_table_versions(connection, tables):
+    """Increment the change counter of each table in ``tables``."""
+    tables = sorted(set(tables))
+    if not tables:
+        return
+    version_table = TableVersion.__table__
+    result = connection.execute(
+        update(version_table)
+        .where(version_table.c.table_name.in_(tables))
+        .values(version=version_table.c.version + 1)
+    )
+    if result.rowcount < len(tables):
+        known = set(connection.execute(
+            select(version_table.c.table_name).where(version_table.c.table_name.in_(tables))
+        ).scalars())
+        connection.execute(insert(version_table), [
+            {'table_name': name, 'version': 1} for name in tables if name not in known
+        ])
+
+
+# Tables written by nearly every transaction. Their counters are bumped in a
+# short transaction of their own after commit (see invalidate_cache), so
+# writers do not queue on one row lock held until each of them commits.
+DEFERRED_VERSIONS = frozenset({Activity.__tablename__})
+
+
+def record_changes(session, connection, tables):
+    """Bump the versions of ``tables`` and remember them until commit."""
+    tables = set(tables)
+    bump_table_versions(connection, tables - DEFERRED_VERSIONS)
+    session.info.setdefault('changed_tables', set()).update(tables)
+
+
+def record_bulk_changes(tables):
+    """Account for Core writes to ``tables``, which bypass flush events."""
+    record_changes(db.session, db.session.connection(), tables)
+
+
+@event.listens_for(db.session, 'before_flush')
+def bump_record_versions(session, flush_context, instances):
+    """Increment ``version`` on every modified record about to be updated."""
+    for obj in session.dirty:
+        if isinstance(obj, Versioned) and session.is_modified(obj, include_collections=False):
+            obj.version = type(obj).version + 1
+
+
+@event.listens_for(db.session, 'after_flush')
+def track_changes(session, flush_context):
+    """Log activity and bump table versions for everything just flushed.
+
+    Every insert, update and delete of a MODEL_MAP record gets an activity
+    entry; every touched table gets its version bumped and is remembered so
+    its cache entries can be dropped once the transaction commits. System
+    writes, such as the sync worker storing Google ids, set
+    ``session.info['skip_activity']`` and are left out of the activity log.
+    """
+    entries = []
+    tables = set()
+    skip_activity = session.info.get('skip_activity', False)
+    for action, objs in (('create', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objs:
+            if action == 'update' and not session.is_modified(obj, include_collections=False):
+                continue
+            tables.add(obj.__table__.name)
+            resource = RESOURCE_NAMES.get(type(obj))
+            if not resource or skip_activity:
+                continue
+            entries.append({
+                'action': action,
+                'resource': resource,
+                'record_id': obj.id,
+                'label': activity_label(obj),
+            })
+    connection = session.connection()
+    log_activity(connection, entries)
+    if entries:
+        tables.add(Activity.__tablename__)
+    tables.discard(TableVersion.__tablename__)
+    record_changes(session, connection, tables)
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_cache(session):
+    """Bump the deferred table versions, then drop stale cache entries.
+
+    Deferred versions only move once the data they cover is visible, so a
+    cache entry or ETag is never built from old rows under a new version.
+    The write has already committed, so a failed bump is logged rather than
+    raised; this process's entries are dropped regardless, and the next
+    write bumps the version again. Changes to users or roles also clear the
+    credential cache.
+    """
+    tables = session.info.pop('changed_tables', None)
+    if tables:
+        deferred = tables & DEFERRED_VERSIONS
+        try:
+            if deferred:
+                with db.engine.begin() as connection:
+                    bump_table_versions(connection, deferred)
+        except SQLAlchemyError:
+            current_app.logger.exception(
+                'Could not bump versions of %s after commit', ', '.join(sorted(deferred)))
+        finally:
+            cache.invalidate(tables)
+            if not tables.isdisjoint(CREDENTIAL_TABLES):
+                credential_cache.clear()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_changes(session):
+    session.info.pop('changed_tables', None)
+
+
+def table_versions(tables):
+    """Return ``{table: version}`` for ``tables``; 0 for tables never written.
+
+    The versions read by :func:`conditional` are kept while its view runs,
+    so a view asking again for a subset costs no further query.
+    """
+    known = g.get('table_versions', {})
+    missing = set(tables) - known.keys()
+    if missing:
+        rows = db.session.execute(
+            select(TableVersion.table_name, TableVersion.version)
+            .where(TableVersion.table_name.in_(missing))
+        ).all()
+        known = {**known, **dict.fromkeys(missing, 0), **dict(rows)}
+        g.table_versions = known
+    return {name: known[name] for name in tables}
+
+
+def current_etag(digest):
+    """The ``If-None-Match`` tag that is still current for ``digest``, if any.
+
+    Tags are either the weak ``digest`` itself or, for detail records, the
+    strong ``<version>.<digest>``, either one possibly followed by the
+    ``-<coding>`` of a compressed response.
+    """
+    if request.if_none_match.star_tag:
+        return digest
+    for tag in request.if_none_match.as_set(include_weak=True):
+        if compression.strip_coding(tag).rpartition('.')[2] == digest:
+            return tag
+    return None
+
+
+def conditional(*tables, max_age=None):
+    """Serve GETs with an ETag derived from the versions of ``tables``.
+
+    A request whose ``If-None-Match`` still matches gets a 304 after a
+    single lookup in ``table_versions``, without running the view. Responses
+    must be revalidated unless ``max_age`` allows private caching.
+
+    A view can set its record's version as the ETag; it is then sent as the
+    strong ``"<version>.<digest>"``, which ``If-Match`` accepts for writes.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            try:
+                versions = sorted(table_versions(tables).items())
+                digest = hashlib.sha1(f'{request.full_path}|{versions}'.encode()).hexdigest()
+                tag = current_etag(digest)
+                if tag is not None:
+                    response = Response(status=304)
+                    response.set_etag(tag, weak='.' not in tag)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    version = response.get_etag()[0]
+                    if version:
+                        response.set_etag(f'{version}.{digest}')
+                    else:
+                        response.set_etag(digest, weak=True)
+            finally:
+                g.pop('table_versions', None)
+            if max_age is None:
+                response.cache_control.no_cache = True
+            else:
+                response.cache_control.private = True
+                response.cache_control.max_age = max_age
+            return response
+        return wrapper
+    return decorator
+
+
+def if_match_versions():
+    """Record versions listed in ``If-Match``, or ``None`` when any version will do.
+
+    Versions are sent as strong ETags: the ``"<version>.<digest>"`` of a
+    detail GET, or a bare ``"3"`` as returned by ``PUT``. Only the version
+    part is compared, so changes to related tables, or the content coding
+    the tag was sent with, do not refuse the write. Weak and malformed tags
+    can never match, as RFC 9110 requires.
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    tags = (compression.strip_coding(tag) for tag in request.if_match.as_set())
+    versions = (tag.partition('.')[0] for tag in tags)
+    return sorted(int(version) for version in versions if version.isdigit())
+
+
+def write_clause(table, ident):
+    """WHERE clause for a write to record ``ident``, guarded by ``If-Match`` if sent."""
+    clause = table.c.id == ident
+    versions = if_match_versions()
+    if versions is not None:
+        clause = and_(clause, table.c.version.in_(versions))
+    return clause, versions is not None
+
+
+def write_failed(table, ident, guarded):
+    """Respond to a write that matched no row: 412 if the record still exists, else 404."""
+    db.session.rollback()
+    if guarded and db.session.execute(select(table.c.id).where(table.c.id == ident)).first():
+        return jsonify({'error': 'Record was modified; fetch it again'}), 412
+    abort(404)
+
+
+def record_write(model, action, row, tables=()):
+    """Log activity and bump table versions for a Core write to one record."""
+    log_activity(db.session.connection(), [{
+        'action': action,
+        'resource': RESOURCE_NAMES[model],
+        'record_id': row.id,
+        'label': activity_label(row),
+    }])
+    record_bulk_changes([model.__tablename__, Activity.__tablename__, *tables])
+
+
+def create_response(build):
+    """Create a record from the request body with ``build`` and commit it.
+
+    ``build(data)`` adds the new record, and anything created along with
+    it, to the session and returns the record; it raises ``ValueError``
+    for invalid input.
+    """
+    try:
+        record = build(request.get_json() or {})
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
     db.session.commit()
-    return jsonify({'imported': count}), 201
+    return jsonify({'id': record.id}), 201
 
 
-@app.route('/recent', methods=['GET'])
-def recent_items():
-    """Return a list of recently added items across all models."""
-    items = []
-    for name, model in MODEL_MAP.items():
-        results = model.query.order_by(model.id.desc()).limit(5).all()
-        for obj in results:
-            record = serialize_record(obj)
-            record['_type'] = name
-            items.append(record)
-    items.sort(key=lambda x: x.get('id', 0), reverse=True)
-    return jsonify(items[:10])
-
-@app.route('/vendors', methods=['POST'])
-def create_vendor():
+def update_record(model, ident, fields):
+    """Apply the request body's ``fields`` to record ``ident`` in one statement.
+
+    Runs ``UPDATE ... WHERE id = ? [AND version IN (...)] RETURNING`` without
+    loading the record first, bumping its ``version``. Responds with the new
+    version, also sent as the ETag for the next ``If-Match``.
+    """
     data = request.get_json() or {}
+    rows, errors = validate_import_rows(model, [{f: data[f] for f in fields if f in data}], required=())
+    if errors:
+        return jsonify({'error': errors[0]['error']}), 400
+    values = rows[0][1]
+    table = model.__table__
+    clause, guarded = write_clause(table, ident)
+    if values:
+        stmt = update(table).where(clause).values({**values, 'version': table.c.version + 1}).returning(*table.c)
+    else:
+        stmt = select(*table.c).where(clause)
+    row = db.session.execute(stmt).first()
+    if row is None:
+        return write_failed(table, ident, guarded)
+    if values:
+        record_write(model, 'update', row)
+        db.session.commit()
+    response = jsonify({'id': row.id, 'version': row.version})
+    response.set_etag(str(row.version))
+    return response
+
+
+def detach_children(model, ident):
+    """Null out foreign keys pointing at record ``ident``, as an ORM delete would.
+
+    Covers the rows of ``model``'s one-to-many relationships; returns the
+    names of the tables touched.
+    """
+    tables = []
+    for relationship in model.__mapper__.relationships:
+        if relationship.direction is not ONETOMANY or relationship.viewonly:
+            continue
+        for _, remote in relationship.local_remote_pairs:
+            values = {remote.name: None}
+            if 'version' in remote.table.c:
+                values['version'] = remote.table.c.version + 1
+            db.session.execute(update(remote.table).where(remote == ident).values(values))
+            tables.append(remote.table.name)
+    return tables
+
+
+def delete_record(model, ident):
+    """Delete record ``ident`` without loading it, honouring ``If-Match``.
+
+    Foreign keys pointing at the record are nulled first (see
+    :func:`detach_children`), then one ``DELETE ... RETURNING`` removes it.
+    """
+    table = model.__table__
+    clause, guarded = write_clause(table, ident)
+    tables = detach_children(model, ident)
+    row = db.session.execute(delete(table).where(clause).returning(*table.c)).first()
+    if row is None:
+        return write_failed(table, ident, guarded)
+    record_write(model, 'delete', row, tables)
+    db.session.commit()
+    return '', 204
+
+
+@api.route('/recent', methods=['GET'])
+@conditional('activity')
+def recent_items():
+    """Return the most recent changes across all models."""
+    entries = Activity.query.order_by(Activity.timestamp.desc(), Activity.id.desc()).limit(10).all()
+    return jsonify([e.to_dict() for e in entries])
+
+
+SEARCH_MAX_LIMIT = 100
+
+
+@api.route('/search', methods=['GET'])
+@conditional(*search.SOURCES)
+def search_records():
+    """Ranked full-text search across clients, vendors, products, leads and notes.
+
+    ``?q=`` is required. Each word matches as a prefix and all of them must
+    match. ``?types=clients,notes`` narrows the resources searched. Results
+    are paginated like the list endpoints: ``?limit=`` (default 20) and the
+    returned ``next_cursor`` passed back as ``?after=``.
+    """
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'Missing query'}), 400
+    limit = request.args.get('limit', 20, type=int)
+    if not limit or limit < 1:
+        return jsonify({'error': 'Invalid limit'}), 400
+    limit = min(limit, SEARCH_MAX_LIMIT)
+    offset = 0
+    cursor = request.args.get('after')
+    if cursor:
+        offset = decode_cursor(cursor)
+        if offset is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    types = request.args.get('types')
+    resources = types.split(',') if types else None
+    rows = search.search(db.session.connection(), q, resources, limit, offset)
+    next_cursor = encode_cursor(offset + limit) if len(rows) > limit else None
+    return jsonify({'items': rows[:limit], 'next_cursor': next_cursor})
+
+DASHBOARD_MAX_AGE = int(os.getenv('DASHBOARD_MAX_AGE', '5'))
+
+
+@api.route('/dashboard', methods=['GET'])
+@conditional('projects', 'clients', 'contracts', 'contract_statuses', 'tasks', 'activity', max_age=DASHBOARD_MAX_AGE)
+def dashboard():
+    """Return everything the dashboard renders in one response.
+
+    Counts come from SQL aggregates and each list is capped at ``?limit=``
+    rows (default 50), so the payload no longer grows with the tables.
+    """
+    limit = min(request.args.get('limit', 50, type=int), MAX_PAGE_SIZE)
+    if limit < 1:
+        return jsonify({'error': 'Invalid limit'}), 400
+    open_task = or_(Task.completed.is_(False), Task.completed.is_(None))
+
+    counts = db.session.execute(select(
+        select(func.count()).select_from(Project).scalar_subquery().label('projects'),
+        select(func.count()).select_from(Contract).scalar_subquery().label('contracts'),
+        select(func.count()).select_from(Task).where(open_task).scalar_subquery().label('open_tasks'),
+    )).one()
+
+    # Each project shows the status of its most recent contract
+    latest = (
+        select(Contract.project_id, func.max(Contract.id).label('contract_id'))
+        .group_by(Contract.project_id)
+        .subquery()
+    )
+    latest_contract = aliased(Contract)
+    projects = db.session.execute(
+        select(Project.id, Project.name, Client.name, ContractStatus.name)
+        .outerjoin(Client, Project.client_id == Client.id)
+        .outerjoin(latest, latest.c.project_id == Project.id)
+        .outerjoin(latest_contract, latest_contract.id == latest.c.contract_id)
+        .outerjoin(ContractStatus, latest_contract.status_id == ContractStatus.id)
+        .order_by(Project.id)
+        .limit(limit)
+    ).all()
+
+    tasks = db.session.execute(
+        select(Task.id, Task.name, Task.due_date)
+        .where(open_task)
+        .order_by(Task.due_date.is_(None), Task.due_date, Task.id)
+        .limit(limit)
+    ).all()
+
+    contract_project = aliased(Project)
+    contracts = db.session.execute(
+        select(Contract.id, Contract.project_id, contract_project.name, Client.name, ContractStatus.name)
+        .outerjoin(contract_project, Contract.project_id == contract_project.id)
+        .outerjoin(Client, Contract.client_id == Client.id)
+        .outerjoin(ContractStatus, Contract.status_id == ContractStatus.id)
+        .order_by(Contract.id.desc())
+        .limit(limit)
+    ).all()
+
+    by_status = db.session.execute(
+        select(ContractStatus.name, func.count(Contract.id))
+        .select_from(Contract)
+        .outerjoin(ContractStatus, Contract.status_id == ContractStatus.id)
+        .group_by(ContractStatus.name)
+    ).all()
+
+    recent = Activity.query.order_by(Activity.timestamp.desc(), Activity.id.desc()).limit(10).all()
+
+    return jsonify({
+        'projects': {
+            'count': counts.projects,
+            'items': [
+                {'id': pid, 'name': name, 'client': client, 'status': status}
+                for pid, name, client, status in projects
+            ],
+        },
+        'tasks': {
+            'open': counts.open_tasks,
+            'items': [
+                {'id': tid, 'name': name, 'due_date': due.isoformat() if due else None}
+                for tid, name, due in tasks
+            ],
+        },
+        'contracts': {
+            'count': counts.contracts,
+            'by_status': {status or 'None': n for status, n in by_status},
+            'items': [
+                {'id': cid, 'project_id': project_id, 'project': project, 'client': client, 'status': status}
+                for cid, project_id, project, client, status in contracts
+            ],
+        },
+        'recent': [e.to_dict() for e in recent],
+    })
+
+
+def new_vendor(data):
     name = data.get('name')
     if not name:
-        return jsonify({'error': 'Invalid input'}), 400
+        raise ValueError('Invalid input')
     vendor = Vendor(
         name=name,
         contact_info=data.get('contact_info'),
@@ -188,49 +1363,43 @@ def create_vendor():
         tax_id=data.get('tax_id'),
     )
     db.session.add(vendor)
-    db.session.commit()
-    return jsonify({'id': vendor.id}), 201
+    return vendor
 
 
-@app.route('/vendors', methods=['GET'])
+@api.route('/vendors', methods=['POST'])
+def create_vendor():
+    return create_response(new_vendor)
+
+
+@api.route('/vendors', methods=['GET'])
+@conditional('vendors', 'products')
 def list_vendors():
-    vendors = Vendor.query.all()
-    return jsonify([v.to_dict() for v in vendors])
+    return list_response(VIEWS['vendors'])
 
 
-@app.route('/vendors/<int:vendor_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/vendors/<int:vendor_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('vendors', 'products')
 def handle_vendor(vendor_id):
-    vendor = Vendor.query.get_or_404(vendor_id)
     if request.method == 'GET':
-        return jsonify(vendor.to_dict())
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in [
+        return detail_response(VIEWS['vendors'], vendor_id)
+    if request.method == 'PUT':
+        return update_record(Vendor, vendor_id, [
             'name', 'contact_info', 'first_name', 'last_name', 'primary_email',
             'secondary_email', 'primary_phone', 'secondary_phone', 'description',
             'address1', 'address2', 'city', 'state', 'zip_code', 'tax_id'
-        ]:
-            if field in data:
-                setattr(vendor, field, data[field])
-        db.session.commit()
-        return jsonify({'id': vendor.id})
-    else:
-        db.session.delete(vendor)
-        db.session.commit()
-        return '', 204
+        ])
+    return delete_record(Vendor, vendor_id)
 
 
-@app.route('/products', methods=['GET'])
+@api.route('/products', methods=['GET'])
+@conditional('products', 'vendors')
 def list_products():
-    products = Product.query.all()
-    return jsonify([p.to_dict() for p in products])
+    return list_response(VIEWS['products'])
 
 
-@app.route('/products', methods=['POST'])
-def create_product():
-    data = request.get_json() or {}
+def new_product(data):
     if not data.get('sku') or not data.get('name'):
-        return jsonify({'error': 'Invalid input'}), 400
+        raise ValueError('Invalid input')
     product = Product(
         sku=data['sku'],
         name=data['name'],
@@ -238,44 +1407,32 @@ def create_product():
         vendor_id=data.get('vendor_id')
     )
     db.session.add(product)
-    db.session.commit()
-    return jsonify({'id': product.id}), 201
+    return product
 
 
-@app.route('/products/<int:product_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/products', methods=['POST'])
+def create_product():
+    return create_response(new_product)
+
+
+@api.route('/products/<int:product_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('products', 'vendors')
 def handle_product(product_id):
-    product = Product.query.get_or_404(product_id)
     if request.method == 'GET':
-        return jsonify({
-            'id': product.id,
-            'sku': product.sku,
-            'name': product.name,
-            'price': str(product.price) if product.price else None,
-            'vendor_id': product.vendor_id,
-        })
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in ['sku', 'name', 'price', 'vendor_id']:
-            if field in data:
-                setattr(product, field, data[field])
-        db.session.commit()
-        return jsonify({'id': product.id})
-    else:
-        db.session.delete(product)
-        db.session.commit()
-        return '', 204
+        return detail_response(VIEWS['products'], product_id)
+    if request.method == 'PUT':
+        return update_record(Product, product_id, ['sku', 'name', 'price', 'vendor_id'])
+    return delete_record(Product, product_id)
 
 
-@app.route('/clients', methods=['POST'])
-def create_client():
-    data = request.get_json() or {}
+def new_client(data):
     name = data.get('name')
     if not name:
-        fn = data.get('first_name', '')
-        ln = data.get('last_name', '')
+        fn = data.get('first_name') or ''
+        ln = data.get('last_name') or ''
         name = f"{fn} {ln}".strip()
     if not name:
-        return jsonify({'error': 'Invalid input'}), 400
+        raise ValueError('Invalid input')
     client = Client(
         name=name,
         first_name=data.get('first_name'),
@@ -289,70 +1446,37 @@ def create_client():
         contact_info=data.get('contact_info')
     )
     db.session.add(client)
-    db.session.commit()
-    return jsonify({'id': client.id}), 201
+    return client
+
+
+@api.route('/clients', methods=['POST'])
+def create_client():
+    return create_response(new_client)
 
 
-@app.route('/clients', methods=['GET'])
+@api.route('/clients', methods=['GET'])
+@conditional('clients', 'employees')
 def list_clients():
-    clients = Client.query.all()
-    return jsonify([
-        {
-            'id': c.id,
-            'name': c.name,
-            'first_name': c.first_name,
-            'last_name': c.last_name,
-            'primary_phone': c.primary_phone,
-            'primary_email': c.primary_email,
-            'secondary_phone': c.secondary_phone,
-            'secondary_email': c.secondary_email,
-            'referral_type': c.referral_type,
-            'employee': c.employee.name if c.employee else None,
-            'contact_info': c.contact_info
-        }
-        for c in clients
-    ])
+    return list_response(VIEWS['clients'])
 
 
-@app.route('/clients/<int:client_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/clients/<int:client_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('clients', 'employees')
 def handle_client(client_id):
-    client = Client.query.get_or_404(client_id)
     if request.method == 'GET':
-        return jsonify({
-            'id': client.id,
-            'name': client.name,
-            'first_name': client.first_name,
-            'last_name': client.last_name,
-            'primary_phone': client.primary_phone,
-            'primary_email': client.primary_email,
-            'secondary_phone': client.secondary_phone,
-            'secondary_email': client.secondary_email,
-            'referral_type': client.referral_type,
-            'employee_id': client.employee_id,
-            'contact_info': client.contact_info,
-        })
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in [
+        return detail_response(VIEWS['clients'], client_id)
+    if request.method == 'PUT':
+        return update_record(Client, client_id, [
             'name', 'first_name', 'last_name', 'primary_phone', 'primary_email',
             'secondary_phone', 'secondary_email', 'referral_type', 'employee_id',
             'contact_info'
-        ]:
-            if field in data:
-                setattr(client, field, data[field])
-        db.session.commit()
-        return jsonify({'id': client.id})
-    else:
-        db.session.delete(client)
-        db.session.commit()
-        return '', 204
+        ])
+    return delete_record(Client, client_id)
 
-@app.route('/projects', methods=['POST'])
-def create_project():
-    data = request.get_json() or {}
+def new_project(data):
     name = data.get('name')
     if not name:
-        return jsonify({'error': 'Invalid input'}), 400
+        raise ValueError('Invalid input')
     project = Project(
         name=name,
         description=data.get('description'),
@@ -360,120 +1484,73 @@ def create_project():
         client_id=data.get('client_id')
     )
     db.session.add(project)
-    db.session.commit()
-    for pid in data.get('product_ids', []):
+    db.session.flush()
+    for pid in data.get('product_ids') or []:
         db.session.add(ProductProject(product_id=pid, project_id=project.id))
-    db.session.commit()
-    return jsonify({'id': project.id}), 201
+    return project
+
+
+@api.route('/projects', methods=['POST'])
+def create_project():
+    return create_response(new_project)
 
-@app.route('/projects', methods=['GET'])
+@api.route('/projects', methods=['GET'])
+@conditional('projects', 'clients', 'product_projects', 'products')
 def list_projects():
-    projects = Project.query.all()
-    result = []
-    for p in projects:
-        products = ProductProject.query.filter_by(project_id=p.id).all()
-        result.append({
-            'id': p.id,
-            'name': p.name,
-            'description': p.description,
-            'start_date': p.start_date.isoformat() if p.start_date else None,
-            'client': p.client.name if p.client else None,
-            'products': [
-                {
-                    'id': pp.product.id,
-                    'name': pp.product.name,
-                    'quantity': pp.quantity
-                } for pp in products
-            ]
-        })
-    return jsonify(result)
-
-
-@app.route('/projects/<int:project_id>', methods=['GET', 'PUT', 'DELETE'])
+    return list_response(VIEWS['projects'])
+
+
+@api.route('/projects/<int:project_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('projects', 'clients', 'product_projects', 'products')
 def handle_project(project_id):
-    project = Project.query.get_or_404(project_id)
     if request.method == 'GET':
-        return jsonify({
-            'id': project.id,
-            'name': project.name,
-            'description': project.description,
-            'start_date': project.start_date.isoformat() if project.start_date else None,
-            'client_id': project.client_id,
-        })
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in ['name', 'description', 'start_date', 'client_id']:
-            if field in data:
-                setattr(project, field, data[field])
-        db.session.commit()
-        return jsonify({'id': project.id})
-    else:
-        db.session.delete(project)
-        db.session.commit()
-        return '', 204
+        return detail_response(VIEWS['projects'], project_id)
+    if request.method == 'PUT':
+        return update_record(Project, project_id, ['name', 'description', 'start_date', 'client_id'])
+    return delete_record(Project, project_id)
 
-@app.route('/leadstages', methods=['GET'])
+@api.route('/leadstages', methods=['GET'])
+@conditional('lead_stages')
 def list_lead_stages():
-    stages = LeadStage.query.all()
-    return jsonify([{'id': s.id, 'name': s.name} for s in stages])
+    return cached_list(VIEWS['leadstages'])
 
-@app.route('/leads', methods=['POST'])
-def create_lead():
-    data = request.get_json() or {}
+def new_lead(data):
     name = data.get('name')
     stage_id = data.get('stage_id')
     if not name or not stage_id:
-        return jsonify({'error': 'Invalid input'}), 400
+        raise ValueError('Invalid input')
     lead = Lead(name=name, contact_info=data.get('contact_info'), stage_id=stage_id)
     db.session.add(lead)
-    db.session.commit()
-    return jsonify({'id': lead.id}), 201
+    return lead
 
-@app.route('/leads', methods=['GET'])
+
+@api.route('/leads', methods=['POST'])
+def create_lead():
+    return create_response(new_lead)
+
+@api.route('/leads', methods=['GET'])
+@conditional('leads', 'lead_stages')
 def list_leads():
-    leads = Lead.query.all()
-    return jsonify([
-        {
-            'id': l.id,
-            'name': l.name,
-            'contact_info': l.contact_info,
-            'stage': l.stage.name if l.stage else None
-        } for l in leads
-    ])
-
-
-@app.route('/leads/<int:lead_id>', methods=['GET', 'PUT', 'DELETE'])
+    return list_response(VIEWS['leads'])
+
+
+@api.route('/leads/<int:lead_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('leads', 'lead_stages')
 def handle_lead(lead_id):
-    lead = Lead.query.get_or_404(lead_id)
     if request.method == 'GET':
-        return jsonify({
-            'id': lead.id,
-            'name': lead.name,
-            'contact_info': lead.contact_info,
-            'stage_id': lead.stage_id,
-        })
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in ['name', 'contact_info', 'stage_id']:
-            if field in data:
-                setattr(lead, field, data[field])
-        db.session.commit()
-        return jsonify({'id': lead.id})
-    else:
-        db.session.delete(lead)
-        db.session.commit()
-        return '', 204
+        return detail_response(VIEWS['leads'], lead_id)
+    if request.method == 'PUT':
+        return update_record(Lead, lead_id, ['name', 'contact_info', 'stage_id'])
+    return delete_record(Lead, lead_id)
 
 
-@app.route('/contractstatuses', methods=['GET'])
+@api.route('/contractstatuses', methods=['GET'])
+@conditional('contract_statuses')
 def list_contract_statuses():
-    statuses = ContractStatus.query.all()
-    return jsonify([{'id': s.id, 'name': s.name} for s in statuses])
+    return cached_list(VIEWS['contractstatuses'])
 
 
-@app.route('/contracts', methods=['POST'])
-def create_contract():
-    data = request.get_json() or {}
+def new_contract(data):
     contract = Contract(
         client_id=data.get('client_id'),
         employee_id=data.get('employee_id'),
@@ -485,65 +1562,37 @@ def create_contract():
         amount=data.get('amount'),
     )
     db.session.add(contract)
-    db.session.commit()
-    return jsonify({'id': contract.id}), 201
+    return contract
 
 
-@app.route('/contracts', methods=['GET'])
+@api.route('/contracts', methods=['POST'])
+def create_contract():
+    return create_response(new_contract)
+
+
+@api.route('/contracts', methods=['GET'])
+@conditional('contracts', 'clients', 'employees', 'projects', 'leads', 'contract_statuses')
 def list_contracts():
-    contracts = Contract.query.all()
-    return jsonify([
-        {
-            'id': c.id,
-            'client': c.client.name if c.client else None,
-            'employee': c.employee.name if c.employee else None,
-            'project': c.project.name if c.project else None,
-            'project_id': c.project_id,
-            'lead': c.lead.name if c.lead else None,
-            'status': c.status.name if c.status else None,
-            'amount': str(c.amount) if c.amount else None,
-        }
-        for c in contracts
-    ])
+    return list_response(VIEWS['contracts'])
 
 
-@app.route('/contracts/<int:contract_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/contracts/<int:contract_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('contracts', 'clients', 'employees', 'projects', 'leads', 'contract_statuses')
 def handle_contract(contract_id):
-    contract = Contract.query.get_or_404(contract_id)
     if request.method == 'GET':
-        return jsonify({
-            'id': contract.id,
-            'client_id': contract.client_id,
-            'employee_id': contract.employee_id,
-            'project_id': contract.project_id,
-            'lead_id': contract.lead_id,
-            'status_id': contract.status_id,
-            'start_date': contract.start_date.isoformat() if contract.start_date else None,
-            'end_date': contract.end_date.isoformat() if contract.end_date else None,
-            'amount': str(contract.amount) if contract.amount else None,
-        })
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in [
+        return detail_response(VIEWS['contracts'], contract_id)
+    if request.method == 'PUT':
+        return update_record(Contract, contract_id, [
             'client_id', 'employee_id', 'project_id', 'lead_id',
             'status_id', 'start_date', 'end_date', 'amount'
-        ]:
-            if field in data:
-                setattr(contract, field, data[field])
-        db.session.commit()
-        return jsonify({'id': contract.id})
-    else:
-        db.session.delete(contract)
-        db.session.commit()
-        return '', 204
+        ])
+    return delete_record(Contract, contract_id)
 
 
-@app.route('/tasks', methods=['POST'])
-def create_task():
-    data = request.get_json() or {}
+def new_task(data):
     name = data.get('name')
     if not name:
-        return jsonify({'error': 'Invalid input'}), 400
+        raise ValueError('Invalid input')
     task = Task(
         name=name,
         due_date=data.get('due_date'),
@@ -551,251 +1600,214 @@ def create_task():
         contract_id=data.get('contract_id'),
     )
     db.session.add(task)
-    db.session.commit()
-    sync_task_to_google(task)
-    return jsonify({'id': task.id}), 201
+    google_sync.enqueue_task_sync(task)
+    return task
+
+
+@api.route('/tasks', methods=['POST'])
+def create_task():
+    return create_response(new_task)
 
 
-@app.route('/tasks', methods=['GET'])
+@api.route('/tasks', methods=['GET'])
+@conditional('tasks')
 def list_tasks():
-    tasks = Task.query.all()
-    return jsonify([
-        {
-            'id': t.id,
-            'name': t.name,
-            'completed': t.completed,
-            'due_date': t.due_date.isoformat() if t.due_date else None,
-            'contract_id': t.contract_id,
-        }
-        for t in tasks
-    ])
+    return list_response(VIEWS['tasks'])
 
 
-@app.route('/tasks/<int:task_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/tasks/<int:task_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('tasks')
 def handle_task(task_id):
-    task = Task.query.get_or_404(task_id)
     if request.method == 'GET':
-        return jsonify({
-            'id': task.id,
-            'name': task.name,
-            'completed': task.completed,
-            'due_date': task.due_date.isoformat() if task.due_date else None,
-            'contract_id': task.contract_id,
-        })
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in ['name', 'completed', 'due_date', 'contract_id']:
-            if field in data:
-                setattr(task, field, data[field])
-        db.session.commit()
-        return jsonify({'id': task.id})
-    else:
-        db.session.delete(task)
-        db.session.commit()
-        return '', 204
+        return detail_response(VIEWS['tasks'], task_id)
+    if request.method == 'PUT':
+        return update_record(Task, task_id, ['name', 'completed', 'due_date', 'contract_id'])
+    return delete_record(Task, task_id)
 
-@app.route('/employees', methods=['GET'])
+@api.route('/employees', methods=['GET'])
+@conditional('employees')
 def list_employees():
-    employees = Employee.query.all()
-    return jsonify([{'id': e.id, 'name': e.name} for e in employees])
+    return cached_list(VIEWS['employees'])
 
 
-@app.route('/employees/<int:employee_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/employees/<int:employee_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('employees')
 def handle_employee(employee_id):
-    employee = Employee.query.get_or_404(employee_id)
     if request.method == 'GET':
-        return jsonify({'id': employee.id, 'name': employee.name})
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        if 'name' in data:
-            employee.name = data['name']
-            db.session.commit()
-        return jsonify({'id': employee.id})
-    else:
-        db.session.delete(employee)
-        db.session.commit()
-        return '', 204
+        return detail_response(VIEWS['employees'], employee_id)
+    if request.method == 'PUT':
+        return update_record(Employee, employee_id, ['name'])
+    return delete_record(Employee, employee_id)
 
 # -------------------- New Models --------------------
 
-@app.route('/rooms', methods=['POST'])
-def create_room():
-    data = request.get_json() or {}
+def new_room(data):
     name = data.get('name')
     if not name:
-        return jsonify({'error': 'Invalid input'}), 400
+        raise ValueError('Invalid input')
     room = Room(name=name, project_id=data.get('project_id'))
     db.session.add(room)
-    db.session.commit()
-    return jsonify({'id': room.id}), 201
+    return room
+
+
+@api.route('/rooms', methods=['POST'])
+def create_room():
+    return create_response(new_room)
 
 
-@app.route('/rooms', methods=['GET'])
+@api.route('/rooms', methods=['GET'])
+@conditional('rooms', 'projects')
 def list_rooms():
-    rooms = Room.query.all()
-    return jsonify([r.to_dict() for r in rooms])
+    return list_response(VIEWS['rooms'])
 
 
-@app.route('/rooms/<int:room_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/rooms/<int:room_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('rooms', 'projects')
 def handle_room(room_id):
-    room = Room.query.get_or_404(room_id)
     if request.method == 'GET':
-        return jsonify(room.to_dict())
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in ['name', 'project_id']:
-            if field in data:
-                setattr(room, field, data[field])
-        db.session.commit()
-        return jsonify({'id': room.id})
-    else:
-        db.session.delete(room)
-        db.session.commit()
-        return '', 204
+        return detail_response(VIEWS['rooms'], room_id)
+    if request.method == 'PUT':
+        return update_record(Room, room_id, ['name', 'project_id'])
+    return delete_record(Room, room_id)
 
 
-@app.route('/items', methods=['POST'])
-def create_item():
-    data = request.get_json() or {}
+def new_item(data):
     name = data.get('name')
     if not name:
-        return jsonify({'error': 'Invalid input'}), 400
+        raise ValueError('Invalid input')
     item = Item(name=name, room_id=data.get('room_id'))
     db.session.add(item)
-    db.session.commit()
-    return jsonify({'id': item.id}), 201
+    return item
 
 
-@app.route('/items', methods=['GET'])
+@api.route('/items', methods=['POST'])
+def create_item():
+    return create_response(new_item)
+
+
+@api.route('/items', methods=['GET'])
+@conditional('items', 'rooms')
 def list_items():
-    items = Item.query.all()
-    return jsonify([i.to_dict() for i in items])
+    return list_response(VIEWS['items'])
 
 
-@app.route('/items/<int:item_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/items/<int:item_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('items', 'rooms')
 def handle_item(item_id):
-    item = Item.query.get_or_404(item_id)
     if request.method == 'GET':
-        return jsonify(item.to_dict())
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in ['name', 'room_id']:
-            if field in data:
-                setattr(item, field, data[field])
-        db.session.commit()
-        return jsonify({'id': item.id})
-    else:
-        db.session.delete(item)
-        db.session.commit()
-        return '', 204
+        return detail_response(VIEWS['items'], item_id)
+    if request.method == 'PUT':
+        return update_record(Item, item_id, ['name', 'room_id'])
+    return delete_record(Item, item_id)
 
 
-@app.route('/proposals', methods=['POST'])
-def create_proposal():
-    data = request.get_json() or {}
+def new_proposal(data):
     proposal = Proposal(project_id=data.get('project_id'), description=data.get('description'))
     db.session.add(proposal)
-    db.session.commit()
-    return jsonify({'id': proposal.id}), 201
+    return proposal
+
+
+@api.route('/proposals', methods=['POST'])
+def create_proposal():
+    return create_response(new_proposal)
 
 
-@app.route('/proposals', methods=['GET'])
+@api.route('/proposals', methods=['GET'])
+@conditional('proposals', 'projects')
 def list_proposals():
-    proposals = Proposal.query.all()
-    return jsonify([p.to_dict() for p in proposals])
+    return list_response(VIEWS['proposals'])
 
 
-@app.route('/proposals/<int:proposal_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/proposals/<int:proposal_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('proposals', 'projects')
 def handle_proposal(proposal_id):
-    proposal = Proposal.query.get_or_404(proposal_id)
     if request.method == 'GET':
-        return jsonify(proposal.to_dict())
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in ['project_id', 'description']:
-            if field in data:
-                setattr(proposal, field, data[field])
-        db.session.commit()
-        return jsonify({'id': proposal.id})
-    else:
-        db.session.delete(proposal)
-        db.session.commit()
-        return '', 204
+        return detail_response(VIEWS['proposals'], proposal_id)
+    if request.method == 'PUT':
+        return update_record(Proposal, proposal_id, ['project_id', 'description'])
+    return delete_record(Proposal, proposal_id)
 
 
-@app.route('/invoices', methods=['POST'])
-def create_invoice():
-    data = request.get_json() or {}
+def new_invoice(data):
     invoice = Invoice(proposal_id=data.get('proposal_id'), amount=data.get('amount'))
     db.session.add(invoice)
-    db.session.commit()
-    return jsonify({'id': invoice.id}), 201
+    return invoice
 
 
-@app.route('/invoices', methods=['GET'])
+@api.route('/invoices', methods=['POST'])
+def create_invoice():
+    return create_response(new_invoice)
+
+
+@api.route('/invoices', methods=['GET'])
+@conditional('invoices')
 def list_invoices():
-    invoices = Invoice.query.all()
-    return jsonify([inv.to_dict() for inv in invoices])
+    return list_response(VIEWS['invoices'])
 
 
-@app.route('/invoices/<int:invoice_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/invoices/<int:invoice_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('invoices')
 def handle_invoice(invoice_id):
-    invoice = Invoice.query.get_or_404(invoice_id)
     if request.method == 'GET':
-        return jsonify(invoice.to_dict())
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in ['proposal_id', 'amount']:
-            if field in data:
-                setattr(invoice, field, data[field])
-        db.session.commit()
-        return jsonify({'id': invoice.id})
-    else:
-        db.session.delete(invoice)
-        db.session.commit()
-        return '', 204
+        return detail_response(VIEWS['invoices'], invoice_id)
+    if request.method == 'PUT':
+        return update_record(Invoice, invoice_id, ['proposal_id', 'amount'])
+    return delete_record(Invoice, invoice_id)
 
 
-@app.route('/notes', methods=['POST'])
-def create_note():
-    data = request.get_json() or {}
+def new_note(data):
     text = data.get('text')
     if not text:
-        return jsonify({'error': 'Invalid input'}), 400
+        raise ValueError('Invalid input')
     note = Note(text=text, project_id=data.get('project_id'))
     db.session.add(note)
-    db.session.commit()
-    return jsonify({'id': note.id}), 201
+    return note
+
+
+@api.route('/notes', methods=['POST'])
+def create_note():
+    return create_response(new_note)
 
 
-@app.route('/notes', methods=['GET'])
+@api.route('/notes', methods=['GET'])
+@conditional('notes', 'projects')
 def list_notes():
-    notes = Note.query.all()
-    return jsonify([n.to_dict() for n in notes])
+    return list_response(VIEWS['notes'])
 
 
-@app.route('/notes/<int:note_id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/notes/<int:note_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional('notes', 'projects')
 def handle_note(note_id):
-    note = Note.query.get_or_404(note_id)
     if request.method == 'GET':
-        return jsonify(note.to_dict())
-    elif request.method == 'PUT':
-        data = request.get_json() or {}
-        for field in ['text', 'project_id']:
-            if field in data:
-                setattr(note, field, data[field])
-        db.session.commit()
-        return jsonify({'id': note.id})
-    else:
-        db.session.delete(note)
-        db.session.commit()
-        return '', 204
+        return detail_response(VIEWS['notes'], note_id)
+    if request.method == 'PUT':
+        return update_record(Note, note_id, ['text', 'project_id'])
+    return delete_record(Note, note_id)
+
+
+# Resource create logic shared by the POST endpoints and /batch; resources
+# without an entry are created straight from their column values
+CREATORS = {
+    'vendors': new_vendor,
+    'products': new_product,
+    'clients': new_client,
+    'projects': new_project,
+    'leads': new_lead,
+    'contracts': new_contract,
+    'tasks': new_task,
+    'rooms': new_room,
+    'items': new_item,
+    'proposals': new_proposal,
+    'invoices': new_invoice,
+    'notes': new_note,
+}
 
 def create_tables_with_retry(retries: int = 5, delay: int = 2):
     """Create all tables, retrying if the database isn't ready."""
     for attempt in range(1, retries + 1):
         try:
             db.create_all()
+            run_migrations(db.engine)
             return True
         except OperationalError as exc:
             print(
@@ -806,20 +1818,60 @@ def create_tables_with_retry(retries: int = 5, delay: int = 2):
     return False
 
 
-if __name__ == '__main__':
+
+def seed_lookup_tables():
+    """Insert the default lead stages, employees and contract statuses."""
+    if LeadStage.query.count() == 0:
+        for name in ['New', 'Follow-Up', 'Sold', 'Lost']:
+            db.session.add(LeadStage(name=name))
+        db.session.commit()
+    if Employee.query.count() == 0:
+        for name in ['Stephanie Scher', 'Sable Murphy', 'Jennifer Stewart', 'Daniel Murphy']:
+            db.session.add(Employee(name=name))
+        db.session.commit()
+    if ContractStatus.query.count() == 0:
+        for name in ['Draft', 'Active', 'Completed']:
+            db.session.add(ContractStatus(name=name))
+        db.session.commit()
+
+
+def init_database(app):
+    """Create tables, apply migrations and seed lookups; run once per deploy."""
     with app.app_context():
         if not create_tables_with_retry():
-            exit(1)
-        if LeadStage.query.count() == 0:
-            for name in ['New', 'Follow-Up', 'Sold', 'Lost']:
-                db.session.add(LeadStage(name=name))
-            db.session.commit()
-        if Employee.query.count() == 0:
-            for name in ['Stephanie Scher', 'Sable Murphy', 'Jennifer Stewart', 'Daniel Murphy']:
-                db.session.add(Employee(name=name))
-            db.session.commit()
-        if ContractStatus.query.count() == 0:
-            for name in ['Draft', 'Active', 'Completed']:
-                db.session.add(ContractStatus(name=name))
-            db.session.commit()
+            return False
+        seed_lookup_tables()
+    return True
+
+
+def create_app(config=None):
+    """Build the Flask application; ``config`` overrides environment settings."""
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.config.update(config_from_env())
+    if config:
+        app.config.update(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    CORS(app)
+    db.init_app(app)
+    bcrypt.init_app(app)
+    instrumentation.init_app(app)
+    metrics.init_app(app)
+    compression.init_app(app)
+    credential_cache.maxsize = app.config['CREDENTIAL_CACHE_SIZE']
+    credential_cache.ttl = app.config['CREDENTIAL_CACHE_TTL']
+    app.register_blueprint(api)
+    if not app.config.get('SECRET_KEY') and not (app.debug or app.testing):
+        app.logger.warning('SECRET_KEY is not set; /login and bearer tokens are disabled')
+    return app
+
+
+app = create_app()
+
+
+if __name__ == '__main__':
+    if not init_database(app):
+        exit(1)
+    if google_sync.sync_enabled():
+        google_sync.worker_from_env(app).start()
     app.run(host='0.0.0.0', port=5000)
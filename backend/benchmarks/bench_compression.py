@@ -0,0 +1,163 @@
+"""Bandwidth against CPU for each response encoding at realistic payload sizes.
+
+Usage (from ``backend/``)::
+
+    python benchmarks/bench_compression.py --scale 10000
+    python benchmarks/bench_compression.py --scale 100000 --bandwidth 5 50 500 --output compression.json
+
+The schema is filled by ``datagen.generate`` in a throwaway SQLite file.
+Uncompressed bodies are then fetched for the large list endpoints and for an
+NDJSON export. Each body is compressed with every available encoder at its
+normal and fast level (``compression.ENCODERS``). The export is compressed
+chunk by chunk with a flush after each chunk, as the streaming path does.
+
+For each combination the report gives the compressed size, the ratio, the
+median CPU time and throughput, and the total time to deliver the body
+(CPU time plus transfer) at each ``--bandwidth`` in Mbit/s. The fastest
+option per bandwidth is listed at the end. The throughput figures are the
+ones used to seed ``compression.Encoder.rates``.
+"""
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+import werkzeug
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '0'
+
+from datagen import generate
+
+LIST_PATHS = ['/projects', '/contracts', '/clients', '/products?limit=100']
+EXPORT_TABLE = 'clients'
+EXPORT_CHUNK_ROWS = 1000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--bandwidth', type=float, nargs='+', default=[10, 100, 1000],
+                        help='link speeds in Mbit/s')
+    parser.add_argument('--output', help='write the JSON report here')
+    return parser.parse_args()
+
+
+def fetch_payloads(app, db, cache, scale):
+    """Return ``{name: [chunks]}`` of uncompressed response bodies."""
+    app.config['COMPRESS'] = False
+    app.config['SLOW_QUERY_MS'] = app.config['SLOW_REQUEST_MS'] = float('inf')
+    payloads = {}
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generate(db.engine, scale)
+        client = app.test_client()
+        for path in LIST_PATHS:
+            cache.clear()
+            payloads[f'GET {path}'] = [client.get(path).get_data()]
+        lines = client.get(f'/export/{EXPORT_TABLE}?format=ndjson').get_data().splitlines(keepends=True)
+        payloads[f'GET /export/{EXPORT_TABLE}?format=ndjson (streamed)'] = [
+            b''.join(lines[i:i + EXPORT_CHUNK_ROWS]) for i in range(0, len(lines), EXPORT_CHUNK_ROWS)
+        ]
+    return payloads
+
+
+def compress(encoder, level, chunks):
+    if len(chunks) == 1:
+        return encoder.compress(chunks[0], level)
+    compress_chunk, finish = encoder.stream(level)
+    return b''.join(compress_chunk(chunk) for chunk in chunks) + finish()
+
+
+def measure(encoder, level, chunks, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.thread_time()
+        body = compress(encoder, level, chunks)
+        timings.append(time.thread_time() - started)
+    return len(body), statistics.median(timings)
+
+
+def transfer_ms(size, mbits):
+    return size * 8 / (mbits * 1e6) * 1000
+
+
+def run(payloads, encoders, repeat, bandwidths):
+    results = []
+    for name, chunks in payloads.items():
+        raw = sum(len(chunk) for chunk in chunks)
+        options = [('identity', None, raw, 0.0)]
+        for encoder in encoders:
+            for level in sorted({encoder.level, encoder.fast_level}, reverse=True):
+                size, seconds = measure(encoder, level, chunks, repeat)
+                options.append((encoder.name, level, size, seconds))
+        for encoding, level, size, seconds in options:
+            results.append({
+                'payload': name,
+                'encoding': encoding,
+                'level': level,
+                'bytes': size,
+                'raw_bytes': raw,
+                'ratio': round(raw / size, 2),
+                'cpu_ms': round(seconds * 1000, 3),
+                'mb_per_s': round(raw / seconds / 1e6, 1) if seconds else None,
+                'total_ms': {
+                    str(mbits): round(seconds * 1000 + transfer_ms(size, mbits), 2) for mbits in bandwidths
+                },
+            })
+    return results
+
+
+def print_report(results, bandwidths, out=sys.stdout):
+    header = ''.join(f'{f"@{mbits:g}Mbit":>12}' for mbits in bandwidths)
+    current = None
+    for row in results:
+        if row['payload'] != current:
+            current = row['payload']
+            print(f"\n{current} ({row['raw_bytes'] / 1024:.0f} KB)", file=out)
+            print(f"{'encoding':<12} {'KB':>9} {'ratio':>6} {'cpu ms':>8} {'MB/s':>7}{header}", file=out)
+        label = row['encoding'] if row['level'] is None else f"{row['encoding']}-{row['level']}"
+        speed = '' if row['mb_per_s'] is None else f"{row['mb_per_s']:.0f}"
+        totals = ''.join(f"{row['total_ms'][str(mbits)]:>12.1f}" for mbits in bandwidths)
+        print(f"{label:<12} {row['bytes'] / 1024:>9.1f} {row['ratio']:>6.1f} {row['cpu_ms']:>8.2f} "
+              f"{speed:>7}{totals}", file=out)
+
+    print('\nfastest delivery (cpu + transfer):', file=out)
+    payloads = list(dict.fromkeys(row['payload'] for row in results))
+    for name in payloads:
+        rows = [row for row in results if row['payload'] == name]
+        best = []
+        for mbits in bandwidths:
+            row = min(rows, key=lambda r: r['total_ms'][str(mbits)])
+            best.append(row['encoding'] if row['level'] is None else f"{row['encoding']}-{row['level']}")
+        print(f"  {name:<52} " + ' '.join(f'{b:>10}' for b in best), file=out)
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir.name, 'bench.db')}"
+
+    from backend.app import app, cache, db
+    from backend.compression import ENCODERS
+
+    payloads = fetch_payloads(app, db, cache, args.scale)
+    results = run(payloads, ENCODERS, args.repeat, args.bandwidth)
+    print_report(results, args.bandwidth)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump({
+                'scale': args.scale,
+                'encoders': [encoder.name for encoder in ENCODERS],
+                'results': results,
+            }, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+    workdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
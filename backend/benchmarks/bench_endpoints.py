@@ -0,0 +1,256 @@
+"""Measure every list, export, import, search and /recent endpoint at several data sizes.
+
+Usage (from ``backend/``)::
+
+    python benchmarks/bench_endpoints.py --scales 1000 10000 100000 --output bench.json
+    python benchmarks/bench_endpoints.py --scales 1000 --compare bench.json
+
+For each scale the schema is recreated and filled by ``datagen.generate``.
+Each endpoint is then requested through the Flask test client with the read
+cache cleared. The run records median and worst latency, the number of SQL
+statements, peak Python memory (tracemalloc) and the response size.
+Latency is measured without tracemalloc running.
+
+``--output`` writes a JSON report with sorted keys, one entry per
+(scale, endpoint), so two reports diff cleanly. ``--compare`` prints the change
+against an earlier report and flags endpoints whose query count grew.
+
+By default a throwaway SQLite file is used. Pass ``--database-url`` to
+benchmark PostgreSQL. The target database is dropped and recreated.
+"""
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import argparse
+import datetime
+import decimal
+import json
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import werkzeug
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '0'
+from sqlalchemy import event
+
+from datagen import client_rows, generate, product_rows, task_rows, vendor_rows
+
+EXPORT_TABLES = ['vendors', 'products', 'clients', 'projects', 'productprojects', 'contracts', 'tasks']
+SKIPPED_ROUTES = {'/me', '/metrics', '/dashboard', '/search'}
+# Words datagen puts in names: one matches every row, one narrows to a few.
+SEARCH_QUERIES = ['Vendor', 'Client 12']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--import-rows', type=int, default=1000)
+    parser.add_argument('--database-url')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    parser.add_argument('--only', help='substring filter on endpoint names')
+    return parser.parse_args()
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def jsonable(row):
+    out = {}
+    for key, value in row.items():
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            value = value.isoformat()
+        elif isinstance(value, decimal.Decimal):
+            value = str(value)
+        out[key] = value
+    return out
+
+
+class Bench:
+    def __init__(self, app, db, cache, repeat):
+        self.app = app
+        self.db = db
+        self.cache = cache
+        self.repeat = repeat
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        self.cache.clear()
+        response = self.client.open(path, method=method, json=body)
+        data = response.get_data()
+        return response.status_code, len(data)
+
+    def count_queries(self, method, path, body):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            self.request(method, path, body)
+        finally:
+            event.remove(self.db.engine, 'before_cursor_execute', before_cursor_execute)
+        return len(statements)
+
+    def peak_memory(self, method, path, body):
+        tracemalloc.start()
+        try:
+            self.request(method, path, body)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def measure(self, method, path, payload=None):
+        """Time ``method path``; ``payload(run)`` builds a fresh body per run."""
+        body = payload or (lambda run: None)
+        timings = []
+        status = size = None
+        for run in range(self.repeat):
+            data = body(run)
+            start = time.perf_counter()
+            status, size = self.request(method, path, data)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = self.count_queries(method, path, body(self.repeat))
+        memory = self.peak_memory(method, path, body(self.repeat + 1))
+        return {
+            'status': status,
+            'bytes': size,
+            'queries': queries,
+            'latency_ms': {
+                'median': round(statistics.median(timings), 2),
+                'max': round(max(timings), 2),
+            },
+            'peak_memory_kb': round(memory / 1024),
+        }
+
+
+def list_routes(app):
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if 'GET' in rule.methods and not rule.arguments and rule.rule not in SKIPPED_ROUTES:
+            if rule.endpoint != 'static':
+                yield rule.rule
+
+
+def import_cases(import_rows):
+    def rows(factory):
+        return lambda run: [jsonable(r) for r in factory(run)]
+
+    return {
+        'vendors': rows(lambda run: vendor_rows(random.Random(run), import_rows)),
+        'products': rows(lambda run: product_rows(random.Random(run), import_rows, 1, prefix=f'IMP{run}')),
+        'clients': rows(lambda run: client_rows(random.Random(run), import_rows, prefix=f'Imported{run}')),
+        'tasks': rows(lambda run: task_rows(random.Random(run), import_rows, 1, prefix=f'Imported{run}')),
+    }
+
+
+def run_scale(bench, scale, import_rows, only=None):
+    db = bench.db
+    with bench.app.app_context():
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        sizes = generate(db.engine, scale)
+        print(f'scale {scale}: generated in {time.perf_counter() - started:.1f}s {sizes}', file=sys.stderr)
+
+        cases = [(f'GET {path}', 'GET', path, None) for path in list_routes(bench.app)]
+        cases += [(f'GET {path}?limit=100', 'GET', f'{path}?limit=100', None)
+                  for path in ('/products', '/projects', '/contracts', '/tasks')]
+        cases.append(('GET /dashboard', 'GET', '/dashboard', None))
+        for q in SEARCH_QUERIES:
+            path = f"/search?q={q.replace(' ', '+')}"
+            cases.append((f'GET {path}', 'GET', path, None))
+        for table in EXPORT_TABLES:
+            cases.append((f'GET /export/{table}', 'GET', f'/export/{table}', None))
+            cases.append((f'GET /export/{table}?format=ndjson', 'GET', f'/export/{table}?format=ndjson', None))
+        for table, payload in import_cases(import_rows).items():
+            cases.append((f'POST /import/{table} ({import_rows} rows)', 'POST', f'/import/{table}', payload))
+
+        results = []
+        for name, method, path, payload in cases:
+            if only and only not in name:
+                continue
+            result = bench.measure(method, path, payload)
+            result.update({'scale': scale, 'endpoint': name})
+            results.append(result)
+            print(f"{scale:>7} {name:<48} {result['latency_ms']['median']:>10.1f} ms "
+                  f"{result['queries']:>5} q {result['peak_memory_kb']:>8} KB", file=sys.stderr)
+        return results
+
+
+def compare(previous, current):
+    old = {(r['scale'], r['endpoint']): r for r in previous['results']}
+    print(f"{'scale':>7} {'endpoint':<48} {'median ms':>20} {'queries':>12}")
+    for result in current['results']:
+        before = old.get((result['scale'], result['endpoint']))
+        if before is None:
+            continue
+        then, now = before['latency_ms']['median'], result['latency_ms']['median']
+        change = f'{(now - then) / then * 100:+.0f}%' if then else ''
+        flag = '  <-- more queries' if result['queries'] > before['queries'] else ''
+        print(f"{result['scale']:>7} {result['endpoint']:<48} {then:>8.1f} -> {now:>7.1f} {change:>5} "
+              f"{before['queries']:>5} -> {result['queries']:<5}{flag}")
+
+
+def main():
+    args = parse_args()
+    workdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        workdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir.name, 'bench.db')}"
+
+    import sqlalchemy
+    from backend.app import app, cache, db
+    from backend.serializers import orjson
+
+    # Slow-request logging would flood the output at large scales.
+    app.config['SLOW_QUERY_MS'] = app.config['SLOW_REQUEST_MS'] = float('inf')
+    bench = Bench(app, db, cache, args.repeat)
+    results = []
+    for scale in args.scales:
+        results += run_scale(bench, scale, args.import_rows, args.only)
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    report = {
+        'meta': {
+            'created': datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'database': dialect,
+            'orjson': orjson is not None,
+            'repeat': args.repeat,
+            'import_rows': args.import_rows,
+        },
+        'results': sorted(results, key=lambda r: (r['scale'], r['endpoint'])),
+    }
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+    if args.compare:
+        with open(args.compare) as fh:
+            compare(json.load(fh), report)
+    elif not args.output:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+    if workdir is not None:
+        workdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
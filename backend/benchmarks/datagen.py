@@ -0,0 +1,190 @@
+"""Synthetic dataset for the benchmarks.
+
+``generate(engine, scale)`` fills an empty schema with deterministic data.
+``scale`` is the number of products, product links and tasks. The other
+tables are sized relative to it:
+
+=================  ==============
+vendors            scale / 20
+products           scale
+clients            scale / 5
+projects           scale / 5
+product_projects   scale
+contracts          scale / 5
+tasks              scale
+activity           scale / 10
+=================  ==============
+
+Rows go in through Core ``executemany`` in chunks, so 100k rows per table take
+seconds, not minutes. IDs are assigned by the database. On a freshly created
+schema they run 1..n, which is what the foreign keys assume.
+"""
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import datetime
+import decimal
+import random
+
+from sqlalchemy import insert
+
+from backend.models import (
+    Activity, Client, Contract, ContractStatus, Employee, LeadStage, Product, ProductProject,
+    Project, Task, Vendor,
+)
+
+CHUNK_SIZE = 5000
+EMPLOYEES = ['Stephanie Scher', 'Sable Murphy', 'Jennifer Stewart', 'Daniel Murphy']
+LEAD_STAGES = ['New', 'Follow-Up', 'Sold', 'Lost']
+CONTRACT_STATUSES = ['Draft', 'Active', 'Completed']
+BASE_DATE = datetime.date(2024, 1, 1)
+
+
+def table_sizes(scale):
+    return {
+        'vendors': max(scale // 20, 1),
+        'products': scale,
+        'clients': max(scale // 5, 1),
+        'projects': max(scale // 5, 1),
+        'product_projects': scale,
+        'contracts': max(scale // 5, 1),
+        'tasks': scale,
+        'activity': max(scale // 10, 1),
+    }
+
+
+def insert_chunked(connection, model, rows):
+    table = model.__table__
+    for start in range(0, len(rows), CHUNK_SIZE):
+        connection.execute(insert(table), rows[start:start + CHUNK_SIZE])
+
+
+def vendor_rows(rng, count):
+    return [
+        {
+            'name': f'Vendor {i}',
+            'contact_info': f'sales{i}@vendor{i}.example',
+            'first_name': f'First{i}',
+            'last_name': f'Last{i}',
+            'primary_email': f'sales{i}@vendor{i}.example',
+            'primary_phone': f'555-{i % 10000:04d}',
+            'city': rng.choice(['Austin', 'Denver', 'Portland', 'Raleigh']),
+            'state': rng.choice(['TX', 'CO', 'OR', 'NC']),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def product_rows(rng, count, vendors, prefix='SKU'):
+    return [
+        {
+            'sku': f'{prefix}-{i:07d}',
+            'name': f'Product {i}',
+            'price': decimal.Decimal(rng.randint(100, 500000)) / 100,
+            'vendor_id': rng.randint(1, vendors),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def client_rows(rng, count, prefix='Client'):
+    return [
+        {
+            'name': f'{prefix} {i}',
+            'first_name': f'First{i}',
+            'last_name': f'Last{i}',
+            'primary_email': f'{prefix.lower()}{i}@example.com',
+            'primary_phone': f'555-{i % 10000:04d}',
+            'referral_type': rng.choice(['Web', 'Referral', 'Showroom', None]),
+            'employee_id': rng.randint(1, len(EMPLOYEES)),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def project_rows(rng, count, clients):
+    return [
+        {
+            'name': f'Project {i}',
+            'description': f'Synthetic project {i}',
+            'start_date': BASE_DATE + datetime.timedelta(days=rng.randint(0, 720)),
+            'client_id': rng.randint(1, clients),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def product_project_rows(rng, count, products, projects):
+    return [
+        {
+            'product_id': rng.randint(1, products),
+            'project_id': rng.randint(1, projects),
+            'quantity': rng.randint(1, 12),
+        }
+        for _ in range(count)
+    ]
+
+
+def contract_rows(rng, count, clients, projects):
+    rows = []
+    for i in range(1, count + 1):
+        start = BASE_DATE + datetime.timedelta(days=rng.randint(0, 720))
+        rows.append({
+            'client_id': rng.randint(1, clients),
+            'employee_id': rng.randint(1, len(EMPLOYEES)),
+            'project_id': (i - 1) % projects + 1,
+            'status_id': rng.randint(1, len(CONTRACT_STATUSES)),
+            'start_date': start,
+            'end_date': start + datetime.timedelta(days=rng.randint(30, 365)),
+            'amount': decimal.Decimal(rng.randint(100000, 10000000)) / 100,
+        })
+    return rows
+
+
+def task_rows(rng, count, contracts, prefix='Task'):
+    return [
+        {
+            'name': f'{prefix} {i}',
+            'due_date': BASE_DATE + datetime.timedelta(days=rng.randint(0, 720)),
+            'completed': rng.random() < 0.6,
+            'contract_id': rng.randint(1, contracts),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def activity_rows(rng, count):
+    start = datetime.datetime(2024, 1, 1)
+    resources = ['projects', 'clients', 'contracts', 'tasks', 'products']
+    rows = []
+    for i in range(1, count + 1):
+        # The actions the app logs; imports are one summary entry per batch
+        action = rng.choice(['create', 'update', 'delete', 'import'])
+        rows.append({
+            'timestamp': start + datetime.timedelta(minutes=i),
+            'action': action,
+            'resource': rng.choice(resources),
+            'record_id': None if action == 'import' else rng.randint(1, 1000),
+            'label': f'{rng.randint(1, 500)} rows' if action == 'import' else f'Record {i}',
+        })
+    return rows
+
+
+def generate(engine, scale, seed=1):
+    """Populate an empty schema on ``engine``; returns the row count per table."""
+    rng = random.Random(seed)
+    sizes = table_sizes(scale)
+    with engine.begin() as connection:
+        insert_chunked(connection, Employee, [{'name': n} for n in EMPLOYEES])
+        insert_chunked(connection, LeadStage, [{'name': n} for n in LEAD_STAGES])
+        insert_chunked(connection, ContractStatus, [{'name': n} for n in CONTRACT_STATUSES])
+        insert_chunked(connection, Vendor, vendor_rows(rng, sizes['vendors']))
+        insert_chunked(connection, Product, product_rows(rng, sizes['products'], sizes['vendors']))
+        insert_chunked(connection, Client, client_rows(rng, sizes['clients']))
+        insert_chunked(connection, Project, project_rows(rng, sizes['projects'], sizes['clients']))
+        insert_chunked(connection, ProductProject, product_project_rows(
+            rng, sizes['product_projects'], sizes['products'], sizes['projects']))
+        insert_chunked(connection, Contract, contract_rows(
+            rng, sizes['contracts'], sizes['clients'], sizes['projects']))
+        insert_chunked(connection, Task, task_rows(rng, sizes['tasks'], sizes['contracts']))
+        insert_chunked(connection, Activity, activity_rows(rng, sizes['activity']))
+    return sizes
@@ -0,0 +1,292 @@
+"""Closed-loop load generator replaying the frontend's page views.
+
+Usage (from ``backend/``, with the API running)::
+
+    python benchmarks/loadgen.py --url http://localhost:5000 --users 20 --duration 60
+    python benchmarks/loadgen.py --users 50 --mix dashboard=5,project=3,contracts=1 --output load.json
+
+Each virtual user repeatedly picks a page from the mix, fires that page's
+requests in parallel as the browser does on mount, and waits for them all
+before thinking and moving on. The offered load therefore adapts to how fast
+the server answers. ``PAGES`` lists the requests made by each page in
+``frontend/pages``. ``--pages-file`` replaces it with a JSON object of the
+same shape, e.g. ``{"legacy-dashboard": ["/projects", "/tasks", "/contracts",
+"/recent"]}``.
+
+The report gives throughput, error rate and p50/p95/p99 latency per route and
+per page. It also gives the mean database time taken from the
+``Server-Timing`` header.
+"""
+import argparse
+import http.client
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Requests issued when each page mounts, mirroring frontend/pages.
+PAGES = {
+    'dashboard': ['/dashboard'],
+    'projects': ['/projects', '/clients?fields=id,name', '/products?fields=id,name'],
+    'project': ['/projects/{project_id}', '/clients?fields=id,name'],
+    'contracts': [
+        '/contracts', '/clients?fields=id,name', '/employees', '/projects?fields=id,name', '/contractstatuses',
+    ],
+    'contract-edit': ['/contracts/{contract_id}'],
+    'clients': ['/clients?fields=id,name,primary_phone,primary_email,referral_type,employee', '/employees'],
+    'products': ['/products', '/vendors?fields=id,name'],
+    'vendors': ['/vendors?fields=id,name,primary_email,primary_phone'],
+    'leads': ['/leads', '/leadstages'],
+}
+
+DEFAULT_MIX = {
+    'dashboard': 30,
+    'projects': 10,
+    'project': 20,
+    'contracts': 10,
+    'contract-edit': 5,
+    'clients': 10,
+    'products': 5,
+    'vendors': 5,
+    'leads': 5,
+}
+
+# Browsers open at most six connections per origin.
+MAX_PARALLEL = 6
+
+_DB_TIMING = re.compile(r'(?:^|,)\s*db;dur=([\d.]+)')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    rank = math.ceil(pct / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def parse_mix(text, pages):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in pages:
+            raise SystemExit(f'Unknown page {name!r}; choose from {", ".join(sorted(pages))}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    """Collect samples from all virtual users."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = defaultdict(lambda: {'latency': [], 'errors': 0, 'db': []})
+        self.pages = defaultdict(lambda: {'latency': [], 'errors': 0})
+        self.recording = False
+
+    def route(self, name, seconds, ok, db_ms):
+        if not self.recording:
+            return
+        with self.lock:
+            sample = self.routes[name]
+            sample['latency'].append(seconds * 1000)
+            sample['errors'] += not ok
+            if db_ms is not None:
+                sample['db'].append(db_ms)
+
+    def page(self, name, seconds, ok):
+        if not self.recording:
+            return
+        with self.lock:
+            sample = self.pages[name]
+            sample['latency'].append(seconds * 1000)
+            sample['errors'] += not ok
+
+    def summary(self, elapsed):
+        def summarize(samples):
+            latency = sorted(samples['latency'])
+            count = len(latency)
+            result = {
+                'requests': count,
+                'errors': samples['errors'],
+                'error_rate': round(samples['errors'] / count, 4) if count else 0.0,
+                'throughput': round(count / elapsed, 2) if elapsed else 0.0,
+                'p50_ms': round(percentile(latency, 50), 2) if count else None,
+                'p95_ms': round(percentile(latency, 95), 2) if count else None,
+                'p99_ms': round(percentile(latency, 99), 2) if count else None,
+            }
+            if samples.get('db'):
+                result['db_mean_ms'] = round(sum(samples['db']) / len(samples['db']), 2)
+            return result
+
+        with self.lock:
+            routes = {name: summarize(s) for name, s in sorted(self.routes.items())}
+            pages = {name: summarize(s) for name, s in sorted(self.pages.items())}
+        total = sum(r['requests'] for r in routes.values())
+        errors = sum(r['errors'] for r in routes.values())
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total,
+            'throughput': round(total / elapsed, 2) if elapsed else 0.0,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'routes': routes,
+            'pages': pages,
+        }
+
+
+class LoadGenerator:
+    def __init__(self, url, users, mix, pages=PAGES, think=0.0, timeout=30.0, seed=None):
+        parsed = urllib.parse.urlsplit(url)
+        self.scheme = parsed.scheme or 'http'
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port
+        self.prefix = parsed.path.rstrip('/')
+        self.users = users
+        self.pages = pages
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.think = think
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.ids = {}
+        self.recorder = Recorder()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=users * MAX_PARALLEL)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def get(self, path):
+        """Return ``(status, body, headers)``, reconnecting once on a dropped keep-alive."""
+        for attempt in (1, 2):
+            conn = self.connection()
+            try:
+                conn.request('GET', self.prefix + path, headers={'Accept': 'application/json'})
+                response = conn.getresponse()
+                return response.status, response.read(), response.headers
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt == 2:
+                    raise
+
+    def load_ids(self):
+        """Sample existing record IDs to fill ``{project_id}``-style templates."""
+        for resource in ('projects', 'contracts', 'clients', 'products', 'vendors'):
+            ids = []
+            try:
+                status, body, _ = self.get(f'/{resource}?limit=1000&fields=id')
+                if status == 200:
+                    ids = [row['id'] for row in json.loads(body)['items']]
+            except (OSError, ValueError, KeyError, http.client.HTTPException):
+                pass
+            self.ids[resource[:-1] + '_id'] = ids or list(range(1, 101))
+
+    def expand(self, template):
+        fields = {key: self.rng.choice(ids) for key, ids in self.ids.items()}
+        return template.format(**fields)
+
+    def fetch(self, template):
+        path = self.expand(template)
+        start = time.perf_counter()
+        ok, db_ms = False, None
+        try:
+            status, _, headers = self.get(path)
+            ok = status < 400
+            match = _DB_TIMING.search(headers.get('Server-Timing', ''))
+            if match:
+                db_ms = float(match.group(1))
+        except (OSError, http.client.HTTPException):
+            pass
+        self.recorder.route(template, time.perf_counter() - start, ok, db_ms)
+        return ok
+
+    def user(self):
+        while not self._stop.is_set():
+            page = self.rng.choices(self.names, self.weights)[0]
+            start = time.perf_counter()
+            futures = [self._pool.submit(self.fetch, t) for t in self.pages[page]]
+            wait(futures)
+            self.recorder.page(page, time.perf_counter() - start, all(f.result() for f in futures))
+            if self.think:
+                self._stop.wait(self.rng.uniform(0.5, 1.5) * self.think)
+
+    def run(self, duration, warmup=0.0):
+        self.load_ids()
+        threads = [threading.Thread(target=self.user, daemon=True) for _ in range(self.users)]
+        for thread in threads:
+            thread.start()
+        if warmup:
+            time.sleep(warmup)
+        self.recorder.recording = True
+        started = time.perf_counter()
+        time.sleep(duration)
+        self.recorder.recording = False
+        elapsed = time.perf_counter() - started
+        self._stop.set()
+        for thread in threads:
+            thread.join(self.timeout)
+        self._pool.shutdown(wait=True)
+        report = self.recorder.summary(elapsed)
+        report['users'] = self.users
+        return report
+
+
+def print_report(report, out=sys.stdout):
+    print(f"{report['users']} users, {report['elapsed_s']}s: {report['requests']} requests, "
+          f"{report['throughput']} req/s, error rate {report['error_rate']:.2%}", file=out)
+    for section in ('pages', 'routes'):
+        print(f"\n{section[:-1]:<36} {'req/s':>8} {'errors':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'db':>7}",
+              file=out)
+        for name, row in report[section].items():
+            cells = [row[k] if row[k] is not None else float('nan') for k in ('p50_ms', 'p95_ms', 'p99_ms')]
+            db_ms = row.get('db_mean_ms')
+            print(f"{name:<36} {row['throughput']:>8.1f} {row['error_rate']:>7.1%} "
+                  f"{cells[0]:>8.1f} {cells[1]:>8.1f} {cells[2]:>8.1f} "
+                  f"{'' if db_ms is None else f'{db_ms:.1f}':>7}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to record')
+    parser.add_argument('--warmup', type=float, default=5.0, help='seconds to run before recording')
+    parser.add_argument('--think', type=float, default=0.0, help='mean pause between pages, seconds')
+    parser.add_argument('--mix', help='page weights, e.g. dashboard=5,project=2')
+    parser.add_argument('--pages-file', help='JSON object of page name -> list of paths')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    pages = PAGES
+    if args.pages_file:
+        with open(args.pages_file) as fh:
+            pages = json.load(fh)
+    mix = parse_mix(args.mix, pages) if args.mix else (
+        DEFAULT_MIX if pages is PAGES else {name: 1 for name in pages}
+    )
+    generator = LoadGenerator(args.url, args.users, mix, pages=pages, think=args.think, seed=args.seed)
+    report = generator.run(args.duration, args.warmup)
+    report['mix'] = mix
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Read-through cache for lookup tables and detail reads.
+
+Entries are tagged with the tables they were built from. ``invalidate`` drops
+every entry carrying one of the given tags, and the app calls it after each
+commit that touches those tables. Two backends are available:
+
+``MemoryCache``
+    Per-process LRU with a TTL. This is the default.
+``RedisCache``
+    Shared across worker processes through any server that speaks the Redis
+    protocol. Select it with ``CACHE_URL=redis://host:6379/0``.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # optional dependency, only needed for RedisCache
+    redis = None
+
+
+class MemoryCache:
+    """Thread-safe LRU cache with per-entry expiry and tag invalidation."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires, tags = entry
+            if expires < time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags=()):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            for tag in entry[2]:
+                keys = self._tags.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+
+
+class RedisCache:
+    """Cache shared between processes through a Redis-protocol server.
+
+    Values are stored as JSON with a TTL. Each tag is a Redis set holding the
+    keys built from it.
+    """
+
+    def __init__(self, url, ttl=300, prefix='idcache:'):
+        if redis is None:
+            raise RuntimeError('RedisCache requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, tags=()):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+        for tag in tags:
+            pipe.sadd(f'{self.prefix}tag:{tag}', key)
+            pipe.expire(f'{self.prefix}tag:{tag}', self.ttl)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        for tag in tags:
+            tag_key = f'{self.prefix}tag:{tag}'
+            keys = self.client.smembers(tag_key)
+            if keys:
+                self.client.delete(*(self.prefix + k.decode() for k in keys))
+            self.client.delete(tag_key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f'{self.prefix}*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+def cache_from_env():
+    url = os.getenv('CACHE_URL', 'memory://')
+    ttl = int(os.getenv('CACHE_TTL', '300'))
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url, ttl=ttl)
+    return MemoryCache(maxsize=int(os.getenv('CACHE_SIZE', '1024')), ttl=ttl)
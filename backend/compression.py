@@ -0,0 +1,222 @@
+"""Response compression negotiated through ``Accept-Encoding``.
+
+zstd and brotli are used when the ``zstandard`` and ``brotli`` packages are
+installed and the client accepts them; gzip is always available. The
+encoding with the highest ``q`` value wins, with ties going to zstd, then
+brotli, then gzip.
+
+Buffered responses smaller than ``COMPRESS_MIN_SIZE`` are sent as they are,
+since the headers would cost more than the bytes saved. Larger ones are
+compressed at the encoding's normal level as long as the estimated CPU time
+fits in ``COMPRESS_BUDGET_MS``. Otherwise the fast level is used. If even
+that would take too long, the body goes out uncompressed rather than holding
+the worker. The estimates come from each process's own recent throughput.
+
+Streamed responses such as ``/export/<model>?format=ndjson`` use the fast
+level. Each chunk is compressed and flushed as it is produced, so the client
+can decode rows as they arrive and nothing is buffered.
+
+An encoded response's ETag gets the coding appended (``"3.ab12-br"``), since
+its bytes differ from the identity body's. ``strip_coding`` removes it again
+before tags are compared.
+"""
+import threading
+import time
+import zlib
+
+from flask import current_app, request
+
+try:
+    from .instrumentation import record_compression
+except ImportError:  # allows running as 'python app.py'
+    from instrumentation import record_compression
+
+try:
+    import brotli
+except ImportError:  # optional dependency, enables Content-Encoding: br
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, enables Content-Encoding: zstd
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+# Weight given to the latest sample when updating a throughput estimate
+RATE_SMOOTHING = 0.2
+
+
+class Encoder:
+    """One content coding with a normal and a fast compression level.
+
+    ``rates`` holds the estimated throughput in bytes per CPU second for each
+    level. The seeds were measured on JSON list responses (see
+    ``benchmarks/bench_compression.py``) and are refined as responses are
+    compressed.
+    """
+
+    def __init__(self, name, level, fast_level, rates):
+        self.name = name
+        self.level = level
+        self.fast_level = fast_level
+        self.rates = dict(rates)
+        self._lock = threading.Lock()
+
+    def estimate(self, size, level):
+        return size / self.rates[level]
+
+    def observe(self, size, level, seconds):
+        if seconds <= 0:
+            return
+        with self._lock:
+            rate = self.rates[level]
+            self.rates[level] = rate + RATE_SMOOTHING * (size / seconds - rate)
+
+    def compress(self, data, level):
+        raise NotImplementedError
+
+    def stream(self, level):
+        """Return ``(compress_chunk, finish)`` for incremental compression."""
+        raise NotImplementedError
+
+
+class GzipEncoder(Encoder):
+    def compress(self, data, level):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self, level):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return (
+            lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush,
+        )
+
+
+class BrotliEncoder(Encoder):
+    def compress(self, data, level):
+        return brotli.compress(data, quality=level)
+
+    def stream(self, level):
+        compressor = brotli.Compressor(quality=level)
+        return (
+            lambda chunk: compressor.process(chunk) + compressor.flush(),
+            compressor.finish,
+        )
+
+
+class ZstdEncoder(Encoder):
+    def compress(self, data, level):
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    def stream(self, level):
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        return (
+            lambda chunk: compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush,
+        )
+
+
+def available_encoders():
+    """Encoders usable in this process, in order of preference."""
+    encoders = []
+    if zstandard is not None:
+        encoders.append(ZstdEncoder('zstd', 3, 1, {3: 250e6, 1: 400e6}))
+    if brotli is not None:
+        encoders.append(BrotliEncoder('br', 5, 1, {5: 60e6, 1: 200e6}))
+    encoders.append(GzipEncoder('gzip', 6, 1, {6: 60e6, 1: 150e6}))
+    return encoders
+
+
+ENCODERS = available_encoders()
+_BY_NAME = {encoder.name: encoder for encoder in ENCODERS}
+
+
+def negotiate(accept_encodings):
+    """Return the encoder to use for a request's ``Accept-Encoding``, if any."""
+    name = accept_encodings.best_match([encoder.name for encoder in ENCODERS])
+    return _BY_NAME.get(name)
+
+
+def choose_level(encoder, size, budget):
+    """Pick the level whose estimated CPU time fits ``budget`` seconds, or ``None``."""
+    for level in (encoder.level, encoder.fast_level):
+        if encoder.estimate(size, level) <= budget:
+            return level
+    return None
+
+
+def compressible(response):
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+    if response.cache_control.no_transform:
+        return False
+    return (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+
+
+def strip_coding(tag):
+    """``tag`` without the ``-<coding>`` suffix added to encoded responses."""
+    return tag.partition('-')[0]
+
+
+def _set_encoding(response, encoder):
+    response.headers['Content-Encoding'] = encoder.name
+    tag, weak = response.get_etag()
+    if tag:
+        response.set_etag(f'{tag}-{encoder.name}', weak=weak)
+
+
+def compress_stream(chunks, encoder, level):
+    compress_chunk, finish = encoder.stream(level)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = compress_chunk(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def _compress_response(response):
+    if not current_app.config.get('COMPRESS', True) or request.method == 'HEAD':
+        return response
+    if not compressible(response):
+        return response
+    if response.is_streamed:
+        response.vary.add('Accept-Encoding')
+        encoder = negotiate(request.accept_encodings)
+        if encoder is None:
+            return response
+        response.response = compress_stream(response.response, encoder, encoder.fast_level)
+        response.headers.pop('Content-Length', None)
+        _set_encoding(response, encoder)
+        return response
+
+    data = response.get_data()
+    if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoder = negotiate(request.accept_encodings)
+    if encoder is None:
+        return response
+    level = choose_level(encoder, len(data), current_app.config.get('COMPRESS_BUDGET_MS', 25) / 1000)
+    if level is None:
+        return response
+    started = time.thread_time()
+    compressed = encoder.compress(data, level)
+    elapsed = time.thread_time() - started
+    encoder.observe(len(data), level, elapsed)
+    record_compression(elapsed)
+    if len(compressed) >= len(data):
+        return response
+    response.set_data(compressed)
+    _set_encoding(response, encoder)
+    return response
+
+
+def init_app(app):
+    """Compress ``app``'s responses; register after the timing and metrics hooks."""
+    app.after_request(_compress_response)
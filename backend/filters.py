@@ -0,0 +1,168 @@
+"""Declarative filtering and sorting for list endpoints.
+
+Query parameters name a field, optionally followed by ``__`` and an
+operator::
+
+    /tasks?completed=false&due_date__lt=2024-07-01&order=-due_date
+    /leads?stage_id=2
+    /contracts?status_id__in=1,2&order=-id
+
+Operators are ``eq`` (the default), ``ne``, ``lt``, ``lte``, ``gt``,
+``gte``, ``in`` (comma-separated values) and ``isnull`` (``true`` or
+``false``). ``order`` lists sort fields, each prefixed with ``-`` for
+descending order. NULLs sort last in both directions and the id breaks
+ties, so keyset cursors stay stable.
+
+Only fields listed in a view's ``filters`` and ``sorts`` are accepted.
+These whitelists name indexed columns, so every predicate and sort can be
+answered from an index instead of a scan. Any other parameter is rejected,
+so a misspelled filter is an error rather than an unfiltered list; only the
+cache-busters in ``IGNORED`` pass through.
+"""
+import datetime
+import decimal
+
+from sqlalchemy import and_, or_
+
+try:
+    from .serializers import column_converter
+except ImportError:  # allows running as 'python app.py'
+    from serializers import column_converter
+
+# Parameters consumed by list_response itself rather than treated as filters
+RESERVED = {'fields', 'limit', 'after', 'order'}
+
+# Cache-busters appended by HTTP clients; accepted and ignored
+IGNORED = {'_'}
+
+OPERATORS = {
+    'eq': lambda column, value: column.is_(None) if value is None else column == value,
+    'ne': lambda column, value: column.isnot(None) if value is None else column != value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'in': lambda column, values: _in(column, values),
+    'isnull': lambda column, value: column.is_(None) if value else column.isnot(None),
+}
+
+_TRUE = ('1', 'true', 'yes')
+
+
+def _in(column, values):
+    # ``IN (..., NULL)`` never matches NULL, so ``null`` becomes ``IS NULL``
+    present = [value for value in values if value is not None]
+    clause = column.in_(present) if present else None
+    if len(present) < len(values):
+        clause = column.is_(None) if clause is None else or_(clause, column.is_(None))
+    return clause
+
+
+def _column(view, name):
+    return view.fields[name].attr
+
+
+def _nullable(column):
+    return column.property.columns[0].nullable
+
+
+def parse_value(column, text):
+    """Coerce query-string ``text`` to ``column``'s type; ``null`` means NULL."""
+    if text == 'null':
+        return None
+    convert = column_converter(column)
+    return convert(text) if convert else text
+
+
+def filter_clauses(view, args):
+    """Compile the filter parameters in ``args`` into WHERE clauses.
+
+    Raises ``ValueError`` for parameters outside the view's ``filters``
+    whitelist, unknown operators and values that do not fit the column.
+    """
+    clauses = []
+    for param in args:
+        if param in RESERVED or param in IGNORED:
+            continue
+        name, _, op = param.partition('__')
+        op = op or 'eq'
+        if name not in view.filters:
+            raise ValueError(f'Cannot filter on {name}')
+        if op not in OPERATORS:
+            raise ValueError(f'Unknown operator {op}')
+        column = _column(view, name)
+        for text in args.getlist(param):
+            try:
+                if op == 'in':
+                    value = [parse_value(column, part) for part in text.split(',')]
+                elif op == 'isnull':
+                    value = text.lower() in _TRUE
+                else:
+                    value = parse_value(column, text)
+            except (ValueError, TypeError, ArithmeticError):
+                raise ValueError(f'Invalid value for {param}') from None
+            clauses.append(OPERATORS[op](column, value))
+    return clauses
+
+
+def parse_order(view, text):
+    """Return ``[(column, descending), ...]`` for an ``order`` parameter."""
+    keys = []
+    for part in (text or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        descending = part.startswith('-')
+        name = part.lstrip('-+')
+        if name not in view.sorts:
+            raise ValueError(f'Cannot sort on {name}')
+        keys.append((_column(view, name), descending))
+    return keys
+
+
+def order_clauses(keys, id_column):
+    """ORDER BY for ``keys`` with NULLs last, then the id as a tie-breaker."""
+    clauses = []
+    for column, descending in keys:
+        clause = column.desc() if descending else column.asc()
+        clauses.append(clause.nulls_last() if _nullable(column) else clause)
+    clauses.append(id_column)
+    return clauses
+
+
+def seek_clause(keys, values, id_column, after_id):
+    """WHERE clause selecting the rows ordered after ``values``/``after_id``."""
+    clause = id_column > after_id
+    for (column, descending), value in reversed(list(zip(keys, values))):
+        if value is None:
+            # NULLs come last, so only rows that are also NULL can follow
+            clause = and_(column.is_(None), clause)
+            continue
+        after = column < value if descending else column > value
+        if _nullable(column):
+            after = or_(after, column.is_(None))
+        clause = or_(after, and_(column == value, clause))
+    return clause
+
+
+def encode_key(value):
+    """JSON-safe form of a sort value stored in a cursor."""
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def decode_key(keys, values):
+    """Convert cursor values back to the sort columns' types."""
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError('Invalid cursor')
+    decoded = []
+    for (column, _), value in zip(keys, values):
+        convert = column_converter(column)
+        try:
+            decoded.append(convert(value) if convert and value is not None else value)
+        except (ValueError, TypeError, ArithmeticError):
+            raise ValueError('Invalid cursor') from None
+    return decoded
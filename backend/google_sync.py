@@ -0,0 +1,279 @@
+"""Deliver tasks to Google Tasks from a durable outbox.
+
+``create_task`` only records a ``TaskSyncOutbox`` row in its own transaction.
+``SyncWorker`` drains pending rows in the background, sending them to Google
+in batched HTTP requests with exponential backoff and a circuit breaker, so
+request latency no longer depends on Google's.
+
+Run the worker on its own with ``python google_sync.py``; the Compose file
+and the k8s manifests start it as the ``sync`` service and the
+``google-sync`` deployment. Setting
+``GOOGLE_TASKS_ENDPOINT`` points the client at another server (e.g. a local
+fake in tests) and skips service-account credentials.
+"""
+import datetime
+import logging
+import os
+import random
+import threading
+import time
+
+import httplib2
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+from google.oauth2.service_account import Credentials
+
+try:
+    from .models import db, Task, TaskSyncOutbox
+except ImportError:  # allows running as 'python google_sync.py'
+    from models import db, Task, TaskSyncOutbox
+
+logger = logging.getLogger(__name__)
+
+TASKS_SCOPE = 'https://www.googleapis.com/auth/tasks'
+
+_service_lock = threading.Lock()
+_service_cache = {}
+
+
+def sync_config():
+    return os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE'), os.getenv('GOOGLE_TASKS_ENDPOINT')
+
+
+def sync_enabled():
+    creds_file, endpoint = sync_config()
+    return bool(endpoint or (creds_file and os.path.exists(creds_file)))
+
+
+def get_tasks_service():
+    """Return a Tasks API client, built once per configuration.
+
+    The client uses the discovery document bundled with the library, so
+    building it makes no network calls. Returns ``None`` when sync is not
+    configured.
+    """
+    if not sync_enabled():
+        return None
+    config = sync_config()
+    with _service_lock:
+        service = _service_cache.get(config)
+        if service is None:
+            creds_file, endpoint = config
+            kwargs = {'static_discovery': True, 'cache_discovery': False}
+            if endpoint:
+                kwargs['client_options'] = {'api_endpoint': endpoint}
+                kwargs['http'] = httplib2.Http(timeout=30)
+            else:
+                kwargs['credentials'] = Credentials.from_service_account_file(
+                    creds_file, scopes=[TASKS_SCOPE]
+                )
+            service = build('tasks', 'v1', **kwargs)
+            _service_cache[config] = service
+        return service
+
+
+def reset_tasks_service():
+    with _service_lock:
+        _service_cache.clear()
+
+
+def new_batch(service, callback):
+    endpoint = sync_config()[1]
+    if endpoint:
+        return BatchHttpRequest(callback=callback, batch_uri=endpoint.rstrip('/') + '/batch')
+    return service.new_batch_http_request(callback=callback)
+
+
+def enqueue_task_sync(task):
+    """Queue ``task`` for delivery; the caller commits it with the task.
+
+    Rows are written whether or not this process has Google credentials:
+    only the worker needs them, and it delivers whatever is pending once it
+    is configured.
+    """
+    db.session.add(TaskSyncOutbox(task=task))
+
+
+def task_body(task):
+    body = {'title': task.name}
+    if task.due_date:
+        body['due'] = f"{task.due_date.isoformat()}T00:00:00Z"
+    return body
+
+
+class CircuitBreaker:
+    """Stop calling Google after repeated batch failures.
+
+    After ``threshold`` consecutive failures the breaker opens and rejects
+    calls for ``cooldown`` seconds, then lets a single trial batch through.
+    """
+
+    def __init__(self, threshold=5, cooldown=60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        return self.state != 'open'
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+def is_retryable(exc):
+    if isinstance(exc, HttpError):
+        return exc.resp.status == 429 or exc.resp.status >= 500
+    return True
+
+
+class SyncWorker:
+    """Send pending outbox rows to Google Tasks in batches."""
+
+    def __init__(self, app, batch_size=50, poll_interval=5.0, max_attempts=8,
+                 base_delay=2.0, max_delay=900.0, breaker=None):
+        self.app = app
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def backoff(self, attempts):
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def schedule_retry(self, entry, exc, now):
+        entry.attempts += 1
+        entry.last_error = str(exc)[:2000]
+        if entry.attempts >= self.max_attempts or not is_retryable(exc):
+            entry.status = 'failed'
+        else:
+            entry.next_attempt_at = now + datetime.timedelta(seconds=self.backoff(entry.attempts))
+
+    def run_once(self):
+        """Deliver one batch of due rows; returns the number sent."""
+        if not self.breaker.allow():
+            return 0
+        with self.app.app_context():
+            # Storing Google's ids is bookkeeping, not activity to log; the
+            # session, and this flag with it, ends with the app context
+            db.session.info['skip_activity'] = True
+            service = get_tasks_service()
+            if service is None:
+                return 0
+            now = datetime.datetime.utcnow()
+            entries = (
+                TaskSyncOutbox.query
+                .filter(TaskSyncOutbox.status == 'pending', TaskSyncOutbox.next_attempt_at <= now)
+                .order_by(TaskSyncOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not entries:
+                db.session.rollback()
+                return 0
+
+            results = {}
+
+            def collect(request_id, response, exception):
+                results[request_id] = (response, exception)
+
+            batch = new_batch(service, collect)
+            for entry in entries:
+                task = db.session.get(Task, entry.task_id)
+                if task is None:
+                    entry.status = 'skipped'
+                    continue
+                request = service.tasks().insert(tasklist='@default', body=task_body(task))
+                batch.add(request, request_id=str(entry.id))
+
+            sent = 0
+            try:
+                batch.execute()
+            except Exception as exc:
+                logger.warning('Google Tasks batch failed: %s', exc)
+                self.breaker.record_failure()
+                for entry in entries:
+                    if entry.status == 'pending':
+                        self.schedule_retry(entry, exc, now)
+            else:
+                server_errors = 0
+                for entry in entries:
+                    if str(entry.id) not in results:
+                        continue
+                    response, exc = results[str(entry.id)]
+                    if exc is None:
+                        entry.task.google_task_id = response.get('id')
+                        entry.status = 'sent'
+                        sent += 1
+                    else:
+                        server_errors += is_retryable(exc)
+                        self.schedule_retry(entry, exc, now)
+                if results and server_errors == len(results):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+            db.session.commit()
+            return sent
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                busy = self.run_once()
+            except Exception:
+                logger.exception('Google Tasks sync worker error')
+                busy = 0
+            if not busy:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run_forever, name='google-sync', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def worker_from_env(app):
+    return SyncWorker(
+        app,
+        batch_size=int(os.getenv('GOOGLE_SYNC_BATCH_SIZE', '50')),
+        poll_interval=float(os.getenv('GOOGLE_SYNC_POLL_INTERVAL', '5')),
+        max_attempts=int(os.getenv('GOOGLE_SYNC_MAX_ATTEMPTS', '8')),
+        breaker=CircuitBreaker(
+            threshold=int(os.getenv('GOOGLE_SYNC_BREAKER_THRESHOLD', '5')),
+            cooldown=float(os.getenv('GOOGLE_SYNC_BREAKER_COOLDOWN', '60')),
+        ),
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    try:
+        from .app import app
+    except ImportError:
+        from app import app
+    worker_from_env(app).run_forever()
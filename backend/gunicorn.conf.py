@@ -0,0 +1,54 @@
+"""Gunicorn settings for the production server.
+
+Start with ``gunicorn -c gunicorn.conf.py app:app``. Workers are threaded
+(``gthread``) so a request waiting on PostgreSQL does not hold up the rest of
+the process. Size the database pool to match: each worker needs up to
+``GUNICORN_THREADS`` connections, so keep ``DB_POOL_SIZE + DB_MAX_OVERFLOW``
+at or above the thread count and ``workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)``
+below the server's ``max_connections``.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+
+
+def on_starting(server):
+    """Create the schema and seed lookup tables once, before any fork."""
+    metrics_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            os.remove(os.path.join(metrics_dir, name))
+    try:
+        from .app import app, init_database
+    except ImportError:  # allows running from the backend directory
+        from app import app, init_database
+    if not init_database(app):
+        raise SystemExit(1)
+
+
+def post_fork(server, worker):
+    """Start each worker with a fresh connection pool."""
+    try:
+        from .app import app, db
+    except ImportError:
+        from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that has exited."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
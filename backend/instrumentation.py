@@ -0,0 +1,158 @@
+"""Per-request SQL and serialization timings.
+
+Every request records how many statements it ran, the time spent waiting on
+the database, the time spent encoding JSON and, when the response is
+compressed, the time spent compressing it. The totals are returned in a
+``Server-Timing`` header, which browser dev tools show next to each request.
+Statements slower than ``SLOW_QUERY_MS`` and requests slower than
+``SLOW_REQUEST_MS`` are logged with their normalized SQL. Slow requests also
+list their slowest statements. Only a running count and total are kept for
+the rest, so a request running thousands of statements stays cheap.
+"""
+import heapq
+import logging
+import re
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|(?<!:):\w+)'
+_PLACEHOLDER_LISTS = re.compile(rf'\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)')
+_PLACEHOLDERS = re.compile(_PLACEHOLDER)
+
+# Statements kept per request for the slow request log
+SLOWEST_STATEMENTS = 5
+
+
+def normalize_sql(statement):
+    """Collapse whitespace, literals and parameter lists so similar SQL groups."""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _LITERALS.sub('?', statement)
+    statement = _PLACEHOLDER_LISTS.sub('(...)', statement)
+    return _PLACEHOLDERS.sub('?', statement)
+
+
+class RequestStats:
+    """Counters collected while a single request is handled."""
+
+    __slots__ = ('started', 'queries', 'db_time', 'serialize_time', 'compress_time', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.compress_time = 0.0
+        self.statements = []
+
+    def record(self, statement, elapsed):
+        """Count a statement, keeping it only if it is among the slowest."""
+        self.queries += 1
+        self.db_time += elapsed
+        if len(self.statements) < SLOWEST_STATEMENTS:
+            heapq.heappush(self.statements, (elapsed, statement))
+        elif elapsed > self.statements[0][0]:
+            heapq.heapreplace(self.statements, (elapsed, statement))
+
+    def slowest(self):
+        """``(seconds, statement)`` pairs kept by :meth:`record`, slowest first."""
+        return sorted(self.statements, reverse=True)
+
+    def server_timing(self, total):
+        compress = f'compress;dur={self.compress_time * 1000:.2f}, ' if self.compress_time else ''
+        return (
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries", '
+            f'serialize;dur={self.serialize_time * 1000:.2f}, '
+            f'{compress}total;dur={total * 1000:.2f}'
+        )
+
+
+def current_stats():
+    """Return the :class:`RequestStats` for the active request, if any."""
+    if has_request_context():
+        return g.get('request_stats')
+    return None
+
+
+def record_serialization(seconds):
+    stats = current_stats()
+    if stats is not None:
+        stats.serialize_time += seconds
+
+
+def record_compression(seconds):
+    stats = current_stats()
+    if stats is not None:
+        stats.compress_time += seconds
+
+
+def _threshold(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = current_stats()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    if elapsed * 1000 >= _threshold('SLOW_QUERY_MS', 200):
+        logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, normalize_sql(statement))
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+
+def _start_request():
+    g.request_stats = RequestStats()
+
+
+def _finish_request(response):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return response
+    total = time.perf_counter() - stats.started
+    if current_app.config.get('SERVER_TIMING', True):
+        response.headers['Server-Timing'] = stats.server_timing(total)
+        response.headers['Timing-Allow-Origin'] = '*'
+    if total * 1000 >= current_app.config.get('SLOW_REQUEST_MS', 1000):
+        logger.warning(
+            'Slow request %s %s (%.1f ms, %d queries, %.1f ms in db, %.1f ms serializing); '
+            'slowest statements: %s',
+            request.method, request.full_path.rstrip('?'), total * 1000, stats.queries,
+            stats.db_time * 1000, stats.serialize_time * 1000,
+            '; '.join(f'{seconds * 1000:.1f} ms {normalize_sql(sql)}' for seconds, sql in stats.slowest()),
+        )
+    return response
+
+
+_engine_hooks_installed = False
+
+
+def init_app(app):
+    """Install the request hooks on ``app`` and cursor hooks on all engines."""
+    global _engine_hooks_installed
+    if not _engine_hooks_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _engine_hooks_installed = True
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,128 @@
+"""Prometheus metrics served on ``/metrics``.
+
+Request counts, latency and response size are recorded per route template
+(``/projects/<int:id>``, not the concrete URL) so label cardinality stays
+fixed. Connection pool gauges follow pool checkout and checkin events.
+Google sync queue depth is counted from the outbox table when the endpoint is
+scraped, so it costs nothing on normal requests.
+
+Under Gunicorn, set ``PROMETHEUS_MULTIPROC_DIR`` to an empty writable
+directory. Every worker then writes its samples there and ``/metrics``
+aggregates all of them, whichever worker answers the scrape. Without it,
+metrics cover the current process only.
+"""
+import os
+import time
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+        generate_latest, multiprocess,
+    )
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # optional dependency, /metrics is disabled without it
+    REGISTRY = None
+
+try:
+    from .models import db, TaskSyncOutbox
+except ImportError:  # allows running as 'python app.py'
+    from models import db, TaskSyncOutbox
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+if REGISTRY is not None:
+    REQUESTS = Counter(
+        'http_requests_total', 'HTTP requests handled.', ['method', 'route', 'status'],
+    )
+    LATENCY = Histogram(
+        'http_request_duration_seconds', 'Time to produce a response.', ['method', 'route'],
+        buckets=LATENCY_BUCKETS,
+    )
+    RESPONSE_SIZE = Histogram(
+        'http_response_size_bytes', 'Response body size, when known up front.', ['method', 'route'],
+        buckets=SIZE_BUCKETS,
+    )
+    POOL_CHECKED_OUT = Gauge(
+        'db_pool_checked_out', 'Connections currently checked out of the pool.',
+        multiprocess_mode='livesum',
+    )
+    POOL_OVERFLOW = Gauge(
+        'db_pool_overflow', 'Connections open beyond the pool size.', multiprocess_mode='livesum',
+    )
+
+
+def enabled():
+    return REGISTRY is not None
+
+
+class QueueCollector:
+    """Report pending Google sync rows at scrape time."""
+
+    def collect(self):
+        depth = GaugeMetricFamily('google_sync_queue_depth', 'Tasks waiting to be sent to Google.')
+        depth.add_metric([], TaskSyncOutbox.query.filter_by(status='pending').count())
+        yield depth
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _observe(response):
+    started = g.pop('metrics_started', None)
+    if started is None or request.endpoint == 'metrics':
+        return response
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    method = request.method
+    LATENCY.labels(method, route).observe(time.perf_counter() - started)
+    REQUESTS.labels(method, route, str(response.status_code)).inc()
+    if not response.is_streamed:
+        RESPONSE_SIZE.labels(method, route).observe(response.calculate_content_length() or 0)
+    return response
+
+
+def watch_pool(engine):
+    """Keep the pool gauges in step with ``engine``'s connection pool."""
+    def update_overflow(pool):
+        if hasattr(pool, 'overflow'):
+            POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, record, proxy):
+        POOL_CHECKED_OUT.inc()
+        update_overflow(engine.pool)
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, record):
+        POOL_CHECKED_OUT.dec()
+        update_overflow(engine.pool)
+
+
+def scrape_registry():
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_view():
+    queue = CollectorRegistry()
+    queue.register(QueueCollector())
+    body = generate_latest(scrape_registry()) + generate_latest(queue)
+    return Response(body, content_type=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    """Record request metrics for ``app`` and serve them on ``/metrics``."""
+    if not enabled():
+        return
+    app.before_request(_start_timer)
+    app.after_request(_observe)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    with app.app_context():
+        watch_pool(db.engine)
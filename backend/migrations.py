@@ -0,0 +1,166 @@
+"""Versioned schema migrations applied on startup.
+
+``db.create_all`` only creates missing tables, so changes to tables that
+already exist (new indexes, new columns) are listed here as numbered
+migrations. Applied versions are recorded in ``schema_migrations`` and each
+migration runs at most once per database.
+
+On PostgreSQL indexes are built with ``CREATE INDEX CONCURRENTLY`` so writes
+keep flowing while they build, and a session advisory lock keeps two
+processes from migrating at the same time. Run by hand with
+``python migrations.py``.
+"""
+import datetime
+from collections import namedtuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+MIGRATION_LOCK_ID = 7316420
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(128), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+Migration = namedtuple('Migration', 'version name operations')
+
+
+def create_index(name, table, *columns):
+    """Operation building index ``name`` on ``table`` if it is missing."""
+
+    def run(connection):
+        cols = ', '.join(columns)
+        if connection.dialect.name == 'postgresql':
+            # A failed concurrent build leaves an invalid index behind that
+            # IF NOT EXISTS would otherwise skip over.
+            invalid = connection.execute(text(
+                'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+                'WHERE c.relname = :name AND NOT i.indisvalid'
+            ), {'name': name}).first()
+            if invalid:
+                connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            connection.execute(text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({cols})'))
+        else:
+            connection.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})'))
+
+    return run
+
+
+def add_column(table, column, ddl):
+    """Operation adding ``column`` to ``table`` unless it already exists."""
+
+    def run(connection):
+        existing = {c['name'] for c in inspect(connection).get_columns(table)}
+        if column not in existing:
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+    return run
+
+
+def install_search(connection):
+    try:
+        from . import search
+    except ImportError:
+        import search
+    search.install(connection)
+    search.rebuild(connection)
+
+
+MIGRATIONS = [
+    Migration(1, 'foreign key and task filter indexes', [
+        create_index('ix_users_role_id', 'users', 'role_id'),
+        create_index('ix_products_vendor_id', 'products', 'vendor_id'),
+        create_index('ix_projects_client_id', 'projects', 'client_id'),
+        create_index('ix_product_projects_product_id', 'product_projects', 'product_id'),
+        create_index('ix_product_projects_project_id', 'product_projects', 'project_id'),
+        create_index('ix_inventory_product_id', 'inventory', 'product_id'),
+        create_index('ix_clients_employee_id', 'clients', 'employee_id'),
+        create_index('ix_leads_stage_id', 'leads', 'stage_id'),
+        create_index('ix_contracts_client_id', 'contracts', 'client_id'),
+        create_index('ix_contracts_employee_id', 'contracts', 'employee_id'),
+        create_index('ix_contracts_project_id', 'contracts', 'project_id'),
+        create_index('ix_contracts_lead_id', 'contracts', 'lead_id'),
+        create_index('ix_contracts_status_id', 'contracts', 'status_id'),
+        create_index('ix_tasks_contract_id', 'tasks', 'contract_id'),
+        create_index('ix_tasks_completed_due_date', 'tasks', 'completed', 'due_date'),
+        create_index('ix_tasks_due_date', 'tasks', 'due_date'),
+        create_index('ix_task_sync_outbox_task_id', 'task_sync_outbox', 'task_id'),
+        create_index('ix_rooms_project_id', 'rooms', 'project_id'),
+        create_index('ix_items_room_id', 'items', 'room_id'),
+        create_index('ix_proposals_project_id', 'proposals', 'project_id'),
+        create_index('ix_invoices_proposal_id', 'invoices', 'proposal_id'),
+        create_index('ix_notes_project_id', 'notes', 'project_id'),
+    ]),
+    Migration(2, 'full-text search index', [install_search]),
+    Migration(3, 'name indexes for sorted lists', [
+        create_index('ix_vendors_name', 'vendors', 'name'),
+        create_index('ix_products_name', 'products', 'name'),
+        create_index('ix_projects_name', 'projects', 'name'),
+        create_index('ix_clients_name', 'clients', 'name'),
+        create_index('ix_leads_name', 'leads', 'name'),
+    ]),
+    Migration(4, 'row versions for conditional writes', [
+        add_column(table, 'version', 'INTEGER NOT NULL DEFAULT 1') for table in (
+            'vendors', 'products', 'projects', 'product_projects', 'inventory', 'clients',
+            'employees', 'lead_stages', 'leads', 'contract_statuses', 'contracts', 'tasks',
+            'rooms', 'items', 'proposals', 'invoices', 'notes',
+        )
+    ]),
+]
+
+
+def applied_versions(connection):
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(engine, migrations=None):
+    """Apply pending migrations in order; returns the versions applied.
+
+    On PostgreSQL the connection's ``statement_timeout`` and ``lock_timeout``
+    are lifted for the run. Index builds and backfills on large tables, and
+    waiting for another process's migrations, take longer than the request
+    timeout set by ``DB_STATEMENT_TIMEOUT_MS``.
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    applied = []
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        postgres = connection.dialect.name == 'postgresql'
+        if postgres:
+            connection.exec_driver_sql('SET statement_timeout = 0')
+            connection.exec_driver_sql('SET lock_timeout = 0')
+            connection.execute(text('SELECT pg_advisory_lock(:id)'), {'id': MIGRATION_LOCK_ID})
+        try:
+            metadata.create_all(connection)
+            done = applied_versions(connection)
+            for migration in sorted(migrations, key=lambda m: m.version):
+                if migration.version in done:
+                    continue
+                for operation in migration.operations:
+                    operation(connection)
+                connection.execute(schema_migrations.insert().values(
+                    version=migration.version,
+                    name=migration.name,
+                    applied_at=datetime.datetime.utcnow(),
+                ))
+                applied.append(migration.version)
+        finally:
+            if postgres:
+                connection.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': MIGRATION_LOCK_ID})
+                # Back to the engine's defaults before the connection is pooled
+                connection.exec_driver_sql('RESET statement_timeout')
+                connection.exec_driver_sql('RESET lock_timeout')
+    return applied
+
+
+if __name__ == '__main__':
+    try:
+        from .app import app, db
+    except ImportError:
+        from app import app, db
+    with app.app_context():
+        db.create_all()
+        print('Applied migrations:', run_migrations(db.engine) or 'none')
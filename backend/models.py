@@ -1,9 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+import datetime
 
 # Initialize database without app, to avoid circular import
 
 db = SQLAlchemy()
 
+class Versioned:
+    """Row version bumped by every update, for ``If-Match`` conditional writes."""
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
 class Role(db.Model):
     __tablename__ = 'roles'
     id = db.Column(db.Integer, primary_key=True)
@@ -14,13 +20,13 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'))
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), index=True)
     role = db.relationship('Role')
 
-class Vendor(db.Model):
+class Vendor(Versioned, db.Model):
     __tablename__ = 'vendors'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(128), nullable=False)
+    name = db.Column(db.String(128), nullable=False, index=True)
     contact_info = db.Column(db.String(256))
     first_name = db.Column(db.String(64))
     last_name = db.Column(db.String(64))
@@ -35,76 +41,47 @@ class Vendor(db.Model):
     state = db.Column(db.String(32))
     zip_code = db.Column(db.String(10))
     tax_id = db.Column(db.String(64))
-    products = db.relationship('Product', back_populates='vendor')
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'contact_info': self.contact_info,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'primary_email': self.primary_email,
-            'secondary_email': self.secondary_email,
-            'primary_phone': self.primary_phone,
-            'secondary_phone': self.secondary_phone,
-            'description': self.description,
-            'address1': self.address1,
-            'address2': self.address2,
-            'city': self.city,
-            'state': self.state,
-            'zip_code': self.zip_code,
-            'tax_id': self.tax_id,
-            'products': [p.name for p in self.products]
-        }
+    products = db.relationship('Product', back_populates='vendor', order_by='Product.id')
 
-class Product(db.Model):
+class Product(Versioned, db.Model):
     __tablename__ = 'products'
     id = db.Column(db.Integer, primary_key=True)
     sku = db.Column(db.String(64), unique=True, nullable=False)
-    name = db.Column(db.String(128), nullable=False)
+    name = db.Column(db.String(128), nullable=False, index=True)
     price = db.Column(db.Numeric(10,2))
-    vendor_id = db.Column(db.Integer, db.ForeignKey('vendors.id'))
+    vendor_id = db.Column(db.Integer, db.ForeignKey('vendors.id'), index=True)
     vendor = db.relationship('Vendor', back_populates='products')
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'sku': self.sku,
-            'name': self.name,
-            'price': str(self.price),
-            'vendor': self.vendor.name if self.vendor else None
-        }
-
-class Project(db.Model):
+class Project(Versioned, db.Model):
     __tablename__ = 'projects'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(128), nullable=False)
+    name = db.Column(db.String(128), nullable=False, index=True)
     description = db.Column(db.Text)
     start_date = db.Column(db.Date)
-    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'))
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), index=True)
     client = db.relationship('Client')
+    product_links = db.relationship('ProductProject', back_populates='project')
 
-class ProductProject(db.Model):
+class ProductProject(Versioned, db.Model):
     __tablename__ = 'product_projects'
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'))
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'))
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), index=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), index=True)
     quantity = db.Column(db.Integer, default=1)
     product = db.relationship('Product')
-    project = db.relationship('Project')
+    project = db.relationship('Project', back_populates='product_links')
 
-class Inventory(db.Model):
+class Inventory(Versioned, db.Model):
     __tablename__ = 'inventory'
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'))
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), index=True)
     quantity = db.Column(db.Integer, default=0)
     product = db.relationship('Product')
 
-class Client(db.Model):
+class Client(Versioned, db.Model):
     __tablename__ = 'clients'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(128), nullable=False)
+    name = db.Column(db.String(128), nullable=False, index=True)
     first_name = db.Column(db.String(64))
     last_name = db.Column(db.String(64))
     primary_phone = db.Column(db.String(32))
@@ -112,42 +89,42 @@ class Client(db.Model):
     secondary_phone = db.Column(db.String(32))
     secondary_email = db.Column(db.String(128))
     referral_type = db.Column(db.String(64))
-    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'))
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), index=True)
     employee = db.relationship('Employee')
     contact_info = db.Column(db.String(256))
 
-class Employee(db.Model):
+class Employee(Versioned, db.Model):
     __tablename__ = 'employees'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
 
-class LeadStage(db.Model):
+class LeadStage(Versioned, db.Model):
     __tablename__ = 'lead_stages'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), unique=True, nullable=False)
 
-class Lead(db.Model):
+class Lead(Versioned, db.Model):
     __tablename__ = 'leads'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(128), nullable=False)
+    name = db.Column(db.String(128), nullable=False, index=True)
     contact_info = db.Column(db.String(256))
-    stage_id = db.Column(db.Integer, db.ForeignKey('lead_stages.id'))
+    stage_id = db.Column(db.Integer, db.ForeignKey('lead_stages.id'), index=True)
     stage = db.relationship('LeadStage')
 
-class ContractStatus(db.Model):
+class ContractStatus(Versioned, db.Model):
     __tablename__ = 'contract_statuses'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), unique=True, nullable=False)
 
 
-class Contract(db.Model):
+class Contract(Versioned, db.Model):
     __tablename__ = 'contracts'
     id = db.Column(db.Integer, primary_key=True)
-    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'))
-    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'))
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'))
-    lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'))
-    status_id = db.Column(db.Integer, db.ForeignKey('contract_statuses.id'))
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), index=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), index=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), index=True)
+    lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), index=True)
+    status_id = db.Column(db.Integer, db.ForeignKey('contract_statuses.id'), index=True)
     start_date = db.Column(db.Date)
     end_date = db.Column(db.Date)
     amount = db.Column(db.Numeric(10,2))
@@ -159,82 +136,106 @@ class Contract(db.Model):
     status = db.relationship('ContractStatus')
 
 
-class Task(db.Model):
+class Task(Versioned, db.Model):
     __tablename__ = 'tasks'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
     due_date = db.Column(db.Date)
     completed = db.Column(db.Boolean, default=False)
-    contract_id = db.Column(db.Integer, db.ForeignKey('contracts.id'))
+    contract_id = db.Column(db.Integer, db.ForeignKey('contracts.id'), index=True)
     google_task_id = db.Column(db.String(128))
 
     contract = db.relationship('Contract')
-class Room(db.Model):
+
+    __table_args__ = (
+        db.Index('ix_tasks_completed_due_date', 'completed', 'due_date'),
+        db.Index('ix_tasks_due_date', 'due_date'),
+    )
+
+
+class TaskSyncOutbox(db.Model):
+    """Pending Google Tasks deliveries, written in the same transaction as the task."""
+    __tablename__ = 'task_sync_outbox'
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False, index=True)
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    task = db.relationship('Task')
+
+    __table_args__ = (
+        db.Index('ix_task_sync_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+
+class Room(Versioned, db.Model):
     __tablename__ = 'rooms'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'))
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), index=True)
     project = db.relationship('Project')
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'project': self.project.name if self.project else None
-        }
-
-class Item(db.Model):
+class Item(Versioned, db.Model):
     __tablename__ = 'items'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
-    room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'))
+    room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), index=True)
     room = db.relationship('Room')
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'room': self.room.name if self.room else None
-        }
-
-class Proposal(db.Model):
+class Proposal(Versioned, db.Model):
     __tablename__ = 'proposals'
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'))
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), index=True)
     description = db.Column(db.Text)
     project = db.relationship('Project')
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'project': self.project.name if self.project else None,
-            'description': self.description
-        }
-
-class Invoice(db.Model):
+class Invoice(Versioned, db.Model):
     __tablename__ = 'invoices'
     id = db.Column(db.Integer, primary_key=True)
-    proposal_id = db.Column(db.Integer, db.ForeignKey('proposals.id'))
+    proposal_id = db.Column(db.Integer, db.ForeignKey('proposals.id'), index=True)
     amount = db.Column(db.Numeric(10,2))
     proposal = db.relationship('Proposal')
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'proposal_id': self.proposal_id,
-            'amount': str(self.amount) if self.amount else None
-        }
-
-class Note(db.Model):
+class Note(Versioned, db.Model):
     __tablename__ = 'notes'
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.Text, nullable=False)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'))
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), index=True)
     project = db.relationship('Project')
 
+
+class Activity(db.Model):
+    """Append-only log of changes to tracked records, newest first by timestamp."""
+    __tablename__ = 'activity'
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime, nullable=False, index=True, default=datetime.datetime.utcnow)
+    action = db.Column(db.String(16), nullable=False)
+    resource = db.Column(db.String(32), nullable=False)
+    record_id = db.Column(db.Integer)
+    label = db.Column(db.String(256))
+
     def to_dict(self):
         return {
-            'id': self.id,
-            'text': self.text,
-            'project': self.project.name if self.project else None
+            '_type': self.resource,
+            'id': self.record_id,
+            'name': self.label,
+            'action': self.action,
+            'timestamp': self.timestamp.isoformat(),
         }
+
+
+class TableVersion(db.Model):
+    """Per-table change counter, bumped in the same transaction as each write."""
+    __tablename__ = 'table_versions'
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def seed_table_versions(table, connection, **kw):
+    connection.execute(
+        table.insert(),
+        [{'table_name': name, 'version': 0} for name in table.metadata.tables],
+    )
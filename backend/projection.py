@@ -0,0 +1,277 @@
+"""Field projection for list and detail endpoints (``?fields=``).
+
+Each resource declares the fields it can return in ``VIEWS``:
+
+``columns``
+    A column of the resource's own table.
+``related``
+    A column of a row reached through a many-to-one relationship, such as a
+    contract's client name. The related table is outer-joined only when one
+    of its fields is requested.
+``collection``
+    Rows pointing back at the record, such as a vendor's product names.
+    They are loaded for a whole page with one extra ``IN`` query.
+
+Responses select only the columns behind the requested fields, so a grid
+asking for ``?fields=id,name`` reads two columns and joins nothing.
+Views also whitelist the indexed columns their lists can be filtered and
+sorted on.
+"""
+from collections import namedtuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+try:
+    from .models import (
+        Vendor, Product, Project, ProductProject, Inventory, Client, Employee,
+        LeadStage, Lead, ContractStatus, Contract, Task, Room, Item, Proposal,
+        Invoice, Note,
+    )
+    from .serializers import compile_projection
+except ImportError:  # allows running as 'python app.py'
+    from models import (
+        Vendor, Product, Project, ProductProject, Inventory, Client, Employee,
+        LeadStage, Lead, ContractStatus, Contract, Task, Room, Item, Proposal,
+        Invoice, Note,
+    )
+    from serializers import compile_projection
+
+Column = namedtuple('Column', 'attr')
+Related = namedtuple('Related', 'relationship attr')
+Collection = namedtuple('Collection', 'key value join order_by')
+
+# Collections are loaded with ``WHERE key IN (...)`` this many ids at a time
+COLLECTION_BATCH_SIZE = 500
+
+# Compiled serializers kept per view for distinct ``?fields=`` combinations
+MAX_SERIALIZERS = 64
+
+
+def columns(model, *names):
+    """Fields for columns of ``model``'s own table, named after the attributes."""
+    return {name: Column(getattr(model, name)) for name in names}
+
+
+def related(relationship, attr):
+    """Field reading ``attr`` of the row behind a many-to-one ``relationship``."""
+    return Related(relationship, attr)
+
+
+def collection(key, value, join=None, order_by=None):
+    """Field listing rows whose ``key`` column points back at the record.
+
+    ``value`` is a column, giving a list of scalars, or a dict of output
+    keys to columns, giving a list of objects. ``join`` is a relationship
+    followed from ``key``'s table to reach the value columns.
+    """
+    return Collection(key, value, join, order_by)
+
+
+class View:
+    """The fields one resource can return and the SQL behind each of them."""
+
+    def __init__(self, model, fields, list_fields=None, detail_fields=None, filters=(), sorts=()):
+        self.model = model
+        self.list_fields = tuple(list_fields or fields)
+        self.detail_fields = tuple(detail_fields or self.list_fields)
+        # Detail records carry their row version so clients can send it in If-Match
+        if 'version' in model.__table__.c and 'version' not in fields:
+            fields = {**fields, 'version': Column(model.version)}
+            self.detail_fields += ('version',)
+        self.fields = fields
+        # Indexed columns lists may be filtered and sorted on; see filters.py
+        self.filters = ('id',) + tuple(filters)
+        self.sorts = ('id',) + tuple(sorts)
+        self._aliases = {}
+        self._serializers = {}
+        for spec in fields.values():
+            if isinstance(spec, Related) and spec.relationship.key not in self._aliases:
+                self._aliases[spec.relationship.key] = aliased(spec.relationship.property.mapper.class_)
+
+    def parse(self, text, default):
+        """Return the field names listed in ``text``, or ``default`` when absent.
+
+        Raises ``ValueError`` naming any field the resource does not have.
+        """
+        if text is None:
+            return default
+        names = tuple(dict.fromkeys(name.strip() for name in text.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        return names or default
+
+    def tables(self, names):
+        """Names of the tables read to produce ``names``."""
+        tables = {self.model.__tablename__}
+        for name in names:
+            spec = self.fields[name]
+            if isinstance(spec, Related):
+                tables.add(spec.relationship.property.mapper.local_table.name)
+            elif isinstance(spec, Collection):
+                tables.add(spec.key.class_.__tablename__)
+                if spec.join is not None:
+                    tables.add(spec.join.property.mapper.local_table.name)
+        return tables
+
+    def select(self, names):
+        """Select the record id followed by the columns behind ``names``."""
+        selected, joins = [], {}
+        for name in names:
+            spec = self.fields[name]
+            if isinstance(spec, Column) and spec.attr is not self.model.id:
+                selected.append(spec.attr)
+            elif isinstance(spec, Related):
+                selected.append(getattr(self._aliases[spec.relationship.key], spec.attr.key))
+                joins.setdefault(spec.relationship.key, spec.relationship)
+        stmt = select(self.model.id, *selected).select_from(self.model)
+        for relationship in joins.values():
+            stmt = stmt.outerjoin(relationship.of_type(self._aliases[relationship.key]))
+        return stmt
+
+    def serializer(self, names):
+        """Compiled ``f(row) -> dict`` for rows from :meth:`select`."""
+        serialize = self._serializers.get(names)
+        if serialize is None:
+            fields, position = [], 1
+            for name in names:
+                spec = self.fields[name]
+                if isinstance(spec, Column) and spec.attr is self.model.id:
+                    fields.append((name, spec.attr, 0))
+                elif not isinstance(spec, Collection):
+                    fields.append((name, spec.attr, position))
+                    position += 1
+            serialize = compile_projection(f'serialize_{self.model.__tablename__}_fields', fields)
+            if len(self._serializers) < MAX_SERIALIZERS:
+                self._serializers[names] = serialize
+        return serialize
+
+    def serialize(self, session, rows, names):
+        """Serialize ``rows`` from :meth:`select`, loading requested collections for all of them."""
+        serialize = self.serializer(names)
+        items = [serialize(row) for row in rows]
+        ids = [row[0] for row in rows]
+        for name in names:
+            spec = self.fields[name]
+            if isinstance(spec, Collection):
+                grouped = load_collection(session, spec, ids)
+                for item, ident in zip(items, ids):
+                    item[name] = grouped.get(ident, [])
+        return items
+
+
+def load_collection(session, spec, ids):
+    """Return ``{record id: [values]}`` for the collection ``spec``."""
+    if isinstance(spec.value, dict):
+        keys = list(spec.value)
+        values = list(spec.value.values())
+    else:
+        keys, values = None, [spec.value]
+    grouped = {}
+    for start in range(0, len(ids), COLLECTION_BATCH_SIZE):
+        batch = ids[start:start + COLLECTION_BATCH_SIZE]
+        stmt = select(spec.key, *values).where(spec.key.in_(batch))
+        if spec.join is not None:
+            stmt = stmt.join(spec.join)
+        if spec.order_by is not None:
+            stmt = stmt.order_by(spec.order_by)
+        for row in session.execute(stmt):
+            value = row[1] if keys is None else dict(zip(keys, row[1:]))
+            grouped.setdefault(row[0], []).append(value)
+    return grouped
+
+
+VIEWS = {
+    'vendors': View(Vendor, {
+        **columns(
+            Vendor, 'id', 'name', 'contact_info', 'first_name', 'last_name', 'primary_email',
+            'secondary_email', 'primary_phone', 'secondary_phone', 'description', 'address1',
+            'address2', 'city', 'state', 'zip_code', 'tax_id',
+        ),
+        'products': collection(Product.vendor_id, Product.name, order_by=Product.id),
+    }, filters=['name'], sorts=['name']),
+    'products': View(Product, {
+        **columns(Product, 'id', 'sku', 'name', 'price', 'vendor_id'),
+        'vendor': related(Product.vendor, Vendor.name),
+    }, list_fields=['id', 'sku', 'name', 'price', 'vendor'],
+       detail_fields=['id', 'sku', 'name', 'price', 'vendor_id'],
+       filters=['sku', 'name', 'vendor_id'], sorts=['sku', 'name']),
+    'projects': View(Project, {
+        **columns(Project, 'id', 'name', 'description', 'start_date', 'client_id'),
+        'client': related(Project.client, Client.name),
+        'products': collection(
+            ProductProject.project_id,
+            {'id': Product.id, 'name': Product.name, 'quantity': ProductProject.quantity},
+            join=ProductProject.product,
+            order_by=ProductProject.id,
+        ),
+    }, list_fields=['id', 'name', 'description', 'start_date', 'client', 'products'],
+       detail_fields=['id', 'name', 'description', 'start_date', 'client_id', 'client', 'products'],
+       filters=['name', 'client_id'], sorts=['name']),
+    'productprojects': View(
+        ProductProject, columns(ProductProject, 'id', 'product_id', 'project_id', 'quantity'),
+        filters=['product_id', 'project_id'],
+    ),
+    'inventory': View(Inventory, columns(Inventory, 'id', 'product_id', 'quantity'), filters=['product_id']),
+    'clients': View(Client, {
+        **columns(
+            Client, 'id', 'name', 'first_name', 'last_name', 'primary_phone', 'primary_email',
+            'secondary_phone', 'secondary_email', 'referral_type', 'employee_id', 'contact_info',
+        ),
+        'employee': related(Client.employee, Employee.name),
+    }, list_fields=[
+        'id', 'name', 'first_name', 'last_name', 'primary_phone', 'primary_email',
+        'secondary_phone', 'secondary_email', 'referral_type', 'employee', 'contact_info',
+    ], detail_fields=[
+        'id', 'name', 'first_name', 'last_name', 'primary_phone', 'primary_email',
+        'secondary_phone', 'secondary_email', 'referral_type', 'employee_id', 'contact_info',
+    ], filters=['name', 'employee_id'], sorts=['name']),
+    'employees': View(Employee, columns(Employee, 'id', 'name')),
+    'leadstages': View(LeadStage, columns(LeadStage, 'id', 'name'), filters=['name'], sorts=['name']),
+    'leads': View(Lead, {
+        **columns(Lead, 'id', 'name', 'contact_info', 'stage_id'),
+        'stage': related(Lead.stage, LeadStage.name),
+    }, list_fields=['id', 'name', 'contact_info', 'stage'],
+       detail_fields=['id', 'name', 'contact_info', 'stage_id'],
+       filters=['name', 'stage_id'], sorts=['name']),
+    'contractstatuses': View(
+        ContractStatus, columns(ContractStatus, 'id', 'name'), filters=['name'], sorts=['name'],
+    ),
+    'contracts': View(Contract, {
+        **columns(
+            Contract, 'id', 'client_id', 'employee_id', 'project_id', 'lead_id', 'status_id',
+            'start_date', 'end_date', 'amount',
+        ),
+        'client': related(Contract.client, Client.name),
+        'employee': related(Contract.employee, Employee.name),
+        'project': related(Contract.project, Project.name),
+        'lead': related(Contract.lead, Lead.name),
+        'status': related(Contract.status, ContractStatus.name),
+    }, list_fields=['id', 'client', 'employee', 'project', 'project_id', 'lead', 'status', 'amount'],
+       detail_fields=[
+        'id', 'client_id', 'employee_id', 'project_id', 'lead_id', 'status_id',
+        'start_date', 'end_date', 'amount',
+    ], filters=['client_id', 'employee_id', 'project_id', 'lead_id', 'status_id']),
+    'tasks': View(
+        Task, columns(Task, 'id', 'name', 'completed', 'due_date', 'contract_id'),
+        filters=['completed', 'due_date', 'contract_id'], sorts=['due_date'],
+    ),
+    'rooms': View(Room, {
+        **columns(Room, 'id', 'name', 'project_id'),
+        'project': related(Room.project, Project.name),
+    }, list_fields=['id', 'name', 'project'], filters=['project_id']),
+    'items': View(Item, {
+        **columns(Item, 'id', 'name', 'room_id'),
+        'room': related(Item.room, Room.name),
+    }, list_fields=['id', 'name', 'room'], filters=['room_id']),
+    'proposals': View(Proposal, {
+        **columns(Proposal, 'id', 'project_id', 'description'),
+        'project': related(Proposal.project, Project.name),
+    }, list_fields=['id', 'project', 'description'], filters=['project_id']),
+    'invoices': View(Invoice, columns(Invoice, 'id', 'proposal_id', 'amount'), filters=['proposal_id']),
+    'notes': View(Note, {
+        **columns(Note, 'id', 'text', 'project_id'),
+        'project': related(Note.project, Project.name),
+    }, list_fields=['id', 'text', 'project'], filters=['project_id']),
+}
@@ -0,0 +1,291 @@
+"""Full-text search over clients, vendors, products, leads and notes.
+
+Each searchable row is mirrored into one text index as a document with a
+``title`` (the record's name) and a ``body`` (its other searchable fields).
+Triggers on the source tables keep the index current. Every write path
+updates it in the same transaction: ORM flushes, bulk imports, upserts and
+raw SQL.
+
+PostgreSQL
+    ``search_documents`` has a generated, weighted ``tsvector`` column with a
+    GIN index. When a query matches nothing, the search falls back to
+    ``pg_trgm`` similarity, which catches typos and fragments of emails or
+    phone numbers.
+SQLite
+    An FTS5 table ``search_index`` ranked with bm25, used in tests and
+    embedded mode. The rowid encodes the source row, so updates and deletes
+    are single-row operations.
+
+The schema is installed whenever ``db.create_all()`` runs. Migration 2 also
+backfills documents for rows written before the index existed.
+"""
+import re
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+
+try:
+    from .models import db
+except ImportError:  # allows running as 'python app.py'
+    from models import db
+
+# resource -> (code, title column, body columns). The code is packed into the
+# SQLite rowid together with the record id.
+SOURCES = {
+    'clients': (1, 'name', ['first_name', 'last_name', 'primary_email', 'secondary_email',
+                            'primary_phone', 'secondary_phone', 'contact_info']),
+    'vendors': (2, 'name', ['contact_info', 'first_name', 'last_name', 'primary_email',
+                            'secondary_email', 'primary_phone', 'secondary_phone']),
+    'products': (3, 'name', ['sku']),
+    'leads': (4, 'name', ['contact_info']),
+    'notes': (5, None, ['text']),
+}
+ROWID_STRIDE = 8
+
+_TOKENS = re.compile(r'\w+', re.UNICODE)
+
+
+def title_sql(resource, prefix):
+    column = SOURCES[resource][1]
+    return f'{prefix}{column}' if column else 'NULL'
+
+
+def body_sql(resource, prefix):
+    return " || ' ' || ".join(f"coalesce({prefix}{col}, '')" for col in SOURCES[resource][2])
+
+
+def sqlite_rowid(resource, prefix):
+    return f'{prefix}id * {ROWID_STRIDE} + {SOURCES[resource][0]}'
+
+
+def sqlite_schema():
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "title, body, resource UNINDEXED, record_id UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ]
+    for resource in SOURCES:
+        values = (
+            f"({sqlite_rowid(resource, 'new.')}, {title_sql(resource, 'new.')}, "
+            f"{body_sql(resource, 'new.')}, '{resource}', new.id)"
+        )
+        insert_doc = f'INSERT INTO search_index (rowid, title, body, resource, record_id) VALUES {values};'
+        delete_doc = f"DELETE FROM search_index WHERE rowid = {sqlite_rowid(resource, 'old.')};"
+        statements += [
+            f'CREATE TRIGGER IF NOT EXISTS search_{resource}_ai AFTER INSERT ON {resource} '
+            f'BEGIN {insert_doc} END',
+            f'CREATE TRIGGER IF NOT EXISTS search_{resource}_au AFTER UPDATE ON {resource} '
+            f'BEGIN {delete_doc} {insert_doc} END',
+            f'CREATE TRIGGER IF NOT EXISTS search_{resource}_ad AFTER DELETE ON {resource} '
+            f'BEGIN {delete_doc} END',
+        ]
+    return statements
+
+
+def postgres_schema(existing_triggers=()):
+    """Statements creating the index and its triggers.
+
+    Triggers named in ``existing_triggers`` are left alone: recreating one
+    takes an ACCESS EXCLUSIVE lock on its table. Their functions are still
+    replaced, which needs no table lock.
+    """
+    statements = [
+        "CREATE TABLE IF NOT EXISTS search_documents ("
+        "resource varchar(32) NOT NULL, record_id integer NOT NULL, title text, body text, "
+        "document tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(body, '')), 'B')) STORED, "
+        "PRIMARY KEY (resource, record_id))",
+        'CREATE INDEX IF NOT EXISTS ix_search_documents_document ON search_documents USING gin (document)',
+    ]
+    for resource in SOURCES:
+        statements += [
+            f"CREATE OR REPLACE FUNCTION search_{resource}_sync() RETURNS trigger AS $$ "
+            f"BEGIN "
+            f"IF TG_OP = 'DELETE' THEN "
+            f"DELETE FROM search_documents WHERE resource = '{resource}' AND record_id = OLD.id; "
+            f"RETURN OLD; "
+            f"END IF; "
+            f"INSERT INTO search_documents (resource, record_id, title, body) VALUES "
+            f"('{resource}', NEW.id, {title_sql(resource, 'NEW.')}, {body_sql(resource, 'NEW.')}) "
+            f"ON CONFLICT (resource, record_id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body; "
+            f"RETURN NEW; "
+            f"END $$ LANGUAGE plpgsql",
+        ]
+        if f'search_{resource}_sync' not in existing_triggers:
+            statements.append(
+                f'CREATE TRIGGER search_{resource}_sync AFTER INSERT OR UPDATE OR DELETE ON {resource} '
+                f'FOR EACH ROW EXECUTE FUNCTION search_{resource}_sync()'
+            )
+    return statements
+
+
+def postgres_triggers(connection):
+    """Names of the search triggers already installed."""
+    names = ', '.join(f"'search_{resource}_sync'" for resource in SOURCES)
+    return set(connection.exec_driver_sql(
+        f'SELECT tgname FROM pg_trigger WHERE NOT tgisinternal AND tgname IN ({names})'
+    ).scalars())
+
+
+def install_trigram(connection):
+    """Add the pg_trgm fallback index when the extension is available."""
+    autocommit = connection.get_execution_options().get('isolation_level') == 'AUTOCOMMIT'
+    savepoint = None if autocommit else connection.begin_nested()
+    try:
+        connection.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        connection.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_search_documents_trgm ON search_documents "
+            "USING gin ((coalesce(title, '') || ' ' || coalesce(body, '')) gin_trgm_ops)"
+        )
+    except SQLAlchemyError:
+        if savepoint is not None:
+            savepoint.rollback()
+        return False
+    if savepoint is not None:
+        savepoint.commit()
+    return True
+
+
+def install(connection):
+    """Create the index table and the triggers feeding it, if missing."""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        statements = sqlite_schema()
+    elif dialect == 'postgresql':
+        statements = postgres_schema(postgres_triggers(connection))
+    else:
+        return
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+    if dialect == 'postgresql':
+        install_trigram(connection)
+
+
+def uninstall(connection):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        connection.exec_driver_sql('DROP TABLE IF EXISTS search_index')
+    elif dialect == 'postgresql':
+        connection.exec_driver_sql('DROP TABLE IF EXISTS search_documents')
+
+
+def rebuild(connection):
+    """Re-index every searchable row with one INSERT ... SELECT per table."""
+    dialect = connection.dialect.name
+    for resource in SOURCES:
+        if dialect == 'sqlite':
+            connection.exec_driver_sql(f"DELETE FROM search_index WHERE resource = '{resource}'")
+            connection.exec_driver_sql(
+                f"INSERT INTO search_index (rowid, title, body, resource, record_id) "
+                f"SELECT {sqlite_rowid(resource, '')}, {title_sql(resource, '')}, "
+                f"{body_sql(resource, '')}, '{resource}', id FROM {resource}"
+            )
+        elif dialect == 'postgresql':
+            connection.exec_driver_sql(f"DELETE FROM search_documents WHERE resource = '{resource}'")
+            connection.exec_driver_sql(
+                f"INSERT INTO search_documents (resource, record_id, title, body) "
+                f"SELECT '{resource}', id, {title_sql(resource, '')}, {body_sql(resource, '')} "
+                f"FROM {resource}"
+            )
+
+
+@event.listens_for(db.metadata, 'after_create')
+def install_after_create(metadata, connection, **kw):
+    install(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def uninstall_before_drop(metadata, connection, **kw):
+    uninstall(connection)
+
+
+def query_tokens(q):
+    return _TOKENS.findall(q or '')[:16]
+
+
+def search(connection, q, resources=None, limit=20, offset=0):
+    """Return up to ``limit + 1`` ranked matches for ``q`` starting at ``offset``.
+
+    Each match is a dict with ``_type``, ``id``, ``name``, ``snippet`` and
+    ``rank`` (higher is better). Every query token must match, either as a
+    whole word or as a prefix.
+    """
+    tokens = query_tokens(q)
+    if not tokens:
+        return []
+    resources = [r for r in (resources or SOURCES) if r in SOURCES]
+    if not resources:
+        return []
+    if connection.dialect.name == 'postgresql':
+        rows = _search_postgres(connection, tokens, resources, limit, offset)
+        # Later pages of a fallback search still find no full-text match at all
+        if not rows and (offset == 0 or not _search_postgres(connection, tokens, resources, 0, 0)):
+            rows = _search_trigram(connection, ' '.join(tokens), resources, limit, offset)
+    else:
+        rows = _search_sqlite(connection, tokens, resources, limit, offset)
+    results = []
+    for row in rows:
+        snippet = clean_snippet(row.snippet)
+        results.append({
+            '_type': row.resource,
+            'id': row.record_id,
+            'name': row.title or snippet,
+            'snippet': snippet,
+            'rank': round(float(row.rank), 4),
+        })
+    return results
+
+
+def clean_snippet(snippet):
+    """Collapse the gaps left by empty body columns; ``None`` if nothing remains."""
+    return ' '.join((snippet or '').split()) or None
+
+
+def _resource_filter(resources, column='resource'):
+    if len(resources) == len(SOURCES):
+        return '', {}
+    names = {f'r{i}': name for i, name in enumerate(resources)}
+    return f" AND {column} IN ({', '.join(':' + key for key in names)})", names
+
+
+def _search_sqlite(connection, tokens, resources, limit, offset):
+    match = ' '.join('"' + token.replace('"', '') + '"*' for token in tokens)
+    where, params = _resource_filter(resources)
+    return connection.execute(text(
+        "SELECT resource, record_id, title, "
+        "snippet(search_index, 1, '', '', '...', 12) AS snippet, "
+        "-bm25(search_index, 10.0, 1.0) AS rank "
+        "FROM search_index WHERE search_index MATCH :match" + where +
+        " ORDER BY bm25(search_index, 10.0, 1.0) LIMIT :limit OFFSET :offset"
+    ), {'match': match, 'limit': limit + 1, 'offset': offset, **params}).all()
+
+
+def _search_postgres(connection, tokens, resources, limit, offset):
+    where, params = _resource_filter(resources)
+    return connection.execute(text(
+        "SELECT d.resource, d.record_id, d.title, d.rank, "
+        "ts_headline('simple', coalesce(d.body, ''), to_tsquery('simple', :query), "
+        "'MaxWords=12, MinWords=4') AS snippet "
+        "FROM (SELECT resource, record_id, title, body, "
+        "ts_rank_cd(document, to_tsquery('simple', :query)) AS rank "
+        "FROM search_documents WHERE document @@ to_tsquery('simple', :query)" + where +
+        " ORDER BY rank DESC, resource, record_id LIMIT :limit OFFSET :offset) AS d "
+        "ORDER BY d.rank DESC, d.resource, d.record_id"
+    ), {'query': ' & '.join(f'{token}:*' for token in tokens),
+        'limit': limit + 1, 'offset': offset, **params}).all()
+
+
+def _search_trigram(connection, phrase, resources, limit, offset):
+    where, params = _resource_filter(resources)
+    document = "(coalesce(title, '') || ' ' || coalesce(body, ''))"
+    try:
+        with connection.begin_nested():
+            return connection.execute(text(
+                f"SELECT resource, record_id, title, left(coalesce(body, ''), 80) AS snippet, "
+                f"similarity({document}, :phrase) AS rank "
+                f"FROM search_documents WHERE {document} % :phrase" + where +
+                " ORDER BY rank DESC, resource, record_id LIMIT :limit OFFSET :offset"
+            ), {'phrase': phrase, 'limit': limit + 1, 'offset': offset, **params}).all()
+    except SQLAlchemyError:  # pg_trgm not installed
+        return []
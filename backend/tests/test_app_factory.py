@@ -0,0 +1,42 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+from backend.app import app, cache, create_app, db, engine_options, init_database, Employee, LeadStage
+
+
+def setup_function(function):
+    cache.clear()
+    with app.app_context():
+        db.drop_all()
+
+
+def test_engine_options_come_from_config():
+    config = {
+        'SQLALCHEMY_DATABASE_URI': 'postgresql://u:p@db/app',
+        'DB_POOL_SIZE': 7,
+        'DB_MAX_OVERFLOW': 3,
+        'DB_POOL_TIMEOUT': 2.5,
+        'DB_POOL_RECYCLE': 600,
+        'DB_STATEMENT_TIMEOUT_MS': 5000,
+    }
+    options = engine_options(config)
+    assert options['pool_size'] == 7
+    assert options['max_overflow'] == 3
+    assert options['pool_pre_ping'] is True
+    assert options['connect_args'] == {'options': '-c statement_timeout=5000'}
+    assert engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'}) == {}
+
+
+def test_factory_builds_pooled_apps():
+    pg_app = create_app({'SQLALCHEMY_DATABASE_URI': 'postgresql+psycopg2://u:p@db/app', 'DB_POOL_SIZE': 9})
+    with pg_app.app_context():
+        assert db.engine.pool.size() == 9
+    assert any(rule.rule == '/vendors' for rule in pg_app.url_map.iter_rules())
+
+
+def test_init_database_creates_and_seeds_once():
+    assert init_database(app)
+    assert init_database(app)
+    with app.app_context():
+        assert LeadStage.query.count() == 4
+        assert Employee.query.count() == 4
@@ -0,0 +1,166 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+import werkzeug
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '0'
+import contextlib
+import fnmatch
+import socketserver
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from backend.app import app, cache, db, Employee
+from backend.cache import MemoryCache, RedisCache
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """Tiny Redis-protocol stand-in covering the commands RedisCache uses."""
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def write(self, value):
+        if value is None:
+            self.wfile.write(b'$-1\r\n')
+        elif isinstance(value, int):
+            self.wfile.write(b':%d\r\n' % value)
+        elif isinstance(value, bytes):
+            self.wfile.write(b'$%d\r\n%s\r\n' % (len(value), value))
+        elif isinstance(value, list):
+            self.wfile.write(b'*%d\r\n' % len(value))
+            for item in value:
+                self.write(item)
+        else:
+            self.wfile.write(b'+%s\r\n' % value.encode())
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            cmd, rest = args[0].upper(), args[1:]
+            if cmd == b'GET':
+                self.write(store.get(rest[0]))
+            elif cmd == b'SET':
+                store[rest[0]] = rest[1]
+                self.write('OK')
+            elif cmd == b'SADD':
+                members = store.setdefault(rest[0], set())
+                before = len(members)
+                members.update(rest[1:])
+                self.write(len(members) - before)
+            elif cmd == b'SMEMBERS':
+                self.write(sorted(store.get(rest[0], ())))
+            elif cmd == b'DEL':
+                self.write(sum(store.pop(k, None) is not None for k in rest))
+            elif cmd == b'EXPIRE':
+                self.write(1)
+            elif cmd == b'SCAN':
+                pattern = rest[rest.index(b'MATCH') + 1].decode() if b'MATCH' in rest else '*'
+                keys = [k for k in store if fnmatch.fnmatch(k.decode(), pattern)]
+                self.write([b'0', keys])
+            else:
+                self.write('OK')
+
+
+@pytest.fixture
+def resp_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), RespHandler)
+    server.daemon_threads = True
+    server.store = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@contextlib.contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def setup_function(function):
+    cache.clear()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for name in ['Stephanie Scher', 'Sable Murphy']:
+            db.session.add(Employee(name=name))
+        db.session.commit()
+
+
+def test_memory_cache_lru_and_tags():
+    lru = MemoryCache(maxsize=2, ttl=60)
+    lru.set('a', 1, ('t1',))
+    lru.set('b', 2, ('t2',))
+    lru.get('a')
+    lru.set('c', 3, ('t2',))
+    assert lru.get('b') is None
+    assert lru.get('a') == 1
+    lru.invalidate(['t2'])
+    assert lru.get('c') is None
+    assert lru.get('a') == 1
+
+    expired = MemoryCache(ttl=-1)
+    expired.set('a', 1)
+    assert expired.get('a') is None
+
+
+def test_redis_cache_against_stand_in(resp_server):
+    pytest.importorskip('redis')
+    shared = RedisCache(f'redis://127.0.0.1:{resp_server.server_address[1]}/0')
+    shared.set('employees:1', {'id': 1, 'name': 'E'}, ('employees',))
+    assert shared.get('employees:1') == {'id': 1, 'name': 'E'}
+    shared.invalidate(['employees'])
+    assert shared.get('employees:1') is None
+
+
+def test_lookups_and_details_are_cached_until_commit():
+    with app.app_context():
+        client = app.test_client()
+        client.get('/employees')
+        with count_queries() as statements:
+            assert len(client.get('/employees').get_json()) == 2
+        assert not any('FROM employees' in s for s in statements)
+
+        client.get('/employees/1')
+        with count_queries() as statements:
+            assert client.get('/employees/1').get_json()['name'] == 'Stephanie Scher'
+        assert not any('FROM employees' in s for s in statements)
+
+        client.put('/employees/1', json={'name': 'Renamed'})
+        assert client.get('/employees/1').get_json()['name'] == 'Renamed'
+        assert client.get('/employees').get_json()[0]['name'] == 'Renamed'
+
+
+def test_entries_left_behind_by_other_workers_are_not_served(monkeypatch):
+    with app.app_context():
+        client = app.test_client()
+        client.get('/employees')
+        client.get('/employees/1')
+
+        # A commit made by another worker never reaches this process's cache
+        monkeypatch.setattr(cache, 'invalidate', lambda tags: None)
+        client.put('/employees/1', json={'name': 'Renamed'})
+        assert client.get('/employees/1').get_json()['name'] == 'Renamed'
+        assert client.get('/employees').get_json()[0]['name'] == 'Renamed'
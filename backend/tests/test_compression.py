@@ -0,0 +1,160 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+import werkzeug
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '0'
+import gzip
+import json
+import zlib
+
+import pytest
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from backend.app import app, cache, db, Vendor
+from backend import compression
+
+
+def setup_function(function):
+    cache.clear()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([Vendor(name=f'Vendor {i}', primary_email=f'v{i}@example.com') for i in range(100)])
+        db.session.commit()
+
+
+def accept(header):
+    return parse_accept_header(header, Accept)
+
+
+def encoder(name):
+    for candidate in compression.ENCODERS:
+        if candidate.name == name:
+            return candidate
+    pytest.skip(f'{name} support is not installed')
+
+
+def decode(name, data):
+    if name == 'gzip':
+        return gzip.decompress(data)
+    if name == 'br':
+        return compression.brotli.decompress(data)
+    return compression.zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+def test_negotiate_follows_q_values_then_preference():
+    names = [e.name for e in compression.ENCODERS]
+    assert compression.negotiate(accept('identity')) is None
+    assert compression.negotiate(accept('gzip')).name == 'gzip'
+    assert compression.negotiate(accept('gzip, deflate, br, zstd')).name == names[0]
+    assert compression.negotiate(accept('br;q=0.5, gzip')).name == 'gzip'
+    assert compression.negotiate(accept('*')).name == names[0]
+
+
+def test_large_responses_are_compressed_and_small_ones_are_not():
+    with app.app_context():
+        client = app.test_client()
+        plain = client.get('/vendors').get_data()
+        rv = client.get('/vendors', headers={'Accept-Encoding': 'gzip'})
+        assert rv.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in rv.headers['Vary']
+        assert gzip.decompress(rv.get_data()) == plain
+        assert len(rv.get_data()) < len(plain) / 3
+        assert 'compress;dur=' in rv.headers['Server-Timing']
+
+        rv = client.get('/vendors/1', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in rv.headers
+        assert rv.get_json()['name'] == 'Vendor 0'
+
+        rv = client.get('/vendors')
+        assert 'Content-Encoding' not in rv.headers
+        assert 'Accept-Encoding' in rv.headers['Vary']
+
+
+def test_cpu_budget_picks_fast_level_or_skips(monkeypatch):
+    gz = encoder('gzip')
+    monkeypatch.setattr(gz, 'rates', {6: 1e6, 1: 10e6})
+    assert compression.choose_level(gz, 10_000, 0.025) == 6
+    assert compression.choose_level(gz, 100_000, 0.025) == 1
+    assert compression.choose_level(gz, 1_000_000, 0.025) is None
+
+    monkeypatch.setattr(gz, 'rates', {6: 1.0, 1: 1.0})
+    with app.app_context():
+        rv = app.test_client().get('/vendors', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in rv.headers
+    assert rv.get_json()[0]['name'] == 'Vendor 0'
+
+
+def test_observed_throughput_updates_estimate():
+    gz = compression.GzipEncoder('gzip', 6, 1, {6: 100.0, 1: 100.0})
+    gz.observe(1000, 6, 1.0)
+    assert gz.rates[6] == pytest.approx(100 + compression.RATE_SMOOTHING * 900)
+    assert gz.rates[1] == 100.0
+
+
+@pytest.mark.parametrize('name', ['gzip', 'br', 'zstd'])
+def test_streamed_export_decodes_chunk_by_chunk(name):
+    enc = encoder(name)
+    rows = [json.dumps({'id': i, 'name': f'Row {i}'}).encode() + b'\n' for i in range(30)]
+    chunks = list(compression.compress_stream(iter([b''.join(rows[i:i + 10]) for i in range(0, 30, 10)]),
+                                              enc, enc.fast_level))
+    # Every chunk is flushed, so each prefix of the stream decodes to whole rows
+    if name == 'gzip':
+        decoder = zlib.decompressobj(31)
+        received = [decoder.decompress(chunk) for chunk in chunks]
+    elif name == 'br':
+        decoder = compression.brotli.Decompressor()
+        received = [decoder.process(chunk) for chunk in chunks]
+    else:
+        decoder = compression.zstandard.ZstdDecompressor().decompressobj()
+        received = [decoder.decompress(chunk) for chunk in chunks]
+    assert received[:3] == [b''.join(rows[i:i + 10]) for i in range(0, 30, 10)]
+    assert b''.join(received) == b''.join(rows)
+
+    with app.app_context():
+        rv = app.test_client().get('/export/vendors?format=ndjson&batch_size=30',
+                                   headers={'Accept-Encoding': name})
+    assert rv.headers['Content-Encoding'] == name
+    assert 'Content-Length' not in rv.headers
+    lines = decode(name, rv.get_data()).decode().splitlines()
+    assert len(lines) == 100
+
+
+def test_compression_can_be_disabled(monkeypatch):
+    monkeypatch.setitem(app.config, 'COMPRESS', False)
+    with app.app_context():
+        client = app.test_client()
+        rv = client.get('/vendors', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in rv.headers
+        rv = client.get('/export/vendors?format=ndjson', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in rv.headers
+        assert len(rv.get_data(as_text=True).splitlines()) == 100
+
+
+def test_encoded_responses_carry_their_own_etag(monkeypatch):
+    monkeypatch.setitem(app.config, 'COMPRESS_MIN_SIZE', 0)
+    with app.app_context():
+        client = app.test_client()
+        plain = client.get('/vendors/1')
+        rv = client.get('/vendors/1', headers={'Accept-Encoding': 'gzip'})
+        assert rv.headers['Content-Encoding'] == 'gzip'
+        tag = plain.get_etag()[0]
+        assert rv.get_etag() == (f'{tag}-gzip', False)
+
+        rv = client.get('/vendors/1', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{tag}-gzip"'})
+        assert rv.status_code == 304
+        assert rv.get_etag() == (f'{tag}-gzip', False)
+
+        rv = client.get('/vendors', headers={'Accept-Encoding': 'gzip'})
+        weak_tag, weak = rv.get_etag()
+        assert weak and weak_tag.endswith('-gzip')
+        rv = client.get('/vendors', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'W/"{weak_tag}"'})
+        assert rv.status_code == 304
+        assert rv.get_etag() == (weak_tag, True)
+
+        rv = client.put('/vendors/1', json={'city': 'Reno'}, headers={'If-Match': f'"{tag}-gzip"'})
+        assert rv.status_code == 200
+        rv = client.put('/vendors/1', json={'city': 'Elko'}, headers={'If-Match': f'"{tag}-gzip"'})
+        assert rv.status_code == 412
@@ -0,0 +1,25 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+from backend.app import app, cache, db, Activity, Contract, ProductProject, Task
+import datagen
+
+
+def setup_function(function):
+    cache.clear()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+def test_generate_fills_related_tables():
+    with app.app_context():
+        sizes = datagen.generate(db.engine, 200)
+        assert sizes['tasks'] == Task.query.count() == 200
+        assert ProductProject.query.count() == 200
+        assert Contract.query.count() == sizes['contracts'] == 40
+        assert ProductProject.query.filter(~ProductProject.product.has()).count() == 0
+        assert Task.query.filter(~Task.contract.has()).count() == 0
+        actions = {action for (action,) in db.session.query(Activity.action).distinct()}
+        assert actions <= {'create', 'update', 'delete', 'import'}
@@ -1,13 +1,30 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+import contextlib
 import werkzeug
 if not hasattr(werkzeug, '__version__'):
     werkzeug.__version__ = '0'
-from backend.app import app, db, Employee, LeadStage, ContractStatus
+from sqlalchemy import event
+from backend.app import app, cache, db, Employee, LeadStage, ContractStatus
+
+
+@contextlib.contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
 
 
 def setup_function(function):
+    cache.clear()
     with app.app_context():
         db.drop_all()
         db.create_all()
@@ -224,3 +241,655 @@ def test_export_and_import():
         rv = client.post('/import/vendors', json=data)
         assert rv.status_code == 201
         assert len(client.get('/vendors').get_json()) == 1
+
+
+def test_project_listing_query_count_is_constant():
+    with app.app_context():
+        client = app.test_client()
+        vendor_id = client.post('/vendors', json={'name': 'V'}).get_json()['id']
+        product_ids = [
+            client.post('/products', json={'sku': f'S{i}', 'name': f'P{i}', 'vendor_id': vendor_id}).get_json()['id']
+            for i in range(3)
+        ]
+        for i in range(10):
+            client_id = client.post('/clients', json={'name': f'C{i}'}).get_json()['id']
+            client.post('/projects', json={'name': f'Proj{i}', 'client_id': client_id, 'product_ids': product_ids})
+
+        with count_queries() as statements:
+            rv = client.get('/projects')
+        projects = rv.get_json()
+        assert len(projects) == 10
+        assert projects[0]['client'] == 'C0'
+        assert [p['name'] for p in projects[0]['products']] == ['P0', 'P1', 'P2']
+        # table version lookup for the ETag, projects, product links
+        assert len(statements) <= 3
+
+        with count_queries() as statements:
+            rv = client.get(f"/projects/{projects[0]['id']}")
+        assert rv.get_json()['client'] == 'C0'
+        assert len(rv.get_json()['products']) == 3
+        assert len(statements) <= 3
+
+
+def test_keyset_pagination():
+    with app.app_context():
+        client = app.test_client()
+        for i in range(5):
+            client.post('/vendors', json={'name': f'V{i}'})
+
+        # unpaginated calls keep returning a bare list
+        assert len(client.get('/vendors').get_json()) == 5
+
+        rv = client.get('/vendors?limit=2')
+        page = rv.get_json()
+        assert [v['name'] for v in page['items']] == ['V0', 'V1']
+        names = [v['name'] for v in page['items']]
+        while page['next_cursor']:
+            page = client.get(f"/vendors?limit=2&after={page['next_cursor']}").get_json()
+            names.extend(v['name'] for v in page['items'])
+        assert names == [f'V{i}' for i in range(5)]
+
+        assert client.get('/vendors?limit=0').status_code == 400
+        assert client.get('/vendors?limit=2&after=bogus').status_code == 400
+
+
+def test_export_ndjson_stream():
+    import gzip, json
+    with app.app_context():
+        client = app.test_client()
+        for i in range(5):
+            client.post('/vendors', json={'name': f'V{i}'})
+
+        rv = client.get('/export/vendors?format=ndjson&batch_size=2')
+        assert rv.mimetype == 'application/x-ndjson'
+        rows = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+        assert [r['name'] for r in rows] == [f'V{i}' for i in range(5)]
+
+        rv = client.get('/export/vendors', headers={
+            'Accept': 'application/x-ndjson',
+            'Accept-Encoding': 'gzip',
+        })
+        assert rv.headers['Content-Encoding'] == 'gzip'
+        lines = gzip.decompress(rv.get_data()).decode().splitlines()
+        assert len(lines) == 5
+
+
+def test_bulk_import_batches_and_row_errors():
+    with app.app_context():
+        client = app.test_client()
+        rows = [{'name': f'T{i}', 'due_date': '2024-01-0%d' % (i + 1), 'completed': False} for i in range(5)]
+        rows.insert(2, {'due_date': '2024-02-01'})
+        rows.insert(4, {'name': 'BadDate', 'due_date': 'not-a-date'})
+
+        rv = client.post('/import/tasks?batch_size=2', json=rows)
+        assert rv.status_code == 201
+        result = rv.get_json()
+        assert result['imported'] == 5
+        assert [b['rows'] for b in result['batches']] == [2, 2, 1]
+        assert [e['row'] for e in result['errors']] == [2, 4]
+
+        tasks = client.get('/tasks').get_json()
+        assert [t['due_date'] for t in tasks] == [f'2024-01-0{i + 1}' for i in range(5)]
+
+        rv = client.post('/import/tasks', json=[{'due_date': '2024-01-01'}])
+        assert rv.status_code == 400
+
+        rv = client.post('/import/products', json=[
+            {'sku': 'A', 'name': 'One'}, {'sku': 'A', 'name': 'Dup'}, {'sku': 'B', 'name': 'Two'},
+        ])
+        result = rv.get_json()
+        assert result['imported'] == 2
+        assert [e['row'] for e in result['errors']] == [1]
+
+
+def test_upsert_import_on_natural_keys():
+    with app.app_context():
+        client = app.test_client()
+        client.post('/products', json={'sku': 'S1', 'name': 'Chair', 'price': '10.00'})
+        client.post('/vendors', json={'name': 'Acme', 'city': 'Reno'})
+
+        catalog = [
+            {'sku': 'S1', 'name': 'Chair v2', 'price': '12.50'},
+            {'sku': 'S2', 'name': 'Table', 'price': '99.00'},
+        ]
+        with count_queries() as statements:
+            rv = client.post('/import/products?mode=upsert', json=catalog)
+        assert rv.status_code == 201
+        assert rv.get_json()['imported'] == 2
+        assert len([s for s in statements if 'products' in s]) == 1
+        products = {p['sku']: p for p in client.get('/export/products').get_json()}
+        assert len(products) == 2
+        assert products['S1']['name'] == 'Chair v2'
+        assert products['S1']['price'] == '12.50'
+
+        # vendors have no unique constraint: matched with one lookup query
+        rv = client.post('/import/vendors?mode=upsert', json=[
+            {'name': 'Acme', 'city': 'Austin'},
+            {'name': 'Globex', 'city': 'Boise'},
+        ])
+        assert rv.get_json()['imported'] == 2
+        vendors = {v['name']: v for v in client.get('/vendors').get_json()}
+        assert len(vendors) == 2
+        assert vendors['Acme']['city'] == 'Austin'
+
+        assert client.post('/import/notes?mode=upsert', json=[]).status_code == 400
+        assert client.post('/import/products?mode=bogus', json=[]).status_code == 400
+
+
+def test_batch_runs_operations_in_one_transaction():
+    commits = []
+
+    def after_commit(session):
+        commits.append(session)
+
+    with app.app_context():
+        client = app.test_client()
+        client.post('/vendors', json={'name': 'Old'})
+        event.listen(db.session, 'after_commit', after_commit)
+        try:
+            rv = client.post('/batch', json={'operations': [
+                {'op': 'create', 'resource': 'clients', 'ref': 'client', 'data': {'name': 'Ann'}},
+                {'op': 'create', 'resource': 'projects', 'ref': 'project',
+                 'data': {'name': 'Loft', 'start_date': '2024-03-01', 'client_id': {'$ref': 'client'}}},
+                {'op': 'create', 'resource': 'rooms', 'data': {'name': 'Kitchen', 'project_id': {'$ref': 'project'}}},
+                {'op': 'create', 'resource': 'notes', 'data': {'text': 'Measure', 'project_id': {'$ref': 'project'}}},
+                {'op': 'update', 'resource': 'clients', 'id': {'$ref': 'client'}, 'data': {'name': 'Ann Lee'}},
+                {'op': 'get', 'resource': 'projects', 'id': {'$ref': 'project'}, 'fields': 'id,name,client'},
+                {'op': 'delete', 'resource': 'vendors', 'id': 1},
+            ]})
+        finally:
+            event.remove(db.session, 'after_commit', after_commit)
+        assert rv.status_code == 200
+        results = rv.get_json()['results']
+        assert [r['status'] for r in results] == [201, 201, 201, 201, 200, 200, 204]
+        client_id, project_id = results[0]['id'], results[1]['id']
+        assert results[5]['body'] == {'id': project_id, 'name': 'Loft', 'client': 'Ann Lee'}
+        assert len(commits) == 1
+
+        assert client.get(f'/rooms?project_id={project_id}').get_json()[0]['name'] == 'Kitchen'
+        assert client.get(f'/clients/{client_id}').get_json()['name'] == 'Ann Lee'
+        assert client.get('/vendors').get_json() == []
+        actions = [(e['action'], e['_type']) for e in client.get('/recent').get_json()]
+        assert ('create', 'notes') in actions and ('delete', 'vendors') in actions
+
+
+def test_batch_creates_match_the_post_endpoints(monkeypatch):
+    from sqlalchemy.exc import IntegrityError
+    from backend.models import TaskSyncOutbox
+    with app.app_context():
+        client = app.test_client()
+        rv = client.post('/batch', json=[
+            {'op': 'create', 'resource': 'clients', 'data': {'first_name': 'Ann', 'last_name': 'Lee'}},
+            {'op': 'create', 'resource': 'products', 'ref': 'chair', 'data': {'sku': 'S1', 'name': 'Chair'}},
+            {'op': 'create', 'resource': 'projects', 'ref': 'loft',
+             'data': {'name': 'Loft', 'product_ids': [{'$ref': 'chair'}]}},
+            {'op': 'create', 'resource': 'tasks', 'data': {'name': 'Order', 'due_date': '2024-05-01'}},
+        ])
+        assert rv.status_code == 200
+        client_id, _, project_id, task_id = [r['id'] for r in rv.get_json()['results']]
+        assert client.get(f'/clients/{client_id}').get_json()['name'] == 'Ann Lee'
+        assert [p['name'] for p in client.get(f'/projects/{project_id}').get_json()['products']] == ['Chair']
+        assert TaskSyncOutbox.query.one().task_id == task_id
+
+        def commit():
+            raise IntegrityError('COMMIT', {}, Exception('deferred constraint failed'))
+
+        monkeypatch.setattr(db.session, 'commit', commit)
+        rv = client.post('/batch', json=[{'op': 'create', 'resource': 'notes', 'data': {'text': 'x'}}])
+        assert rv.status_code == 400
+        assert rv.get_json() == {'error': 'deferred constraint failed', 'operation': None}
+        monkeypatch.undo()
+        assert client.get('/notes').get_json() == []
+
+
+def test_conditional_writes_use_one_statement_and_if_match():
+    with app.app_context():
+        client = app.test_client()
+        vendor_id = client.post('/vendors', json={'name': 'Acme'}).get_json()['id']
+        product_id = client.post('/products', json={'sku': 'S1', 'name': 'Chair', 'vendor_id': vendor_id}).get_json()['id']
+        assert client.get(f'/vendors/{vendor_id}').get_json()['version'] == 1
+
+        with count_queries() as statements:
+            rv = client.put(f'/vendors/{vendor_id}', json={'city': 'Reno'}, headers={'If-Match': '"1"'})
+        assert rv.status_code == 200
+        assert rv.get_json() == {'id': vendor_id, 'version': 2}
+        assert rv.headers['ETag'] == '"2"'
+        vendor_statements = [s for s in statements if 'vendors' in s]
+        assert len(vendor_statements) == 1 and vendor_statements[0].startswith('UPDATE')
+        assert client.get(f'/vendors/{vendor_id}').get_json()['city'] == 'Reno'
+        assert client.get('/recent').get_json()[0]['action'] == 'update'
+
+        # A stale or weak tag is a conflict and leaves the record alone
+        for tag in ('"1"', 'W/"2"'):
+            rv = client.put(f'/vendors/{vendor_id}', json={'city': 'Austin'}, headers={'If-Match': tag})
+            assert rv.status_code == 412
+        assert client.get(f'/vendors/{vendor_id}').get_json()['city'] == 'Reno'
+        assert client.delete(f'/vendors/{vendor_id}', headers={'If-Match': '"1"'}).status_code == 412
+        assert client.put('/vendors/99', json={'city': 'X'}, headers={'If-Match': '"1"'}).status_code == 404
+        assert client.put(f'/vendors/{vendor_id}', json={'name': 'Acme'}, headers={'If-Match': '*'}).status_code == 200
+
+        assert client.put('/tasks/99', json={'name': 'X'}).status_code == 404
+        task_id = client.post('/tasks', json={'name': 'T'}).get_json()['id']
+        assert client.put(f'/tasks/{task_id}', json={'due_date': 'soon'}).status_code == 400
+        for value in ('maybe', 'ture', 'on'):
+            rv = client.put(f'/tasks/{task_id}', json={'completed': value})
+            assert rv.get_json() == {'error': f"Invalid value for completed: '{value}' is not true or false"}
+        assert client.put(f'/tasks/{task_id}', json={'completed': 'no'}).status_code == 200
+        rv = client.put(f'/products/{product_id}', json={'price': 'cheap'})
+        assert rv.get_json() == {'error': "Invalid value for price: 'cheap' is not a number"}
+        assert client.get('/tasks?completed=maybe').status_code == 400
+        client.put(f'/tasks/{task_id}', json={'due_date': '2024-05-01', 'completed': True})
+        assert client.get(f'/tasks/{task_id}').get_json()['due_date'] == '2024-05-01'
+
+        # Deleting detaches the vendor's products, as the ORM delete did
+        rv = client.delete(f'/vendors/{vendor_id}', headers={'If-Match': '"3"'})
+        assert rv.status_code == 204
+        assert client.get(f'/vendors/{vendor_id}').status_code == 404
+        product = client.get(f'/products/{product_id}').get_json()
+        assert product['vendor_id'] is None and product['version'] == 2
+        assert client.delete(f'/vendors/{vendor_id}').status_code == 404
+
+
+def test_detail_etag_can_be_sent_back_in_if_match():
+    with app.app_context():
+        client = app.test_client()
+        project_id = client.post('/projects', json={'name': 'Loft'}).get_json()['id']
+        rv = client.get(f'/projects/{project_id}')
+        etag = rv.headers['ETag']
+        assert etag.startswith('"1.') and not etag.startswith('W/')
+        assert client.get(f'/projects/{project_id}', headers={'If-None-Match': etag}).status_code == 304
+
+        rv = client.put(f'/projects/{project_id}', json={'name': 'Attic'}, headers={'If-Match': etag})
+        assert rv.status_code == 200 and rv.get_json()['version'] == 2
+        assert client.get(f'/projects/{project_id}', headers={'If-None-Match': etag}).status_code == 200
+        assert client.put(f'/projects/{project_id}', json={'name': 'X'}, headers={'If-Match': etag}).status_code == 412
+
+        # Related changes refresh the tag but do not refuse writes to the record
+        etag = client.get(f'/projects/{project_id}').headers['ETag']
+        client.post('/clients', json={'name': 'Ann'})
+        assert client.get(f'/projects/{project_id}', headers={'If-None-Match': etag}).status_code == 200
+        assert client.delete(f'/projects/{project_id}', headers={'If-Match': etag}).status_code == 204
+
+        rv = client.get('/projects')
+        assert rv.headers['ETag'].startswith('W/')
+
+
+def test_orm_and_bulk_updates_bump_versions():
+    with app.app_context():
+        client = app.test_client()
+        client_id = client.post('/clients', json={'name': 'Ann'}).get_json()['id']
+
+        rv = client.post('/batch', json=[
+            {'op': 'update', 'resource': 'clients', 'id': client_id, 'version': 1, 'data': {'name': 'Ann Lee'}},
+        ])
+        assert rv.get_json()['results'] == [{'status': 200, 'id': client_id, 'version': 2}]
+        rv = client.post('/batch', json=[
+            {'op': 'delete', 'resource': 'clients', 'id': client_id, 'version': 1},
+        ])
+        assert rv.status_code == 412
+        assert client.get(f'/clients/{client_id}').get_json()['version'] == 2
+
+        client.post('/products', json={'sku': 'S1', 'name': 'Chair'})
+        client.post('/import/products?mode=upsert', json=[{'sku': 'S1', 'name': 'Chair v2'}])
+        assert client.get('/products/1').get_json()['version'] == 2
+
+
+def test_batch_failure_rolls_back_everything():
+    with app.app_context():
+        client = app.test_client()
+        rv = client.post('/batch', json=[
+            {'op': 'create', 'resource': 'clients', 'ref': 'c', 'data': {'name': 'Ann'}},
+            {'op': 'create', 'resource': 'projects', 'data': {'client_id': {'$ref': 'c'}}},
+        ])
+        assert rv.status_code == 400
+        assert rv.get_json() == {'error': 'Invalid input', 'operation': 1}
+        assert client.get('/clients').get_json() == []
+
+        rv = client.post('/batch', json=[
+            {'op': 'create', 'resource': 'clients', 'data': {'name': 'Ann'}},
+            {'op': 'update', 'resource': 'clients', 'id': 99, 'data': {'name': 'X'}},
+        ])
+        assert rv.status_code == 404
+        assert rv.get_json()['operation'] == 1
+        assert client.get('/clients').get_json() == []
+
+        rv = client.post('/batch', json=[
+            {'op': 'create', 'resource': 'products', 'data': {'sku': 'S', 'name': 'A'}},
+            {'op': 'create', 'resource': 'products', 'data': {'sku': 'S', 'name': 'B'}},
+        ])
+        assert rv.status_code == 400
+        assert rv.get_json()['operation'] == 1
+        assert client.get('/products').get_json() == []
+
+        bad = [
+            {'op': 'get', 'resource': 'notes', 'id': {'$ref': 'missing'}},
+            {'op': 'merge', 'resource': 'notes', 'id': 1},
+            {'op': 'get', 'resource': 'widgets', 'id': 1},
+            {'op': 'delete', 'resource': 'notes'},
+        ]
+        assert [client.post('/batch', json=[op]).status_code for op in bad] == [400, 400, 404, 400]
+        assert client.post('/batch', json={'operations': []}).status_code == 400
+
+
+def test_recent_reads_activity_log():
+    with app.app_context():
+        client = app.test_client()
+        client.post('/vendors', json={'name': 'V1'})
+        pid = client.post('/projects', json={'name': 'P1'}).get_json()['id']
+        client.put(f'/projects/{pid}', json={'name': 'P2'})
+        client.post('/import/clients', json=[{'name': 'C1'}, {'name': 'C2'}])
+
+        with count_queries() as statements:
+            rv = client.get('/recent')
+        assert len(statements) == 2  # table versions + activity
+        items = rv.get_json()
+        assert [(i['_type'], i['action']) for i in items[:4]] == [
+            ('clients', 'import'), ('projects', 'update'), ('projects', 'create'), ('vendors', 'create'),
+        ]
+        assert items[1]['name'] == 'P2'
+        assert items[1]['id'] == pid
+
+
+def test_dashboard_summary():
+    with app.app_context():
+        client = app.test_client()
+        cid = client.post('/clients', json={'name': 'ClientA'}).get_json()['id']
+        p1 = client.post('/projects', json={'name': 'P1', 'client_id': cid}).get_json()['id']
+        p2 = client.post('/projects', json={'name': 'P2'}).get_json()['id']
+        client.post('/contracts', json={'project_id': p1, 'client_id': cid, 'status_id': 1})
+        client.post('/contracts', json={'project_id': p1, 'status_id': 2})
+        client.post('/tasks', json={'name': 'Open'})
+        client.post('/tasks', json={'name': 'Done', 'completed': True})
+
+        with count_queries() as statements:
+            rv = client.get('/dashboard')
+        assert len(statements) <= 7
+        data = rv.get_json()
+        assert data['projects']['count'] == 2
+        statuses = {p['id']: p['status'] for p in data['projects']['items']}
+        assert statuses == {p1: 'Active', p2: None}
+        assert data['projects']['items'][0]['client'] == 'ClientA'
+        assert data['tasks']['open'] == 1
+        assert [t['name'] for t in data['tasks']['items']] == ['Open']
+        assert data['contracts']['count'] == 2
+        assert data['contracts']['by_status'] == {'Draft': 1, 'Active': 1}
+        assert data['recent'][0]['_type'] == 'tasks'
+
+        rv = client.get('/dashboard', headers={'If-None-Match': rv.headers['ETag']})
+        assert rv.status_code == 304
+
+
+def test_token_login_and_credential_cache(monkeypatch):
+    import base64
+    from backend import app as app_module
+    monkeypatch.setitem(app.config, 'SECRET_KEY', 'test-secret')
+    with app.app_context():
+        client = app.test_client()
+        app_module.credential_cache.clear()
+        assert client.post('/register', json={'username': 'amy', 'password': 'pw'}).status_code == 201
+        basic = {'Authorization': 'Basic ' + base64.b64encode(b'amy:pw').decode()}
+
+        calls = []
+        check = app_module.bcrypt.check_password_hash
+        monkeypatch.setattr(app_module.bcrypt, 'check_password_hash',
+                            lambda *a: calls.append(1) or check(*a))
+
+        assert client.get('/me', headers=basic).get_json()['username'] == 'amy'
+        assert client.get('/me', headers=basic).status_code == 200
+        assert len(calls) == 1
+
+        token = client.post('/login', headers=basic).get_json()['token']
+        with count_queries() as statements:
+            rv = client.get('/me', headers={'Authorization': f'Bearer {token}'})
+        assert rv.get_json() == {'id': 1, 'username': 'amy', 'role': 'Designer'}
+        assert statements == []
+        assert len(calls) == 1
+
+        assert client.get('/me', headers={'Authorization': 'Bearer bogus'}).status_code == 401
+        bad = {'Authorization': 'Basic ' + base64.b64encode(b'amy:nope').decode()}
+        assert client.get('/me', headers=bad).status_code == 401
+        assert client.get('/me').status_code == 401
+
+
+def test_credential_cache_forgets_changed_users(monkeypatch):
+    import base64
+    from sqlalchemy import update
+    from backend import app as app_module
+    from backend.models import User
+    with app.app_context():
+        client = app.test_client()
+        app_module.credential_cache.clear()
+        client.post('/register', json={'username': 'amy', 'password': 'pw'})
+        basic = {'Authorization': 'Basic ' + base64.b64encode(b'amy:pw').decode()}
+        assert client.get('/me', headers=basic).status_code == 200
+
+        # A change committed here clears the cache straight away
+        user = User.query.filter_by(username='amy').one()
+        user.password_hash = app_module.bcrypt.generate_password_hash('new').decode()
+        db.session.commit()
+        assert client.get('/me', headers=basic).status_code == 401
+
+        # One made by another process is caught by the users table version
+        new = {'Authorization': 'Basic ' + base64.b64encode(b'amy:new').decode()}
+        assert client.get('/me', headers=new).status_code == 200
+        monkeypatch.setattr(app_module.credential_cache, 'clear', lambda: None)
+        db.session.execute(update(User).values(
+            password_hash=app_module.bcrypt.generate_password_hash('newer').decode()))
+        app_module.bump_table_versions(db.session.connection(), ['users'])
+        db.session.commit()
+        assert client.get('/me', headers=new).status_code == 401
+
+
+def test_tokens_are_disabled_without_secret_key(monkeypatch):
+    import base64
+    from itsdangerous import URLSafeTimedSerializer
+    from backend import app as app_module
+    monkeypatch.setitem(app.config, 'SECRET_KEY', None)
+    with app.app_context():
+        client = app.test_client()
+        client.post('/register', json={'username': 'amy', 'password': 'pw'})
+        basic = {'Authorization': 'Basic ' + base64.b64encode(b'amy:pw').decode()}
+        assert client.post('/login', headers=basic).status_code == 503
+
+        forged = URLSafeTimedSerializer(app_module.DEV_SECRET_KEY, salt='auth-token').dumps(
+            {'id': 1, 'username': 'amy', 'role': 'Admin'})
+        assert client.get('/me', headers={'Authorization': f'Bearer {forged}'}).status_code == 401
+        assert client.get('/me', headers=basic).status_code == 200
+
+
+def test_conditional_get_with_table_versions():
+    with app.app_context():
+        client = app.test_client()
+        vid = client.post('/vendors', json={'name': 'V1'}).get_json()['id']
+
+        rv = client.get('/vendors')
+        etag = rv.headers['ETag']
+        with count_queries() as statements:
+            rv = client.get('/vendors', headers={'If-None-Match': etag})
+        assert rv.status_code == 304
+        assert len(statements) == 1
+
+        detail = client.get(f'/vendors/{vid}')
+        assert client.get(f'/vendors/{vid}', headers={'If-None-Match': detail.headers['ETag']}).status_code == 304
+
+        # a product write changes the vendor listing (it embeds product names)
+        client.post('/products', json={'sku': 'S', 'name': 'P', 'vendor_id': vid})
+        rv = client.get('/vendors', headers={'If-None-Match': etag})
+        assert rv.status_code == 200
+        assert rv.get_json()[0]['products'] == ['P']
+        assert rv.headers['ETag'] != etag
+
+        # bulk imports bypass flush events but still bump the version
+        etag = client.get('/clients').headers['ETag']
+        client.post('/import/clients', json=[{'name': 'C1'}])
+        assert client.get('/clients', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_activity_version_is_bumped_after_commit():
+    events = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        if statement.startswith('UPDATE table_versions'):
+            events.append(('bump', 'activity' in str(parameters)))
+
+    def commit(conn):
+        events.append(('commit', None))
+
+    with app.app_context():
+        client = app.test_client()
+        etag = client.get('/recent').headers['ETag']
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'commit', commit)
+        try:
+            client.post('/vendors', json={'name': 'V1'})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+            event.remove(db.engine, 'commit', commit)
+        # The write transaction leaves the shared activity counter alone
+        assert events == [('bump', False), ('commit', None), ('bump', True), ('commit', None)]
+        assert client.get('/recent', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_failed_activity_bump_still_invalidates(monkeypatch):
+    from sqlalchemy.exc import OperationalError
+    from backend import app as app_module
+    invalidated = []
+    real_bump = app_module.bump_table_versions
+
+    def bump(connection, tables):
+        if 'activity' in tables:
+            raise OperationalError('UPDATE table_versions', {}, Exception('connection lost'))
+        real_bump(connection, tables)
+
+    with app.app_context():
+        client = app.test_client()
+        monkeypatch.setattr(app_module, 'bump_table_versions', bump)
+        monkeypatch.setattr(cache, 'invalidate', lambda tables: invalidated.append(set(tables)))
+        rv = client.post('/vendors', json={'name': 'V1'})
+        assert rv.status_code == 201
+        assert invalidated == [{'vendors', 'activity'}]
+        monkeypatch.undo()
+        assert client.get('/vendors').get_json()[0]['name'] == 'V1'
+
+
+def test_vendor_and_product_listings_do_not_lazy_load():
+    with app.app_context():
+        client = app.test_client()
+        for v in range(5):
+            vid = client.post('/vendors', json={'name': f'V{v}'}).get_json()['id']
+            for p in range(3):
+                client.post('/products', json={'sku': f'S{v}-{p}', 'name': f'P{v}-{p}', 'vendor_id': vid})
+
+        with count_queries() as statements:
+            vendors = client.get('/vendors').get_json()
+        assert vendors[4]['products'] == ['P4-0', 'P4-1', 'P4-2']
+        assert len(statements) <= 3  # table versions, vendors, products
+
+        with count_queries() as statements:
+            products = client.get('/products').get_json()
+        assert len(products) == 15
+        assert products[-1]['vendor'] == 'V4'
+        assert len(statements) <= 2  # table versions, products joined to vendors
+
+
+def test_fields_narrow_the_select():
+    with app.app_context():
+        client = app.test_client()
+        vendor_id = client.post('/vendors', json={'name': 'V', 'primary_email': 'v@example.com', 'tax_id': 'T1'}).get_json()['id']
+        client.post('/products', json={'sku': 'S1', 'name': 'Chair', 'vendor_id': vendor_id})
+        client_id = client.post('/clients', json={'name': 'C', 'employee_id': 1}).get_json()['id']
+
+        with count_queries() as statements:
+            rv = client.get('/vendors?fields=name,primary_email')
+        assert rv.get_json() == [{'name': 'V', 'primary_email': 'v@example.com'}]
+        vendor_sql = [s for s in statements if 'FROM vendors' in s]
+        assert len(vendor_sql) == 1 and 'tax_id' not in vendor_sql[0]
+        assert not [s for s in statements if 'FROM products' in s]
+
+        rv = client.get('/vendors?fields=id,products')
+        assert rv.get_json() == [{'id': vendor_id, 'products': ['Chair']}]
+
+        with count_queries() as statements:
+            rv = client.get('/clients?fields=id,name')
+        assert rv.get_json() == [{'id': client_id, 'name': 'C'}]
+        assert not [s for s in statements if 'employees' in s]
+        assert client.get('/clients?fields=name,employee').get_json() == [{'name': 'C', 'employee': 'Stephanie Scher'}]
+
+        page = client.get('/products?fields=name&limit=1').get_json()
+        assert page == {'items': [{'name': 'Chair'}], 'next_cursor': None}
+        assert client.get(f'/clients/{client_id}?fields=employee').get_json() == {'employee': 'Stephanie Scher'}
+        assert client.get(f'/clients/{client_id}').get_json()['employee_id'] == 1
+
+        rv = client.get('/vendors?fields=name,password')
+        assert rv.status_code == 400
+        assert rv.get_json()['error'] == 'Unknown field(s): password'
+
+
+def test_contract_list_joins_names_in_one_query():
+    with app.app_context():
+        client = app.test_client()
+        client_id = client.post('/clients', json={'name': 'C'}).get_json()['id']
+        project_id = client.post('/projects', json={'name': 'P', 'client_id': client_id}).get_json()['id']
+        for status_id in (1, 2, 3):
+            client.post('/contracts', json={
+                'client_id': client_id, 'project_id': project_id, 'status_id': status_id, 'employee_id': 2,
+            })
+        with count_queries() as statements:
+            contracts = client.get('/contracts').get_json()
+        assert len(statements) == 2  # table versions + contracts with their names joined
+        assert [c['status'] for c in contracts] == ['Draft', 'Active', 'Completed']
+        assert contracts[0]['client'] == 'C' and contracts[0]['employee'] == 'Sable Murphy'
+        assert contracts[0]['project'] == 'P' and contracts[0]['lead'] is None
+        with count_queries() as statements:
+            client.get('/contracts?fields=id,amount')
+        assert 'JOIN' not in statements[-1]
+
+
+def test_list_filters_and_sorting():
+    import datetime
+    from backend.app import Task
+    with app.app_context():
+        client = app.test_client()
+        due = [datetime.date(2024, 7, d) for d in (3, 1, 2, 2)] + [None, None]
+        for i, day in enumerate(due):
+            db.session.add(Task(name=f'T{i}', due_date=day, completed=(i == 1)))
+        db.session.commit()
+        client.post('/leads', json={'name': 'Won', 'stage_id': 3})
+        client.post('/leads', json={'name': 'Fresh', 'stage_id': 1})
+
+        open_tasks = client.get('/tasks?completed=false&order=due_date&fields=name').get_json()
+        assert [t['name'] for t in open_tasks] == ['T2', 'T3', 'T0', 'T4', 'T5']
+        rv = client.get('/tasks?due_date__lt=2024-07-03&order=-due_date&fields=name')
+        assert [t['name'] for t in rv.get_json()] == ['T2', 'T3', 'T1']
+        assert len(client.get('/tasks?due_date__isnull=true').get_json()) == 2
+        assert [l['name'] for l in client.get('/leads?stage_id=3').get_json()] == ['Won']
+        assert [l['name'] for l in client.get('/leads?order=name').get_json()] == ['Fresh', 'Won']
+
+        # Keyset pages follow the requested order, ties and NULLs included
+        names, cursor = [], None
+        while True:
+            params = {'order': '-due_date', 'limit': 2, 'fields': 'name'}
+            if cursor:
+                params['after'] = cursor
+            page = client.get('/tasks', query_string=params).get_json()
+            names += [t['name'] for t in page['items']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        assert names == ['T0', 'T2', 'T3', 'T1', 'T4', 'T5']
+
+        assert client.get('/tasks?name=T1').status_code == 400
+        assert client.get('/tasks?due_date__like=x').status_code == 400
+        assert client.get('/tasks?due_date=soon').status_code == 400
+        assert client.get('/tasks?order=name').status_code == 400
+        assert client.get('/employees?name=Sable Murphy').status_code == 400
+
+        # Misspelled filters are rejected; only the cache-buster is ignored
+        rv = client.get('/tasks?complete=false')
+        assert rv.status_code == 400 and rv.get_json()['error'] == 'Cannot filter on complete'
+        assert client.get('/tasks?utm_source=mail').status_code == 400
+        assert len(client.get('/tasks?_=1700000000').get_json()) == 6
+        # null in an IN list matches NULLs as well
+        rv = client.get('/tasks?due_date__in=2024-07-03,null&fields=name')
+        assert [t['name'] for t in rv.get_json()] == ['T0', 'T4', 'T5']
+        assert len(client.get('/tasks?due_date__in=null').get_json()) == 2
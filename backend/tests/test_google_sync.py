@@ -0,0 +1,147 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+import werkzeug
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '0'
+import datetime
+import email
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.app import app, cache, db
+from backend import google_sync
+from backend.models import Activity, Task, TaskSyncOutbox
+
+
+class FakeTasksHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Google batch endpoint."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        server.batches.append(body)
+        if server.fail_status:
+            self.send_response(server.fail_status)
+            self.end_headers()
+            return
+        message = email.message_from_bytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + body
+        )
+        parts = []
+        for part in message.get_payload():
+            base, request_id = part['Content-ID'][1:-1].split(' + ', 1)
+            request_body = json.loads(part.get_payload().split('\n\n', 1)[1])
+            server.inserted.append(request_body)
+            payload = json.dumps({'id': f'g-{request_id}', 'title': request_body['title']})
+            parts.append(
+                '--BOUNDARY\r\n'
+                'Content-Type: application/http\r\n'
+                f'Content-ID: <response-{base} + {request_id}>\r\n\r\n'
+                'HTTP/1.1 200 OK\r\n'
+                'Content-Type: application/json\r\n\r\n'
+                f'{payload}\r\n'
+            )
+        content = (''.join(parts) + '--BOUNDARY--\r\n').encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'multipart/mixed; boundary=BOUNDARY')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+@pytest.fixture
+def fake_google(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTasksHandler)
+    server.batches, server.inserted, server.fail_status = [], [], None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('GOOGLE_TASKS_ENDPOINT', f'http://127.0.0.1:{server.server_port}/')
+    google_sync.reset_tasks_service()
+    yield server
+    server.shutdown()
+    google_sync.reset_tasks_service()
+
+
+def setup_function(function):
+    cache.clear()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+def test_create_task_only_enqueues(fake_google):
+    with app.app_context():
+        client = app.test_client()
+        rv = client.post('/tasks', json={'name': 'Measure room'})
+        assert rv.status_code == 201
+        assert fake_google.batches == []
+        entry = TaskSyncOutbox.query.one()
+        assert entry.status == 'pending'
+        assert entry.task_id == rv.get_json()['id']
+
+
+def test_tasks_created_without_sync_config_are_still_delivered(fake_google, monkeypatch):
+    endpoint = os.environ['GOOGLE_TASKS_ENDPOINT']
+    monkeypatch.delenv('GOOGLE_TASKS_ENDPOINT')
+    monkeypatch.delenv('GOOGLE_SERVICE_ACCOUNT_FILE', raising=False)
+    with app.app_context():
+        task_id = app.test_client().post('/tasks', json={'name': 'Order fabric'}).get_json()['id']
+
+    # Only the worker process is configured for Google
+    monkeypatch.setenv('GOOGLE_TASKS_ENDPOINT', endpoint)
+    assert google_sync.SyncWorker(app).run_once() == 1
+    assert fake_google.inserted == [{'title': 'Order fabric'}]
+    with app.app_context():
+        assert db.session.get(Task, task_id).google_task_id.startswith('g-')
+
+
+def test_worker_sends_pending_tasks_in_one_batch(fake_google):
+    with app.app_context():
+        for i in range(3):
+            task = Task(name=f'T{i}', due_date=datetime.date(2024, 5, 1) if i == 0 else None)
+            db.session.add(task)
+            google_sync.enqueue_task_sync(task)
+        db.session.commit()
+
+    worker = google_sync.SyncWorker(app, batch_size=10)
+    assert worker.run_once() == 3
+    assert len(fake_google.batches) == 1
+    assert fake_google.inserted[0] == {'title': 'T0', 'due': '2024-05-01T00:00:00Z'}
+    with app.app_context():
+        assert {e.status for e in TaskSyncOutbox.query.all()} == {'sent'}
+        assert all(t.google_task_id.startswith('g-') for t in Task.query.all())
+        assert {a.action for a in Activity.query.all()} == {'create'}
+    assert worker.run_once() == 0
+    assert google_sync.get_tasks_service() is google_sync.get_tasks_service()
+
+
+def test_worker_backs_off_and_opens_breaker(fake_google):
+    with app.app_context():
+        app.test_client().post('/tasks', json={'name': 'T'})
+    fake_google.fail_status = 503
+    breaker = google_sync.CircuitBreaker(threshold=2, cooldown=60)
+    worker = google_sync.SyncWorker(app, base_delay=0, breaker=breaker)
+
+    assert worker.run_once() == 0
+    with app.app_context():
+        entry = TaskSyncOutbox.query.one()
+        assert entry.status == 'pending'
+        assert entry.attempts == 1
+        assert entry.last_error
+    worker.run_once()
+    assert breaker.state == 'open'
+    worker.run_once()
+    assert len(fake_google.batches) == 2
+
+    fake_google.fail_status = None
+    breaker.cooldown = 0
+    assert breaker.state == 'half-open'
+    assert worker.run_once() == 1
+    assert breaker.state == 'closed'
@@ -0,0 +1,58 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+import werkzeug
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '0'
+import logging
+import re
+
+from backend.app import app, cache, db, Client, Project
+from backend.instrumentation import SLOWEST_STATEMENTS, RequestStats, normalize_sql
+
+
+def setup_function(function):
+    cache.clear()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        client = Client(name='C')
+        db.session.add(client)
+        db.session.add_all([Project(name=f'P{i}', client=client) for i in range(3)])
+        db.session.commit()
+
+
+def test_normalize_sql():
+    sql = "SELECT a\n  FROM t WHERE id IN (?, ?, ?) AND name = 'x''y' AND n > 10 AND v::text = %(v_1)s"
+    assert normalize_sql(sql) == 'SELECT a FROM t WHERE id IN (...) AND name = ? AND n > ? AND v::text = ?'
+
+
+def test_server_timing_reports_queries():
+    with app.app_context():
+        rv = app.test_client().get('/projects')
+    header = rv.headers['Server-Timing']
+    match = re.match(r'db;dur=[\d.]+;desc="(\d+) queries", serialize;dur=[\d.]+, total;dur=[\d.]+$', header)
+    assert match
+    assert 1 <= int(match.group(1)) <= 3
+
+
+def test_slow_statements_and_requests_are_logged(monkeypatch, caplog):
+    monkeypatch.setitem(app.config, 'SLOW_QUERY_MS', 0)
+    monkeypatch.setitem(app.config, 'SLOW_REQUEST_MS', 0)
+    with caplog.at_level(logging.WARNING, logger='backend.instrumentation'):
+        with app.app_context():
+            app.test_client().get('/projects/1')
+    messages = [r.getMessage() for r in caplog.records]
+    assert any(m.startswith('Slow query') and 'FROM projects' in m for m in messages)
+    slow = [m for m in messages if m.startswith('Slow request GET /projects/1')]
+    assert slow and re.search(r'slowest statements: [\d.]+ ms SELECT', slow[0])
+
+
+def test_request_stats_keep_only_the_slowest_statements():
+    stats = RequestStats()
+    for i in range(100):
+        stats.record(f'SELECT {i}', i / 1000)
+    assert stats.queries == 100
+    assert abs(stats.db_time - sum(range(100)) / 1000) < 1e-9
+    assert len(stats.statements) == SLOWEST_STATEMENTS
+    assert [sql for _, sql in stats.slowest()] == [f'SELECT {i}' for i in range(99, 99 - SLOWEST_STATEMENTS, -1)]
@@ -0,0 +1,54 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from backend.app import app, cache, db, Client, Contract, Project
+import loadgen
+
+
+@pytest.fixture
+def live_server():
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+def setup_function(function):
+    cache.clear()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        client = Client(name='C')
+        for i in range(3):
+            project = Project(name=f'P{i}', client=client)
+            db.session.add(Contract(project=project, client=client))
+        db.session.commit()
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert loadgen.percentile(values, 50) == 50
+    assert loadgen.percentile(values, 99) == 99
+    assert loadgen.percentile([7], 95) == 7
+
+
+def test_replays_page_mix(live_server):
+    generator = loadgen.LoadGenerator(
+        live_server, users=2, mix={'project': 1, 'contracts': 1}, seed=1,
+    )
+    report = generator.run(duration=0.5)
+    assert report['requests'] > 0
+    assert report['error_rate'] == 0
+    assert set(report['routes']) <= {
+        '/projects/{project_id}', '/clients?fields=id,name', '/contracts', '/employees',
+        '/projects?fields=id,name', '/contractstatuses',
+    }
+    route = report['routes']['/clients?fields=id,name']
+    assert route['p50_ms'] <= route['p95_ms'] <= route['p99_ms']
+    assert 'db_mean_ms' in route
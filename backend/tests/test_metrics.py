@@ -0,0 +1,47 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+import werkzeug
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '0'
+import pytest
+
+from backend.app import app, cache, db, Employee, Task
+from backend.models import TaskSyncOutbox
+from backend import metrics
+
+pytestmark = pytest.mark.skipif(not metrics.enabled(), reason='prometheus_client not installed')
+
+
+def setup_function(function):
+    cache.clear()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(Employee(name='E'))
+        task = Task(name='T')
+        db.session.add(task)
+        db.session.add(TaskSyncOutbox(task=task))
+        db.session.commit()
+
+
+def requests_served():
+    labels = {'method': 'GET', 'route': '/employees/<int:employee_id>', 'status': '200'}
+    return metrics.REGISTRY.get_sample_value('http_requests_total', labels) or 0
+
+
+def test_metrics_by_route_template():
+    with app.app_context():
+        client = app.test_client()
+        before = requests_served()
+        for _ in range(3):
+            assert client.get('/employees/1').status_code == 200
+        body = client.get('/metrics').get_data(as_text=True)
+
+    assert requests_served() - before == 3
+    assert 'http_requests_total{method="GET",route="/employees/<int:employee_id>",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/employees/<int:employee_id>"}' in body
+    assert 'http_response_size_bytes_count{method="GET",route="/employees/<int:employee_id>"}' in body
+    assert 'route="/metrics"' not in body
+    assert 'google_sync_queue_depth 1.0' in body
+    assert 'db_pool_checked_out' in body
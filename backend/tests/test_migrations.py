@@ -0,0 +1,98 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+from sqlalchemy import inspect, select, text
+
+from backend.app import app, cache, db, Client, Contract, Product, ProductProject, Task
+from backend import migrations
+
+
+def setup_function(function):
+    cache.clear()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        with db.engine.begin() as connection:
+            migrations.metadata.drop_all(connection)
+
+
+def query_plan(statement):
+    with db.engine.connect() as connection:
+        compiled = statement.compile(connection, compile_kwargs={'literal_binds': True})
+        rows = connection.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+    return ' | '.join(row[-1] for row in rows)
+
+
+def test_runner_creates_missing_indexes_once():
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP INDEX ix_product_projects_project_id'))
+            connection.execute(text('DROP INDEX ix_tasks_completed_due_date'))
+
+        assert migrations.run_migrations(db.engine) == [1, 2, 3, 4]
+        names = {i['name'] for i in inspect(db.engine).get_indexes('product_projects')}
+        assert 'ix_product_projects_project_id' in names
+        names = {i['name'] for i in inspect(db.engine).get_indexes('tasks')}
+        assert 'ix_tasks_completed_due_date' in names
+
+        assert migrations.run_migrations(db.engine) == []
+        with db.engine.connect() as connection:
+            assert migrations.applied_versions(connection) == {1, 2, 3, 4}
+
+
+def test_migrations_cover_model_indexes():
+    with app.app_context():
+        declared = {
+            (table.name, index.name)
+            for table in db.metadata.tables.values()
+            for index in table.indexes
+            if index.name not in ('ix_activity_timestamp', 'ix_task_sync_outbox_due')
+        }
+        with db.engine.begin() as connection:
+            for _, name in declared:
+                connection.execute(text(f'DROP INDEX {name}'))
+
+        migrations.run_migrations(db.engine)
+        inspector = inspect(db.engine)
+        present = {
+            (table, index['name'])
+            for table in db.metadata.tables
+            for index in inspector.get_indexes(table)
+        }
+        assert declared <= present
+
+
+def test_hot_joins_use_indexes():
+    with app.app_context():
+        migrations.run_migrations(db.engine)
+
+        plan = query_plan(select(ProductProject).where(ProductProject.project_id.in_([1, 2, 3])))
+        assert 'ix_product_projects_project_id' in plan
+
+        plan = query_plan(select(Product).where(Product.vendor_id.in_([1, 2])))
+        assert 'ix_products_vendor_id' in plan
+
+        plan = query_plan(select(Contract.status_id).where(Contract.project_id == 1))
+        assert 'ix_contracts_project_id' in plan
+
+        plan = query_plan(
+            select(Task).where(Task.completed.is_(False)).order_by(Task.due_date).limit(50)
+        )
+        assert 'ix_tasks_completed_due_date' in plan
+        assert 'TEMP B-TREE' not in plan
+
+        plan = query_plan(select(Client.id, Client.name).order_by(Client.name, Client.id).limit(50))
+        assert 'ix_clients_name' in plan
+        assert 'TEMP B-TREE' not in plan
+
+
+def test_version_column_is_added_to_existing_tables():
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text('ALTER TABLE clients DROP COLUMN version'))
+            connection.execute(text("INSERT INTO clients (name) VALUES ('Old')"))
+
+        migrations.run_migrations(db.engine)
+        assert 'version' in {c['name'] for c in inspect(db.engine).get_columns('clients')}
+        with db.engine.connect() as connection:
+            assert connection.execute(text('SELECT version FROM clients')).scalar() == 1
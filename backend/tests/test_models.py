@@ -1,17 +1,5 @@
 import sys, os; sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from backend.models import Product, ContractStatus, Contract, Task
-
-def test_product_to_dict():
-    p = Product(id=1, sku='SKU123', name='Chair', price=99.99)
-    expected = {
-        'id': 1,
-        'sku': 'SKU123',
-        'name': 'Chair',
-        'price': '99.99',
-        'vendor': None
-    }
-    assert p.to_dict() == expected
-
+from backend.models import ContractStatus, Contract, Task
 
 def test_contract_and_task_models():
     status = ContractStatus(id=1, name='Draft')
@@ -19,3 +7,20 @@ def test_contract_and_task_models():
     task = Task(id=3, name='Test', contract=contract)
     assert contract.status.name == 'Draft'
     assert task.contract is contract
+
+
+def test_compiled_serializers_match_column_values():
+    import datetime, decimal
+    from backend.models import Invoice
+    from backend.serializers import compile_row_serializer, dumps
+    row = tuple({'id': 3, 'name': 'Test', 'due_date': datetime.date(2024, 1, 2), 'completed': False,
+                 'version': 1}.get(c.name) for c in Task.__table__.columns)
+    assert compile_row_serializer(Task.__table__)(row) == {
+        'id': 3, 'name': 'Test', 'due_date': '2024-01-02', 'completed': False,
+        'contract_id': None, 'google_task_id': None, 'version': 1,
+    }
+    row = (1, 2, decimal.Decimal('10.50'), 1)
+    assert compile_row_serializer(Invoice.__table__)(row) == {
+        'id': 1, 'proposal_id': 2, 'amount': '10.50', 'version': 1,
+    }
+    assert dumps({'amount': decimal.Decimal('1.5')}) == b'{"amount":"1.5"}'
@@ -0,0 +1,116 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+import werkzeug
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '0'
+from collections import namedtuple
+
+from backend.app import app, cache, db, LeadStage
+from backend import search
+
+
+def setup_function(function):
+    cache.clear()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(LeadStage(name='New'))
+        db.session.commit()
+
+
+def hits(client, q, **params):
+    rv = client.get('/search', query_string={'q': q, **params})
+    assert rv.status_code == 200
+    return rv.get_json()
+
+
+def test_search_covers_every_resource():
+    with app.app_context():
+        client = app.test_client()
+        client.post('/clients', json={
+            'first_name': 'Jane', 'last_name': 'Doe',
+            'primary_email': 'jane.doe@example.com', 'primary_phone': '555-0101',
+        })
+        client.post('/vendors', json={'name': 'Oakwood Supply', 'contact_info': 'orders@oakwood.example'})
+        client.post('/import/products', json=[{'sku': 'LMP-42', 'name': 'Brass floor lamp'}])
+        client.post('/leads', json={'name': 'Walnut Street remodel', 'contact_info': 'call 555-0199', 'stage_id': 1})
+        client.post('/notes', json={'text': 'Client prefers oak flooring in the den'})
+
+        assert [(h['_type'], h['name']) for h in hits(client, 'jane')['items']] == [('clients', 'Jane Doe')]
+        assert hits(client, 'doe@example')['items'][0]['_type'] == 'clients'
+        assert hits(client, '555 0101')['items'][0]['_type'] == 'clients'
+        assert hits(client, 'lmp')['items'][0]['name'] == 'Brass floor lamp'
+        assert hits(client, 'walnut')['items'][0]['_type'] == 'leads'
+
+        oak = hits(client, 'oak')['items']
+        assert [h['_type'] for h in oak] == ['vendors', 'notes']
+        assert 'oak flooring' in oak[1]['snippet']
+        assert [h['_type'] for h in hits(client, 'oak', types='notes')['items']] == ['notes']
+        assert client.get('/search').status_code == 400
+
+
+def test_index_follows_updates_and_deletes():
+    with app.app_context():
+        client = app.test_client()
+        client_id = client.post('/clients', json={'name': 'Maple Interiors'}).get_json()['id']
+        assert hits(client, 'maple')['items']
+        client.put(f'/clients/{client_id}', json={'name': 'Birch Interiors'})
+        assert not hits(client, 'maple')['items']
+        assert hits(client, 'birch')['items'][0]['id'] == client_id
+        client.delete(f'/clients/{client_id}')
+        assert not hits(client, 'birch')['items']
+
+
+def test_search_pagination():
+    with app.app_context():
+        client = app.test_client()
+        client.post('/import/products', json=[{'sku': f'S{i}', 'name': f'Lamp {i}'} for i in range(5)])
+        first = hits(client, 'lamp', limit=3)
+        assert len(first['items']) == 3 and first['next_cursor']
+        second = hits(client, 'lamp', limit=3, after=first['next_cursor'])
+        assert len(second['items']) == 2 and second['next_cursor'] is None
+        seen = {h['id'] for h in first['items'] + second['items']}
+        assert len(seen) == 5
+
+
+def test_rebuild_backfills_existing_rows():
+    with app.app_context():
+        client = app.test_client()
+        client.post('/vendors', json={'name': 'Cedar Goods'})
+        with db.engine.begin() as connection:
+            search.uninstall(connection)
+            search.install(connection)
+            assert not search.search(connection, 'cedar')
+            search.rebuild(connection)
+            assert search.search(connection, 'cedar')[0]['name'] == 'Cedar Goods'
+
+
+def test_empty_bodies_give_no_snippet():
+    with app.app_context():
+        client = app.test_client()
+        client.post('/vendors', json={'name': 'Cedar Goods'})
+        client.post('/clients', json={'name': 'Cedar Ann', 'primary_email': 'ann@example.com'})
+        items = {h['_type']: h for h in hits(client, 'cedar')['items']}
+        assert items['vendors']['snippet'] is None
+        assert items['clients']['snippet'] == 'ann@example.com'
+
+
+def test_trigram_fallback_pages_and_existing_triggers_are_kept(monkeypatch):
+    class Postgres:
+        class dialect:
+            name = 'postgresql'
+
+    Row = namedtuple('Row', 'resource record_id title snippet rank')
+    matches = [Row('clients', i, f'Jon {i}', '  ', 0.5) for i in range(5)]
+    monkeypatch.setattr(search, '_search_postgres', lambda *args: [])
+    monkeypatch.setattr(search, '_search_trigram',
+                        lambda conn, phrase, resources, limit, offset: matches[offset:offset + limit + 1])
+    first = search.search(Postgres, 'john', limit=3)
+    assert [m['id'] for m in first] == [0, 1, 2, 3] and first[0]['snippet'] is None
+    assert [m['id'] for m in search.search(Postgres, 'john', limit=3, offset=3)] == [3, 4]
+
+    statements = search.postgres_schema({'search_clients_sync'})
+    assert not any(s.startswith('DROP TRIGGER') for s in statements)
+    created = [s.split()[2] for s in statements if s.startswith('CREATE TRIGGER')]
+    assert created == [f'search_{r}_sync' for r in search.SOURCES if r != 'clients']
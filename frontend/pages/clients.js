@@ -36,7 +36,7 @@ export default function Clients() {
   const [message, setMessage] = useState('');
 
   const fetchClients = async () => {
-    const res = await fetch(`${API}/clients`);
+    const res = await fetch(`${API}/clients?fields=id,name,primary_phone,primary_email,referral_type,employee`);
     const data = await res.json();
     setClients(data);
   };
@@ -51,7 +51,7 @@ export default function Contracts() {
     fetchContracts();
   };
   const fetchClients = async () => {
-    const res = await fetch(`${API}/clients`);
+    const res = await fetch(`${API}/clients?fields=id,name`);
     setClients(await res.json());
   };
   const fetchEmployees = async () => {
@@ -60,7 +60,7 @@ export default function Contracts() {
   };
 
   const fetchProjects = async () => {
-    const res = await fetch(`${API}/projects`);
+    const res = await fetch(`${API}/projects?fields=id,name`);
     setProjects(await res.json());
   };
   const fetchStatuses = async () => {
@@ -12,25 +12,20 @@ import AddIcon from '@mui/icons-material/Add';
 const API = 'http://localhost:5000';
 
 export default function Dashboard() {
-  const [projects, setProjects] = useState([]);
-  const [tasks, setTasks] = useState([]);
-  const [contracts, setContracts] = useState([]);
-  const [recent, setRecent] = useState([]);
+  const [summary, setSummary] = useState(null);
   const [form, setForm] = useState({});
   const [dialogType, setDialogType] = useState('');
-  const [statusMap, setStatusMap] = useState({});
 
-  useEffect(() => {
-    fetch(`${API}/projects`).then(r => r.json()).then(setProjects);
-    fetch(`${API}/tasks`).then(r => r.json()).then(d => setTasks(d.filter(t => !t.completed)));
-    fetch(`${API}/contracts`).then(r => r.json()).then(data => {
-      setContracts(data);
-      const map = {};
-      data.forEach(c => { if (c.project_id) map[c.project_id] = c.status; });
-      setStatusMap(map);
-    });
-    fetch(`${API}/recent`).then(r => r.json()).then(setRecent);
-  }, []);
+  // After a save, revalidate instead of reusing the briefly cached summary
+  const loadSummary = (cache = 'default') =>
+    fetch(`${API}/dashboard`, { cache }).then(r => r.json()).then(setSummary);
+
+  useEffect(() => { loadSummary(); }, []);
+
+  const projects = summary ? summary.projects.items : [];
+  const tasks = summary ? summary.tasks.items : [];
+  const contracts = summary ? summary.contracts.items : [];
+  const recent = summary ? summary.recent : [];
 
   const openDialog = (type) => {
     setDialogType(type);
@@ -67,10 +62,7 @@ export default function Dashboard() {
       body: JSON.stringify(form),
     });
     closeDialog();
-    // refresh basic lists
-    fetch(`${API}/projects`).then(r => r.json()).then(setProjects);
-    fetch(`${API}/tasks`).then(r => r.json()).then(d => setTasks(d.filter(t => !t.completed)));
-    fetch(`${API}/contracts`).then(r => r.json()).then(setContracts);
+    loadSummary('no-cache');
   };
 
   return (
@@ -79,27 +71,27 @@ export default function Dashboard() {
       <div className="dashboard-grid">
         <div className="left-col">
           <div className="section">
-            <h2>Active Projects ({projects.length})</h2>
+            <h2>Active Projects ({summary ? summary.projects.count : 0})</h2>
             <div className="cards">
               {projects.map(p => (
                 <Link key={p.id} href={`/projects/${p.id}`} className="card-link">
                   <div className="card fixed">
                     <div>{p.name}</div>
                     <div style={{fontSize:'0.8rem'}}>{p.client}</div>
-                    <div style={{fontSize:'0.8rem'}}>{statusMap[p.id] || ''}</div>
+                    <div style={{fontSize:'0.8rem'}}>{p.status || ''}</div>
                   </div>
                 </Link>
               ))}
             </div>
           </div>
           <div className="section">
-            <h2>Active Tasks ({tasks.length})</h2>
+            <h2>Active Tasks ({summary ? summary.tasks.open : 0})</h2>
             <ul>
               {tasks.map(t => (<li key={t.id}>{t.name}</li>))}
             </ul>
           </div>
           <div className="section">
-            <h2>Contracts ({contracts.length})</h2>
+            <h2>Contracts ({summary ? summary.contracts.count : 0})</h2>
             <ul>
               {contracts.map(c => (
                 <li key={c.id}>{c.project || c.client || c.id} - {c.status}</li>
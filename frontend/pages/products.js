@@ -60,7 +60,7 @@ export default function Products() {
   };
 
   const fetchVendors = async () => {
-    const res = await fetch(`${API}/vendors`);
+    const res = await fetch(`${API}/vendors?fields=id,name`);
     const data = await res.json();
     setVendors(data);
   };
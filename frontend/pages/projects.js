@@ -50,13 +50,13 @@ export default function Projects() {
   };
 
   const fetchClients = async () => {
-    const res = await fetch(`${API}/clients`);
+    const res = await fetch(`${API}/clients?fields=id,name`);
     const data = await res.json();
     setClients(data);
   };
 
   const fetchProducts = async () => {
-    const res = await fetch(`${API}/products`);
+    const res = await fetch(`${API}/products?fields=id,name`);
     const data = await res.json();
     setProducts(data);
   };
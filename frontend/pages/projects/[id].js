@@ -15,7 +15,7 @@ export default function ProjectDetail() {
   useEffect(() => {
     if (!id) return;
     fetch(`${API}/projects/${id}`).then(r => r.json()).then(setProject);
-    fetch(`${API}/clients`).then(r => r.json()).then(setClients);
+    fetch(`${API}/clients?fields=id,name`).then(r => r.json()).then(setClients);
   }, [id]);
 
   const save = async () => {
@@ -40,7 +40,7 @@ export default function Vendors() {
   const [message, setMessage] = useState('');
 
   const fetchVendors = async () => {
-    const res = await fetch(`${API}/vendors`);
+    const res = await fetch(`${API}/vendors?fields=id,name,primary_email,primary_phone`);
     const data = await res.json();
     setVendors(data);
   };